@@ -0,0 +1,93 @@
+"""
+Offline captcha solver evaluation over a folder of saved captcha images.
+
+Labels come from labels.json ({"file.png": "AB12"}) in the folder, or from the file name
+("AB12.png", "AB12_2.png"). Only the local OCR runs unless --vision is passed.
+
+Usage (from backend/):
+    python benchmarks/captcha_eval.py path/to/captchas [--vision] [--threshold 80]
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import captcha  # noqa: E402
+
+IMAGE_EXTS = (".png", ".jpg", ".jpeg", ".gif", ".bmp")
+
+
+def load_samples(folder):
+    labels = {}
+    labels_path = os.path.join(folder, "labels.json")
+    if os.path.exists(labels_path):
+        with open(labels_path, encoding="utf-8") as f:
+            labels = json.load(f)
+    samples = []
+    for name in sorted(os.listdir(folder)):
+        if not name.lower().endswith(IMAGE_EXTS):
+            continue
+        label = labels.get(name) or os.path.splitext(name)[0].split("_")[0]
+        with open(os.path.join(folder, name), "rb") as f:
+            samples.append((name, label, f.read()))
+    return samples
+
+
+async def evaluate(samples, threshold, use_vision):
+    rows = []
+    for name, label, img in samples:
+        t0 = time.perf_counter()
+        text, confidence = captcha.ocr_solve(img)
+        ocr_ms = (time.perf_counter() - t0) * 1000
+        row = {"name": name, "label": label, "ocr": text, "confidence": confidence, "ocr_ms": ocr_ms,
+               "ocr_ok": text.lower() == label.lower(), "escalate": confidence < threshold}
+        if use_vision:
+            import base64
+            t0 = time.perf_counter()
+            answer = await captcha.solve_captcha_image(base64.b64encode(img).decode("utf-8")) or ""
+            row.update(vision=answer, vision_ms=(time.perf_counter() - t0) * 1000,
+                       vision_ok=answer.strip().lower() == label.lower())
+        rows.append(row)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("folder")
+    parser.add_argument("--vision", action="store_true", help="Also score the GPT-4o vision solver (network, costs tokens)")
+    parser.add_argument("--threshold", type=float, default=captcha.OCR_MIN_CONFIDENCE)
+    args = parser.parse_args()
+
+    if not captcha.OCR_AVAILABLE:
+        print("⚠️ pytesseract/Pillow not installed: local OCR scores will be 0.")
+
+    samples = load_samples(args.folder)
+    if not samples:
+        print(f"No images in {args.folder}")
+        return
+    rows = asyncio.run(evaluate(samples, args.threshold, args.vision))
+
+    for r in rows:
+        line = f"{r['name']:<28}{r['label']:<10}{r['ocr'] or '-':<10}{r['confidence']:>6.0f}%{r['ocr_ms']:>8.1f}ms {'✅' if r['ocr_ok'] else '❌'}"
+        if args.vision:
+            line += f"  vision: {r['vision'] or '-':<10}{'✅' if r['vision_ok'] else '❌'}"
+        print(line)
+
+    n = len(rows)
+    confident = [r for r in rows if not r["escalate"]]
+    print(f"\n{n} images | OCR accuracy {sum(r['ocr_ok'] for r in rows) / n:.2%} "
+          f"| avg {sum(r['ocr_ms'] for r in rows) / n:.1f}ms")
+    print(f"Threshold {args.threshold:.0f}%: {len(confident)}/{n} answered locally, "
+          f"accuracy when confident {sum(r['ocr_ok'] for r in confident) / max(len(confident), 1):.2%}, "
+          f"escalation rate {1 - len(confident) / n:.2%}")
+    if args.vision:
+        print(f"Vision accuracy {sum(r['vision_ok'] for r in rows) / n:.2%} "
+              f"| avg {sum(r['vision_ms'] for r in rows) / n:.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
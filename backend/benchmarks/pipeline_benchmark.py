@@ -0,0 +1,343 @@
+"""
+Pipeline benchmark: latency, throughput and browser memory of master_scraper and /track/single,
+replayed offline from recorded fixtures.
+
+record  Runs each case once against the live carriers. Carrier pages are saved as HAR and
+        Cargoes Flow / OpenAI responses as JSON under the fixture dir, along with the results.
+replay  Serves everything from those fixtures (no network) and runs every case at each
+        concurrency level through master_scraper and POST /track/single. It reports p50/p95
+        latency, throughput and peak RSS per browser context. With --baseline, it exits 1 when a
+        metric regresses past --tolerance (and --slack-ms), a replayed status differs from the
+        recorded one, or there are no fixtures or no baseline to compare.
+
+Cases file: [{"tracking_number": "098-12345678", "type": "air", "carrier": "Air India", "tier": "api"}, ...]
+("tier": "browser" for numbers Cargoes Flow doesn't know, so the carrier's driver runs)
+
+Usage (from backend/):
+    python benchmarks/pipeline_benchmark.py record cases.json
+    python benchmarks/pipeline_benchmark.py replay [--concurrency 1,4] [--repeat 3] [--tiers api,browser]
+        [--baseline benchmarks/baselines/pipeline.json] [--tolerance 0.25] [--slack-ms 50] [--save-baseline]
+
+Peak RSS needs psutil (pip install psutil); without it the memory columns are skipped.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_FIXTURES = os.path.join(BACKEND_DIR, "benchmarks", "fixtures", "pipeline")
+DEFAULT_BASELINE = os.path.join(BACKEND_DIR, "benchmarks", "baselines", "pipeline.json")
+SCENARIOS = ("master_scraper", "track_single")
+# Cases answered by Cargoes Flow ("api") vs. a driver replayed from its HAR ("browser")
+TIERS = ("api", "browser")
+UNLIMITED_RATE = "600000/10000"
+
+
+def configure(mode, fixture_dir):
+    """Environment for a deterministic run; must happen before any service module is imported."""
+    os.environ["FIXTURE_MODE"] = mode
+    os.environ["FIXTURE_DIR"] = fixture_dir
+    # Nothing from earlier runs may short-circuit a lookup
+    os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="mp-bench-")
+    os.environ["CACHE_ENABLED"] = "false"
+    os.environ["SESSIONS_ENABLED"] = "false"
+    os.environ["CAPTURE_REPLAY_ENABLED"] = "false"
+    # A paced Cargoes Flow call would otherwise race an unrecorded browser scrape
+    os.environ["HEDGE_ENABLED"] = "false"
+    # Measure the pipeline, not the production rate limits (Cargoes Flow alone is 120/min)
+    for name in ("DEFAULT", "CARGOES_FLOW", "OPENAI"):
+        os.environ[f"RATE_LIMIT_{name}"] = UNLIMITED_RATE
+    os.environ["BROWSER_HEADLESS"] = "true"
+    if mode == "replay":
+        # Requests never leave the machine, but the clients refuse to start without credentials
+        os.environ.setdefault("OPENAI_API_KEY", "replay")
+        os.environ.setdefault("CARGOES_FLOW_API_KEY", "replay")
+        os.environ.setdefault("CARGOES_FLOW_ORG_TOKEN", "replay")
+    sys.path.insert(0, BACKEND_DIR)
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class RssSampler:
+    """Samples the RSS of this process's children (Playwright driver + Chromium) and leased contexts."""
+
+    def __init__(self, pool, interval=0.05):
+        try:
+            import psutil
+            self.process = psutil.Process()
+        except ImportError:
+            self.process = None
+        self.pool = pool
+        self.interval = interval
+        self.idle_mb = self.peak_mb = 0.0
+        self.peak_contexts = 0
+        self._task = None
+
+    @property
+    def available(self):
+        return self.process is not None
+
+    def _children_mb(self):
+        total = 0
+        for child in self.process.children(recursive=True):
+            try:
+                total += child.memory_info().rss
+            except Exception:
+                pass  # Renderer exited between listing and reading
+        return total / 1024 / 1024
+
+    async def _run(self):
+        while True:
+            self.peak_mb = max(self.peak_mb, self._children_mb())
+            self.peak_contexts = max(self.peak_contexts, self.pool.metrics["leased"])
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self.available:
+            self.idle_mb = self.peak_mb = self._children_mb()
+            self.peak_contexts = 0
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def per_context_mb(self):
+        if not self.available or not self.peak_contexts:
+            return None
+        return round((self.peak_mb - self.idle_mb) / self.peak_contexts, 1)
+
+
+def _load_manifest(fixture_dir):
+    path = os.path.join(fixture_dir, "cases.json")
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+# ============================================================
+# RECORD
+# ============================================================
+async def record(cases_path, fixture_dir):
+    from services.browser_pool import browser_pool
+    from services.pipeline import track_shipment
+    from services.cargoes_flow import close_client
+
+    with open(cases_path, encoding="utf-8") as f:
+        cases = json.load(f)
+
+    recorded = []
+    await browser_pool.start()
+    try:
+        # One at a time: each case's HAR must only hold its own traffic
+        for case in cases:
+            tier = case.pop("tier", "api")
+            result = await track_shipment(case["tracking_number"], case.get("type", "air"), case.get("carrier", ""))
+            recorded.append({
+                "case": case, "tier": tier,
+                "expected": {"status": result.get("status"), "live_eta": result.get("live_eta")},
+            })
+            print(f"recorded {case['tracking_number']}: {result.get('status')}")
+    finally:
+        await browser_pool.stop()
+        await close_client()
+
+    os.makedirs(fixture_dir, exist_ok=True)
+    with open(os.path.join(fixture_dir, "cases.json"), "w", encoding="utf-8") as f:
+        json.dump(recorded, f, indent=2)
+    print(f"\n{len(recorded)} case(s) written to {fixture_dir}")
+
+
+# ============================================================
+# REPLAY
+# ============================================================
+async def _call(scenario, case, app_client):
+    from services.scraper_engine import master_scraper
+
+    if scenario == "master_scraper":
+        raw = await master_scraper(case["tracking_number"], case.get("type", "air"), case.get("carrier", ""))
+        return None, not raw.startswith(("Error", "Fallback failed"))
+    response = await app_client.post("/track/single", json={
+        "tracking_number": case["tracking_number"], "type": case.get("type", "air"), "carrier": case.get("carrier", ""),
+    })
+    body = response.json() if response.status_code == 200 else {}
+    return body.get("status"), response.status_code == 200
+
+
+async def run_scenario(scenario, entries, concurrency, repeat, pool, app_client):
+    limit = asyncio.Semaphore(concurrency)
+    latencies, failures, mismatches = [], 0, []
+    sampler = RssSampler(pool)
+
+    async def one(entry):
+        nonlocal failures
+        async with limit:
+            t0 = time.perf_counter()
+            status, ok = await _call(scenario, entry["case"], app_client)
+            latencies.append((time.perf_counter() - t0) * 1000)
+        failures += 0 if ok else 1
+        expected = entry.get("expected", {}).get("status")
+        if scenario == "track_single" and expected is not None and status != expected:
+            mismatches.append({"tracking_number": entry["case"]["tracking_number"], "expected": expected, "got": status})
+
+    sampler.start()
+    t0 = time.perf_counter()
+    await asyncio.gather(*[one(entry) for entry in entries * repeat])
+    wall = time.perf_counter() - t0
+    await sampler.stop()
+
+    return {
+        "requests": len(latencies),
+        "failures": failures,
+        "p50_ms": round(percentile(latencies, 0.50), 1),
+        "p95_ms": round(percentile(latencies, 0.95), 1),
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else 0.0,
+        "peak_contexts": sampler.peak_contexts,
+        "rss_per_context_mb": sampler.per_context_mb(),
+        "mismatches": mismatches,
+    }
+
+
+async def replay(fixture_dir, levels, repeat, tiers=TIERS):
+    import httpx
+    from main import app
+    from services.browser_pool import browser_pool
+    from services.cargoes_flow import close_client
+
+    entries = [e for e in _load_manifest(fixture_dir) if e.get("tier", "api") in tiers]
+    if not entries:
+        print(f"No recorded cases in {fixture_dir} for tiers {', '.join(tiers)}; run `record` first.")
+        return {}
+
+    # ASGITransport skips the lifespan, so the pool is started here instead
+    if browser_pool.size < max(levels):
+        browser_pool.size = max(levels)
+    await browser_pool.start()
+    results = {}
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=300) as app_client:
+            for scenario in SCENARIOS:
+                for tier in tiers:
+                    tier_entries = [e for e in entries if e.get("tier", "api") == tier]
+                    for concurrency in levels if tier_entries else ():
+                        key = f"{scenario}[{tier}]@{concurrency}"
+                        results[key] = await run_scenario(scenario, tier_entries, concurrency, repeat, browser_pool, app_client)
+    finally:
+        await browser_pool.stop()
+        await close_client()
+    return results
+
+
+def print_report(results):
+    print(f"{'scenario':<28}{'reqs':>6}{'fail':>6}{'p50 ms':>10}{'p95 ms':>10}{'req/s':>8}{'ctx':>5}{'MB/ctx':>8}")
+    for key, r in results.items():
+        rss = "-" if r["rss_per_context_mb"] is None else f"{r['rss_per_context_mb']:.1f}"
+        print(f"{key:<28}{r['requests']:>6}{r['failures']:>6}{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}"
+              f"{r['throughput_rps']:>8.2f}{r['peak_contexts']:>5}{rss:>8}")
+        for m in r["mismatches"]:
+            print(f"   status mismatch {m['tracking_number']}: expected {m['expected']!r}, got {m['got']!r}")
+
+
+def regressions(results, baseline, tolerance, slack_ms=0.0):
+    """
+    Human-readable list of metrics that got worse than baseline by more than `tolerance`.
+    Latency must also be worse by more than `slack_ms`, so millisecond-scale scenarios don't flap
+    on runner noise; throughput is only compared where the baseline p50 is above that slack.
+    """
+    problems = []
+    for key, r in results.items():
+        if r["mismatches"]:
+            problems.append(f"{key}: {len(r['mismatches'])} status mismatch(es)")
+        if r["failures"]:
+            problems.append(f"{key}: {r['failures']} failed request(s)")
+        base = baseline.get(key)
+        if not base:
+            continue
+        if base.get("p95_ms") and r["p95_ms"] > max(base["p95_ms"] * (1 + tolerance), base["p95_ms"] + slack_ms):
+            problems.append(f"{key}: p95 {r['p95_ms']}ms vs baseline {base['p95_ms']}ms")
+        if base.get("throughput_rps") and base.get("p50_ms", 0) > slack_ms and \
+                r["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            problems.append(f"{key}: {r['throughput_rps']} req/s vs baseline {base['throughput_rps']} req/s")
+        if base.get("rss_per_context_mb") and r["rss_per_context_mb"] and \
+                r["rss_per_context_mb"] > base["rss_per_context_mb"] * (1 + tolerance):
+            problems.append(f"{key}: {r['rss_per_context_mb']} MB/context vs baseline {base['rss_per_context_mb']} MB")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record/replay benchmark for the tracking pipeline.")
+    parser.add_argument("mode", choices=["record", "replay"])
+    parser.add_argument("cases", nargs="?", help="Cases JSON (record mode)")
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURES)
+    parser.add_argument("--concurrency", default="1,4", help="Comma-separated levels, e.g. 1,4,8")
+    parser.add_argument("--repeat", type=int, default=3, help="Times each case runs per level")
+    parser.add_argument("--tiers", default=",".join(TIERS), help="Case tiers to replay: api, browser (needs Chromium)")
+    parser.add_argument("--baseline", default=None, help=f"Compare against this file (e.g. {os.path.relpath(DEFAULT_BASELINE, BACKEND_DIR)})")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative regression")
+    parser.add_argument("--slack-ms", type=float, default=50.0, help="Latency increase always allowed, in ms")
+    parser.add_argument("--save-baseline", action="store_true", help="Write this run's results to --baseline")
+    parser.add_argument("--output", default=None, help="Also write results JSON here")
+    args = parser.parse_args()
+
+    configure(args.mode, os.path.abspath(args.fixtures))
+
+    if args.mode == "record":
+        if not args.cases:
+            parser.error("record needs a cases file")
+        asyncio.run(record(args.cases, args.fixtures))
+        return 0
+
+    levels = [int(x) for x in args.concurrency.split(",") if x.strip()]
+    tiers = tuple(t.strip() for t in args.tiers.split(",") if t.strip())
+    results = asyncio.run(replay(args.fixtures, levels, args.repeat, tiers))
+    if not results:
+        # A CI comparison with nothing to replay must fail, not pass silently
+        return 1 if args.baseline else 0
+    print_report(results)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    baseline_path = args.baseline or DEFAULT_BASELINE
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(baseline_path), exist_ok=True)
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump({k: {m: v for m, v in r.items() if m != "mismatches"} for k, r in results.items()}, f, indent=2)
+        print(f"\nBaseline written to {baseline_path}")
+        return 0
+
+    if args.baseline:
+        if not os.path.exists(args.baseline):
+            print(f"\nNo baseline at {args.baseline}; run with --save-baseline first.")
+            return 1
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        # A tier the baseline run couldn't measure (e.g. no Chromium there) is reported, not failed
+        for key in results.keys() - baseline.keys():
+            print(f"\n{key}: not in baseline, not compared.")
+        problems = regressions(results, baseline, args.tolerance, args.slack_ms)
+        if problems:
+            print("\nREGRESSIONS:")
+            for problem in problems:
+                print(f"   {problem}")
+            return 1
+        print(f"\nWithin {args.tolerance:.0%} of baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
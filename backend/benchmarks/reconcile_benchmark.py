@@ -0,0 +1,80 @@
+"""
+Reconciliation benchmark: time to reconcile a synthetic manifest whose tracking results are
+already stored (system ETA vs live ETA, flags, per-carrier/destination stats, exceptions).
+
+Usage (from backend/):
+    python benchmarks/reconcile_benchmark.py [--rows 50000] [--repeat 5] [--export xlsx|csv|parquet]
+"""
+import os
+import sys
+import time
+import argparse
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.fast_parser import format_date  # noqa: E402
+from services.reconcile import build_report, export_report  # noqa: E402
+
+CARRIERS = ["MSC", "Maersk", "HAPAG-LLOYD", "CMA CGM", "Ocean Network Express", "Emirates", "Air India", ""]
+DESTINATIONS = ["Hamburg", "Rotterdam", "Jebel Ali", "Nhava Sheva", "Singapore", "Felixstowe", ""]
+STATUSES = ["In Transit", "Discharged", "Delivered", "Arrived / Delayed", "Not Found", None]
+
+
+def synthetic_manifest(rows, seed=7):
+    """Shaped like load_manifest_frame(): manifest items joined with shipment store states."""
+    rng = np.random.default_rng(seed)
+    start = date(2026, 1, 1)
+    system = [start + timedelta(days=int(d)) for d in rng.integers(0, 120, rows)]
+    drift = rng.normal(1.5, 4, rows).round().astype(int)
+    live = [format_date(s + timedelta(days=int(d))) for s, d in zip(system, drift)]
+    status = rng.choice(np.array(STATUSES, dtype=object), rows, p=[0.5, 0.15, 0.2, 0.08, 0.02, 0.05])
+    live = np.where(pd.isna(status), None, np.array(live, dtype=object))
+    live[rng.random(rows) < 0.03] = "N/A"
+    return pd.DataFrame({
+        "position": np.arange(rows),
+        "tracking_number": [f"MSCU{i:07d}" for i in range(rows)],
+        "carrier": rng.choice(CARRIERS, rows),
+        "type": "sea",
+        # Sheets mix ISO dates and dd/mm/yyyy
+        "system_eta": [s.isoformat() if i % 3 else s.strftime("%d/%m/%Y") for i, s in enumerate(system)],
+        "destination": rng.choice(DESTINATIONS, rows),
+        "row_count": 1,
+        "error": np.where(rng.random(rows) < 0.01, "AWB fails the mod-7 check digit.", None),
+        "key": "",
+        "status": status,
+        "live_eta": live,
+        "smart_summary": "",
+        "checked_at": np.where(pd.isna(status), np.nan, 1.8e9),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--export", choices=["xlsx", "csv", "parquet"])
+    args = parser.parse_args()
+
+    frame = synthetic_manifest(args.rows)
+    timings = []
+    for _ in range(args.repeat):
+        t0 = time.perf_counter()
+        report = build_report(frame)
+        timings.append((time.perf_counter() - t0) * 1000)
+
+    print(f"Rows: {args.rows:,}  exceptions: {report['summary']['exceptions']:,}  flags: {report['summary']['flags']}")
+    print(f"Reconcile: best {min(timings):.0f}ms  median {sorted(timings)[len(timings) // 2]:.0f}ms over {args.repeat} runs")
+    print(report["by_carrier"].head(8).to_string(index=False))
+
+    if args.export:
+        t0 = time.perf_counter()
+        content = export_report(report, args.export)
+        print(f"Export {args.export}: {len(content) / 1e6:.1f}MB in {(time.perf_counter() - t0) * 1000:.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Reducer benchmark: reduction ratio and field recall over a corpus of saved page dumps.
+
+Each corpus entry is <name>.txt (a driver's raw inner_text) plus <name>.json with
+{"fields": [...]} - strings that must survive reduction (dates, codes, flights, statuses).
+Drop new dumps into benchmarks/corpus/reducer/ to grow the corpus.
+
+Usage (from backend/):
+    python benchmarks/reducer_benchmark.py [corpus_dir]
+"""
+import os
+import sys
+import json
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.ai_service import MAX_INPUT_CHARS  # noqa: E402
+from services.reducer import reduce_raw_text  # noqa: E402
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus", "reducer")
+
+
+def recall(text, fields):
+    if not fields:
+        return 1.0
+    lower = text.lower()
+    return sum(1 for f in fields if f.lower() in lower) / len(fields)
+
+
+def run(corpus_dir):
+    rows = []
+    for name in sorted(os.listdir(corpus_dir)):
+        if not name.endswith(".txt"):
+            continue
+        with open(os.path.join(corpus_dir, name), encoding="utf-8") as f:
+            raw = f.read()
+        expected_path = os.path.join(corpus_dir, name[:-4] + ".json")
+        fields = []
+        if os.path.exists(expected_path):
+            with open(expected_path, encoding="utf-8") as f:
+                fields = json.load(f).get("fields", [])
+
+        t0 = time.perf_counter()
+        reduced = reduce_raw_text(raw)
+        elapsed_ms = (time.perf_counter() - t0) * 1000
+
+        rows.append({
+            "name": name[:-4],
+            "raw_chars": len(raw),
+            "reduced_chars": len(reduced),
+            "ratio": len(reduced) / max(len(raw), 1),
+            # What the LLM actually sees: the first MAX_INPUT_CHARS characters
+            "recall_raw_slice": recall(raw[:MAX_INPUT_CHARS], fields),
+            "recall_reduced": recall(reduced[:MAX_INPUT_CHARS], fields),
+            "ms": elapsed_ms,
+        })
+    return rows
+
+
+def main():
+    corpus_dir = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_CORPUS
+    rows = run(corpus_dir)
+    if not rows:
+        print(f"No .txt samples in {corpus_dir}")
+        return
+
+    print(f"{'sample':<24}{'raw':>8}{'reduced':>9}{'ratio':>8}{'recall(raw)':>13}{'recall(red)':>13}{'ms':>8}")
+    for r in rows:
+        print(f"{r['name']:<24}{r['raw_chars']:>8}{r['reduced_chars']:>9}{r['ratio']:>8.2f}"
+              f"{r['recall_raw_slice']:>13.2f}{r['recall_reduced']:>13.2f}{r['ms']:>8.2f}")
+
+    n = len(rows)
+    total_raw = sum(r["raw_chars"] for r in rows)
+    total_reduced = sum(r["reduced_chars"] for r in rows)
+    print(f"\n{n} samples | overall ratio {total_reduced / total_raw:.2f} "
+          f"| mean recall raw {sum(r['recall_raw_slice'] for r in rows) / n:.2f} "
+          f"-> reduced {sum(r['recall_reduced'] for r in rows) / n:.2f}")
+
+
+if __name__ == "__main__":
+    main()
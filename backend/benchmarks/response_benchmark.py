@@ -0,0 +1,101 @@
+"""
+Response benchmark: payload size and encode time of a bulk (NDJSON) tracking response per
+view, serializer and compression.
+
+Usage (from backend/):
+    python benchmarks/response_benchmark.py [--rows 5000] [--fields status,live_eta]
+"""
+import os
+import sys
+import json
+import time
+import zlib
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.responses import dumps, project, parse_fields, orjson, VIEWS  # noqa: E402
+from services.compression import _Encoder, brotli  # noqa: E402
+
+STATUSES = ["In Transit", "Discharged", "Delivered", "Arrived / Delayed", "Departed"]
+MILESTONES = [("BKD", "Booked"), ("DEP", "Departed"), ("ARR", "Arrived"), ("DIS", "Discharged"), ("DLV", "Delivered")]
+
+
+def synthetic_result(i, rng):
+    """Shaped like track_shipment()'s result for a sea shipment with a short timeline."""
+    events = [
+        {"code": code, "milestone": name, "location": rng.choice(["Mundra", "Jebel Ali", "Hamburg", "Rotterdam"]),
+         "timestamp": f"2026-0{rng.randint(1, 9)}-{rng.randint(10, 28)}T0{rng.randint(0, 9)}:00:00",
+         "vessel": "MSC ANNA FJ123", "flight": "", "source": "cargoes_flow"}
+        for code, name in MILESTONES[:rng.randint(1, len(MILESTONES))]
+    ]
+    return {
+        "tracking_number": f"MSCU{i:07d}",
+        "carrier": "MSC",
+        "status": rng.choice(STATUSES),
+        "live_eta": f"{rng.randint(10, 28)}-Feb-2026",
+        "smart_summary": "Vessel departed Mundra on schedule and is sailing to Hamburg via Jebel Ali; "
+                         "ETA unchanged since the last update. CO2: 812kg.",
+        "parsed_by": "rules",
+        "raw_data_snippet": 'Source: Cargoes Flow API\n{"carrier_status":"In Transit","latest_event":"Vessel departure",'
+                            '"origin":"INMUN","destination":"DEHAM","predicted_arrival":"2026-02-20","co2_emissions":812',
+        "timeline": events,
+        "changes": [],
+        "cached": True,
+        "row_indexes": [i],
+    }
+
+
+def _timed(fn, repeat=3):
+    best, out = None, None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        elapsed = (time.perf_counter() - t0) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return out, best
+
+
+def _compress(body, encoding, stream):
+    # Same encoder as CompressionMiddleware; streamed batches flush once per NDJSON line
+    encoder = _Encoder(encoding)
+    if not stream:
+        return encoder.finish(body)
+    lines = body.splitlines(keepends=True)
+    return b"".join(encoder.chunk(line) for line in lines[:-1]) + encoder.finish(lines[-1] if lines else b"")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--fields", default="status,live_eta,smart_summary", help="projection to compare with the views")
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    results = [synthetic_result(i, rng) for i in range(args.rows)]
+
+    # Before: stdlib json.dumps per row, every field
+    baseline, baseline_ms = _timed(lambda: "".join(json.dumps(r) + "\n" for r in results).encode("utf-8"))
+    print(f"Rows: {args.rows:,}  serializer: {'orjson' if orjson else 'json (orjson not installed)'}"
+          f"  brotli: {'yes' if brotli else 'no'}")
+    print(f"Baseline (json.dumps, all fields): {len(baseline) / 1024:,.0f}KB in {baseline_ms:.0f}ms\n")
+
+    shapes = [(view, view, None) for view in VIEWS] + [(f"fields={args.fields}", "full", parse_fields(args.fields))]
+    # (label, encoding, flushed per line): whole bodies for /track/single-style responses, streams for /track/batch
+    encodings = [("gzip", "gzip", False)] + ([("br", "br", False)] if brotli else []) + [("gzip-stream", "gzip", True)]
+    header = f"{'shape':<40} {'raw KB':>8} {'encode ms':>10}" + "".join(f" {e[0] + ' KB':>14} {'ms':>5}" for e in encodings)
+    print(header)
+    print("-" * len(header))
+    for label, view, fields in shapes:
+        body, encode_ms = _timed(lambda: b"".join(dumps(project(r, view, fields)) + b"\n" for r in results))
+        row = f"{label:<40} {len(body) / 1024:>8,.0f} {encode_ms:>10.1f}"
+        for _, encoding, stream in encodings:
+            compressed, compress_ms = _timed(lambda: _compress(body, encoding, stream), repeat=1)
+            assert (zlib.decompress(compressed, 31) if encoding == "gzip" else brotli.decompress(compressed)) == body
+            row += f" {len(compressed) / 1024:>14,.0f} {compress_ms:>5.0f}"
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,67 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from typing import List
+from fastapi import FastAPI, HTTPException, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware  # <--- NEW
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
-from services.scraper_engine import master_scraper
-from services.ai_service import parse_tracking_data
+from services.pipeline import track_shipment
+from services.scraper_engine import HEDGE_STATS
+from services.batch import ndjson_stream, sse_stream
+from services.browser_pool import browser_pool
+from services.cache import tracking_cache, cache_key
+from services.store import shipment_store
+from services.scheduler import refresh_scheduler
+from services.history import event_history
+from services.jobs import job_queue, FINISHED
+from services.manifest import ingest_manifest, manifest_progress, manifest_items, ManifestError
+from services.reconcile import load_manifest_frame, build_report, export_report, records, EXPORT_FORMATS
+from services.worker import WorkerSupervisor
+from services.cargoes_flow import close_client
+from services.capture import close_replay_client
+from services.llm_gateway import close_llm_client, llm_report
+from services.utils import WAIT_STATS
+from services.resource_policy import resource_report
+from services.captcha import captcha_report
+from services.resilience import resilience_report
+from services.validation import validation_error, VALIDATION_STATS
+from services.metrics import metrics_response
+from services.responses import FastJSONResponse, VIEWS, parse_fields, project
+from services.compression import CompressionMiddleware
 from dotenv import load_dotenv
+import asyncio
+import json
+import logging
 import os
 
 load_dotenv()
 
-app = FastAPI()
+# Services log through `logging`; LOG_LEVEL=DEBUG shows per-step driver output and stage timings
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s %(levelname)-7s %(name)s: %(message)s",
+)
+
+workers = WorkerSupervisor()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm the shared Chromium pool once instead of launching per request
+    await browser_pool.start()
+    refresh_scheduler.start()
+    # Only the API process merges finished days of event history; workers just append
+    event_history.start(compact=True)
+    # Queued scrapes run in separate worker processes, each with its own browser pool
+    workers.start()
+    yield
+    await workers.stop()
+    await refresh_scheduler.stop()
+    await event_history.stop()
+    await browser_pool.stop()
+    await close_client()
+    await close_replay_client()
+    await close_llm_client()
+
+app = FastAPI(lifespan=lifespan, default_response_class=FastJSONResponse)
 
 # --- ENABLE CORS (Allow Frontend to connect) ---
 app.add_middleware(
@@ -18,24 +71,177 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# gzip/brotli for clients that send Accept-Encoding (NDJSON streams are flushed line by line)
+app.add_middleware(CompressionMiddleware)
 
 class TrackRequest(BaseModel):
     tracking_number: str
     carrier: str = ""
     type: str = "air"
+    force_refresh: bool = False  # Bypass the result cache for this lookup
+
+def _shape(view: str, fields: str):
+    # view=minimal|full|debug; fields=status,live_eta (overrides view)
+    if view not in VIEWS:
+        raise HTTPException(status_code=400, detail=f"view must be one of {', '.join(VIEWS)}")
+    return parse_fields(fields)
 
 @app.post("/track/single")
-async def track_single(request: TrackRequest):
-    # 1. Scrape/API
-    raw_text = await master_scraper(request.tracking_number, request.type, request.carrier)
-    # 2. AI Parse
-    ai_result = await parse_tracking_data(raw_text, request.carrier)
-
-    return {
-        "tracking_number": request.tracking_number,
-        "carrier": request.carrier,
-        "status": ai_result.get("status"),
-        "live_eta": ai_result.get("latest_date"),
-        "smart_summary": ai_result.get("summary"),
-        "raw_data_snippet": raw_text[:200]
-    }
+async def track_single(request: TrackRequest, view: str = "full", fields: str = ""):
+    selected = _shape(view, fields)
+    result = await track_shipment(request.tracking_number, request.type, request.carrier, request.force_refresh)
+    return FastJSONResponse(project(result, view, selected))
+
+def _watch_entries(requests: List[TrackRequest]):
+    # Numbers that fail validation would never produce a result to schedule from
+    return [
+        (cache_key(r.tracking_number, r.carrier, r.type), r.tracking_number, r.carrier, r.type)
+        for r in requests if not validation_error(r.tracking_number, r.type, r.carrier)
+    ]
+
+@app.post("/track/batch")
+async def track_batch(requests: List[TrackRequest], format: str = "ndjson", watch: bool = False,
+                      view: str = "full", fields: str = ""):
+    selected = _shape(view, fields)
+    # watch=true also hands the rows to the refresh scheduler (e.g. a daily manifest)
+    if watch:
+        await shipment_store.watch(_watch_entries(requests))
+    # Results stream back one line/event per shipment as soon as each finishes
+    if format == "sse":
+        return StreamingResponse(sse_stream(requests, view, selected), media_type="text/event-stream")
+    return StreamingResponse(ndjson_stream(requests, view, selected), media_type="application/x-ndjson")
+
+# --- JOB QUEUE (scrapes run in worker processes, not in the request) ---
+@app.post("/jobs")
+async def submit_jobs(requests: List[TrackRequest]):
+    ids = await job_queue.enqueue(r.model_dump() for r in requests)
+    return {"job_ids": ids}
+
+@app.get("/jobs/metrics")
+async def job_metrics():
+    return {"queue": await job_queue.counts(), **workers.snapshot()}
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, view: str = "full", fields: str = ""):
+    selected = _shape(view, fields)
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["result"]:
+        job["result"] = project(job["result"], view, selected)
+    return FastJSONResponse(job)
+
+async def _job_events(job_id: str, poll: float = 0.5):
+    last_status = None
+    while True:
+        job = await job_queue.get(job_id)
+        if job["status"] != last_status:
+            last_status = job["status"]
+            yield f"event: status\ndata: {json.dumps({'id': job_id, 'status': last_status})}\n\n"
+        if last_status in FINISHED:
+            yield f"event: result\ndata: {json.dumps(job)}\n\n"
+            return
+        await asyncio.sleep(poll)
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    # SSE: status changes as they happen, then the finished job
+    if await job_queue.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return StreamingResponse(_job_events(job_id), media_type="text/event-stream")
+
+# --- MANIFEST UPLOAD (XLSX/CSV parsed server-side, every unique shipment queued as a job) ---
+@app.post("/manifest")
+async def upload_manifest(file: UploadFile = File(...), watch: bool = False):
+    # The upload is spooled to disk and read in chunks, so 100k-row files don't sit in memory
+    try:
+        return await ingest_manifest(file.file, file.filename, watch)
+    except ManifestError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        await file.close()
+
+@app.get("/manifest/{manifest_id}")
+async def get_manifest(manifest_id: str):
+    manifest = await manifest_progress(manifest_id)
+    if manifest is None:
+        raise HTTPException(status_code=404, detail="Manifest not found")
+    return manifest
+
+@app.get("/manifest/{manifest_id}/items")
+async def get_manifest_items(manifest_id: str, offset: int = 0, limit: int = 500, view: str = "full", fields: str = ""):
+    selected = _shape(view, fields)
+    items = await manifest_items(manifest_id, offset, min(limit, 1000))
+    for item in items:
+        if item["result"]:
+            item["result"] = project(item["result"], view, selected)
+    return FastJSONResponse(items)
+
+@app.get("/manifest/{manifest_id}/reconcile")
+async def reconcile_manifest(manifest_id: str, format: str = "json", limit: int = 500):
+    # System ETA (from the sheet) vs live ETA (last tracked) for every shipment in the manifest
+    if format != "json" and format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be json or one of {', '.join(EXPORT_FORMATS)}")
+    frame = await load_manifest_frame(manifest_id)
+    if frame is None:
+        raise HTTPException(status_code=404, detail="Manifest not found")
+    report = await asyncio.to_thread(build_report, frame)
+    if format == "json":
+        return {
+            "manifest_id": manifest_id,
+            "summary": report["summary"],
+            "by_carrier": records(report["by_carrier"]),
+            "by_destination": records(report["by_destination"]),
+            "exceptions": records(report["exceptions"], limit),
+        }
+    content = await asyncio.to_thread(export_report, report, format)
+    return Response(
+        content=content,
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="reconcile-{manifest_id}.{format}"'},
+    )
+
+# --- SHIPMENT STORE / INCREMENTAL REFRESH ---
+@app.post("/shipments/watch")
+async def watch_shipments(requests: List[TrackRequest]):
+    entries = _watch_entries(requests)
+    await shipment_store.watch(entries)
+    return {"watched": len(entries), "rejected": len(requests) - len(entries)}
+
+@app.post("/shipments/unwatch")
+async def unwatch_shipments(requests: List[TrackRequest]):
+    await shipment_store.unwatch(key for key, *_ in _watch_entries(requests))
+    return {"unwatched": len(requests)}
+
+@app.get("/shipments/changes")
+async def shipment_changes(since: int = 0, limit: int = 100):
+    # Poll with since=<last id seen>; only real status/ETA changes are logged
+    return await shipment_store.changes(since, limit)
+
+@app.get("/shipments/metrics")
+async def shipment_metrics():
+    return {**await shipment_store.snapshot(), "scheduler": refresh_scheduler.snapshot(), "history": event_history.snapshot()}
+
+@app.get("/history/events")
+async def history_events(tracking_number: str = "", days: int = 30, limit: int = 1000):
+    # Every distinct event seen in the last `days` days (Parquet, partitioned by day), oldest first
+    return await event_history.query(tracking_number or None, days, min(limit, 10000))
+
+@app.get("/pool/metrics")
+async def pool_metrics():
+    return {**browser_pool.snapshot(), "waits": WAIT_STATS, "resources": await resource_report(), "captcha": captcha_report(), "breakers": resilience_report(), "hedging": HEDGE_STATS}
+
+@app.get("/llm/metrics")
+async def llm_metrics():
+    # Per model: calls, retries, coalesced duplicates, token usage, latency, TPM headroom; plus the last calls
+    return llm_report()
+
+@app.get("/cache/metrics")
+async def cache_metrics():
+    return {**tracking_cache.snapshot(), "validation": VALIDATION_STATS}
+
+@app.get("/metrics")
+async def metrics():
+    # Prometheus scrape target: mp_stage_duration_seconds{stage,carrier,outcome} + pool gauges
+    body, content_type = metrics_response()
+    return Response(content=body, media_type=content_type)
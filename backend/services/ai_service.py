@@ -1,12 +1,39 @@
+import logging
 import os
 import json
+import asyncio
 from datetime import datetime
-from openai import AsyncOpenAI
 from dotenv import load_dotenv
+from services.fast_parser import parse_structured
+from services.metrics import span
+from services.llm_gateway import chat, estimate_tokens
+
+logger = logging.getLogger(__name__)
 
 load_dotenv()
 
-client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# With LLM_BASE_URL on a local OpenAI-compatible server, set these to the models it serves
+PARSE_MODEL = os.getenv("LLM_PARSE_MODEL", "gpt-4o-mini")
+VISION_MODEL = os.getenv("LLM_VISION_MODEL", "gpt-4o")
+MAX_INPUT_CHARS = 4000
+
+# --- BATCH PARSING (override via .env) ---
+LLM_BATCH_TOKEN_BUDGET = int(os.getenv("LLM_BATCH_TOKEN_BUDGET", "12000"))  # Input tokens per batched request
+LLM_BATCH_MAX_ITEMS = int(os.getenv("LLM_BATCH_MAX_ITEMS", "10"))
+LLM_BATCH_CONCURRENCY = int(os.getenv("LLM_BATCH_CONCURRENCY", "4"))  # Batched requests in flight
+LLM_BATCH_WINDOW_MS = int(os.getenv("LLM_BATCH_WINDOW_MS", "300"))  # How long LLMBatcher waits to fill a batch
+LLM_BATCH_ENABLED = os.getenv("LLM_BATCH_ENABLED", "true").lower() in ("1", "true", "yes")
+
+_batch_limit = None
+
+
+def _get_batch_limit():
+    # Shared by every batch run so parallel uploads respect the same cap
+    global _batch_limit
+    if _batch_limit is None:
+        _batch_limit = asyncio.Semaphore(LLM_BATCH_CONCURRENCY)
+    return _batch_limit
+
 
 SYSTEM_PROMPT = """
 You are a Logistics Operations Manager.
@@ -44,37 +71,214 @@ JSON OUTPUT FORMAT:
 }
 """
 
+BATCH_PROMPT_SUFFIX = """
+BATCH MODE:
+- You will receive SEVERAL shipments. Each one starts with a line "### <tracking_number>".
+- Apply the rules above to each shipment independently.
+- Return ONE JSON object keyed by tracking number, each value in the format above:
+{
+  "<tracking_number>": {"latest_date": "string", "status": "string", "summary": "string"}
+}
+"""
+
+ERROR_RESULT = {"latest_date": "Error", "status": "AI Parse Failed", "summary": "Error analyzing data.", "parsed_by": "llm"}
+
+
+def _system_prompt(batch: bool = False):
+    # CALCULATE TODAY'S DATE
+    today = datetime.now().strftime("%d-%b-%Y")
+
+    # Simple replacement to avoid format() errors with JSON braces
+    prompt = SYSTEM_PROMPT.replace("{{CURRENT_DATE}}", today)
+    return prompt + BATCH_PROMPT_SUFFIX if batch else prompt
+
+
+def _local_result(raw_text: str):
+    """Answers that need no LLM call: too little data, or the deterministic fast path."""
+    if not raw_text or len(raw_text) < 50:
+        return {"latest_date": "N/A", "status": "Error", "summary": "Insufficient data.", "parsed_by": "none"}
+
+    # FAST PATH: deterministic rules, no network call
+    fast_result = parse_structured(raw_text)
+    if fast_result:
+        return {**fast_result, "parsed_by": "rules"}
+    return None
+
 async def parse_tracking_data(raw_text: str, carrier: str):
+    """
+    Returns {"latest_date", "status", "summary", "parsed_by"}.
+    Structured API payloads go through the local rule engine; the LLM only sees what it can't decide.
+    """
     try:
-        if not raw_text or len(raw_text) < 50:
-             return {"latest_date": "N/A", "status": "Error", "summary": "Insufficient data."}
+        local = _local_result(raw_text)
+        if local:
+            return local
 
-        # CALCULATE TODAY'S DATE
-        today = datetime.now().strftime("%d-%b-%Y")
+        # Fixed label: `carrier` is free user input and would make unbounded series
+        with span("llm", "single"):
+            response = await chat(
+                "parse",
+                model=PARSE_MODEL,
+                messages=[
+                    {"role": "system", "content": _system_prompt()},
+                    {"role": "user", "content": f"Carrier: {carrier}\n\nData:\n{raw_text[:MAX_INPUT_CHARS]}"}
+                ],
+                response_format={"type": "json_object"},
+                temperature=0
+            )
+        return {**json.loads(response.choices[0].message.content), "parsed_by": "llm"}
+    except Exception as e:
+        logger.warning("⚠️ AI Parse Error: %s", e)
+        return dict(ERROR_RESULT)
 
-        # Simple replacement to avoid format() errors with JSON braces
-        final_prompt = SYSTEM_PROMPT.replace("{{CURRENT_DATE}}", today)
+# --- BATCHED PARSING ---
+def _shipment_block(item):
+    return f"### {item['tracking_number']}\nCarrier: {item.get('carrier', '')}\nData:\n{item['raw_text'][:MAX_INPUT_CHARS]}\n"
 
-        response = await client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": final_prompt},
-                {"role": "user", "content": f"Carrier: {carrier}\n\nData:\n{raw_text[:4000]}"}
-            ],
-            response_format={"type": "json_object"},
-            temperature=0
-        )
-        return json.loads(response.choices[0].message.content)
-    except Exception as e:
-        print(f"   ⚠️ AI Parse Error: {e}")
-        return {"latest_date": "Error", "status": "AI Parse Failed", "summary": "Error analyzing data."}
+
+def pack_batches(items, token_budget: int = LLM_BATCH_TOKEN_BUDGET, max_items: int = LLM_BATCH_MAX_ITEMS):
+    """Greedily packs items into batches whose prompt stays within the token budget."""
+    overhead = estimate_tokens(_system_prompt(batch=True))
+    batches, current, used = [], [], overhead
+    for item in items:
+        cost = estimate_tokens(_shipment_block(item))
+        if current and (used + cost > token_budget or len(current) >= max_items):
+            batches.append(current)
+            current, used = [], overhead
+        current.append(item)
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _valid_result(value):
+    return isinstance(value, dict) and all(isinstance(value.get(k), str) for k in ("latest_date", "status", "summary"))
+
+
+async def _parse_one_batch(batch, limit):
+    """One chat-completion for a batch. Items missing or malformed in the reply are re-parsed singly."""
+    results = {}
+    if len(batch) > 1:
+        try:
+            async with limit:
+                with span("llm", "batch"):
+                    response = await chat(
+                        "parse_batch",
+                        model=PARSE_MODEL,
+                        messages=[
+                            {"role": "system", "content": _system_prompt(batch=True)},
+                            {"role": "user", "content": "\n".join(_shipment_block(item) for item in batch)}
+                        ],
+                        response_format={"type": "json_object"},
+                        temperature=0
+                    )
+            parsed = json.loads(response.choices[0].message.content)
+            if isinstance(parsed, dict):
+                for item in batch:
+                    value = parsed.get(item["tracking_number"])
+                    if _valid_result(value):
+                        results[item["tracking_number"]] = {**value, "parsed_by": "llm_batch"}
+        except Exception as e:
+            logger.warning("⚠️ AI Batch Parse Error (%s items): %s", len(batch), e)
+
+    leftovers = [item for item in batch if item["tracking_number"] not in results]
+    if leftovers and len(batch) > 1:
+        logger.info("🔁 Re-parsing %s/%s items individually...", len(leftovers), len(batch))
+    for item, value in zip(leftovers, await asyncio.gather(
+        *[_parse_single_limited(item, limit) for item in leftovers]
+    )):
+        results[item["tracking_number"]] = value
+    return results
+
+
+async def _parse_single_limited(item, limit):
+    async with limit:
+        return await parse_tracking_data(item["raw_text"], item.get("carrier", ""))
+
+
+async def parse_tracking_batch(items):
+    """
+    Parses many shipments with as few chat-completions as the token budget allows.
+    items: [{"tracking_number", "raw_text", "carrier"}]. Returns {tracking_number: result}.
+    """
+    results, pending = {}, []
+    for item in items:
+        local = _local_result(item["raw_text"])
+        if local:
+            results[item["tracking_number"]] = local
+        elif item["tracking_number"] not in results:
+            pending.append(item)
+
+    if pending:
+        limit = _get_batch_limit()
+        batches = pack_batches(pending)
+        logger.info("🧠 AI: %s shipments in %s batched request(s)", len(pending), len(batches))
+        for batch_results in await asyncio.gather(*[_parse_one_batch(batch, limit) for batch in batches]):
+            results.update(batch_results)
+    return results
+
+
+class LLMBatcher:
+    """
+    Collects parse requests from concurrent lookups and flushes them as one batch when the
+    token budget fills up or LLM_BATCH_WINDOW_MS passes. `parse` is a drop-in for parse_tracking_data.
+    """
+
+    def __init__(self, window_ms: int = LLM_BATCH_WINDOW_MS, token_budget: int = LLM_BATCH_TOKEN_BUDGET):
+        self.window = window_ms / 1000
+        self.token_budget = token_budget
+        self._pending = []  # (item, future)
+        self._tokens = 0
+        self._timer = None
+        self._seq = 0
+        self._tasks = set()  # Running flushes: the loop only keeps weak references to tasks
+
+    async def parse(self, raw_text: str, carrier: str, tracking_number: str = None):
+        local = _local_result(raw_text)
+        if local:
+            return local
+
+        self._seq += 1
+        # Keys must be unique inside one batch even if two rows share a number
+        item = {"tracking_number": f"{tracking_number or 'shipment'}#{self._seq}", "raw_text": raw_text, "carrier": carrier}
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((item, future))
+        self._tokens += estimate_tokens(_shipment_block(item))
+
+        if self._tokens >= self.token_budget or len(self._pending) >= LLM_BATCH_MAX_ITEMS:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending, self._tokens = self._pending, [], 0
+        if pending:
+            task = asyncio.create_task(self._run(pending))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, pending):
+        try:
+            results = await parse_tracking_batch([item for item, _ in pending])
+        except Exception as e:
+            logger.warning("⚠️ AI Batcher Error: %s", e)
+            results = {}
+        for item, future in pending:
+            if not future.done():
+                future.set_result(results.get(item["tracking_number"], dict(ERROR_RESULT)))
 
 # --- VISION CAPTCHA SOLVER ---
 async def solve_captcha_image(base64_image: str):
-    print("   🤖 Asking GPT-4o to solve CAPTCHA...")
+    logger.info("🤖 Asking %s to solve CAPTCHA...", VISION_MODEL)
     try:
-        response = await client.chat.completions.create(
-            model="gpt-4o",
+        response = await chat(
+            "captcha",
+            model=VISION_MODEL,
             messages=[
                 {
                     "role": "user",
@@ -93,5 +297,5 @@ async def solve_captcha_image(base64_image: str):
         )
         return response.choices[0].message.content.strip()
     except Exception as e:
-        print(f"   ❌ Vision Error: {e}")
+        logger.error("❌ Vision Error: %s", e)
         return None
@@ -0,0 +1,34 @@
+from services.registry import DriverSpec, register
+
+# --- AIR DRIVERS (routed by IATA airline prefix) ---
+register(DriverSpec(
+    name="air_india", module="services.air.air_india", func="drive_air_india", type="air",
+    prefixes=("098",), aliases=("air india", "ai"),
+))
+register(DriverSpec(
+    name="etihad", module="services.air.etihad", func="drive_etihad", type="air",
+    prefixes=("607",), aliases=("etihad", "ey"),
+    capabilities=frozenset({"full_number"}),  # Pass FULL number (with dash if needed)
+))
+register(DriverSpec(
+    name="china_airlines", module="services.air.china_airlines", func="drive_china_airlines", type="air",
+    prefixes=("297",), aliases=("china airlines", "ci"),
+    capabilities=frozenset({"captcha", "popup"}), max_concurrency=1,
+))
+register(DriverSpec(
+    name="silk_way", module="services.air.silk_way", func="drive_silk_way", type="air",
+    prefixes=("501", "463"), aliases=("silk way", "silkway", "7l"),
+    capabilities=frozenset({"iframe"}),
+))
+register(DriverSpec(
+    name="af_klm", module="services.air.af_klm", func="drive_af_klm", type="air",
+    prefixes=("057", "074"), aliases=("air france", "klm", "af", "kl", "afkl"),
+))
+register(DriverSpec(
+    name="saudia", module="services.air.saudia", func="drive_saudia", type="air",
+    prefixes=("065",), aliases=("saudia", "saudi", "sv"),
+))
+register(DriverSpec(
+    name="air_fallback", module="services.air.fallback", func="drive_air_fallback", type="air",
+    capabilities=frozenset({"popup"}), max_concurrency=3, fallback=True,
+))
@@ -1,5 +1,8 @@
-import asyncio
-from services.utils import human_type, kill_cookie_banners
+import logging
+from services.utils import human_type, kill_cookie_banners, wait_timeout
+
+logger = logging.getLogger(__name__)
+
 
 async def drive_af_klm(page, tracking_number):
     """
@@ -8,7 +11,7 @@ async def drive_af_klm(page, tracking_number):
     """
     # Clean the number (057-12345678 -> 05712345678)
     clean = tracking_number.replace(" ", "").replace("-", "")
-    print(f"✈️ [AF/KLM] Tracking: {clean}")
+    logger.info("✈️ [AF/KLM] Tracking: %s", clean)
 
     # 1. Navigate to Direct Search Page
     await page.goto("https://www.afklcargo.com/mycargo/shipment/singlesearch", timeout=60000)
@@ -20,7 +23,7 @@ async def drive_af_klm(page, tracking_number):
     # Selector based on formcontrolname or placeholder
     input_sel = "textarea[formcontrolname='track']"
 
-    print("   -> Typing AWB...")
+    logger.debug("Typing AWB...")
     await page.wait_for_selector(input_sel, state="visible")
     await human_type(page, input_sel, clean)
 
@@ -29,27 +32,31 @@ async def drive_af_klm(page, tracking_number):
     # We wait for it to become enabled.
     submit_btn = page.locator("button[type='submit']").first
 
-    # Force a small delay to let Angular/React detect the input
-    await asyncio.sleep(1)
-
-    if await submit_btn.is_disabled():
-        print("   -> Button still disabled. Triggering input events...")
+    # Let Angular/React detect the input: wait for the button to enable instead of sleeping
+    enabled_sel = "button[type='submit']:not([disabled])"
+    try:
+        await page.wait_for_selector(enabled_sel, timeout=wait_timeout("af_klm"))
+    except Exception:
+        logger.debug("Button still disabled. Triggering input events...")
         # Sometimes typing isn't enough, we trigger 'blur' or press Enter
         await page.locator(input_sel).press("Enter")
-        await asyncio.sleep(1)
+        try:
+            await page.wait_for_selector(enabled_sel, timeout=wait_timeout("af_klm"))
+        except Exception:
+            pass
 
     # 5. Click Track
-    print("   -> Clicking Track...")
+    logger.debug("Clicking Track...")
     await submit_btn.click()
 
     # 6. Wait for Results
-    print("   -> Waiting for results...")
+    logger.debug("Waiting for results...")
     # Wait for the result card or container
     # Usually has class 'shipment-details' or similar, but 'body' is safe fallback
     try:
         await page.wait_for_load_state("networkidle")
         await page.wait_for_selector("afkl-shipment-details, .shipment-status", timeout=20000)
     except:
-        print("   -> Specific selector timeout. Grabbing body text.")
+        logger.debug("Specific selector timeout. Grabbing body text.")
 
     return await page.inner_text("body")
\ No newline at end of file
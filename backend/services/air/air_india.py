@@ -1,6 +1,10 @@
+import logging
 import asyncio
 from services.utils import human_type, kill_cookie_banners
 
+logger = logging.getLogger(__name__)
+
+
 async def drive_air_india(page, tracking_number):
     """
     Air India Driver: Handles '098-12345678' split format.
@@ -10,7 +14,7 @@ async def drive_air_india(page, tracking_number):
     prefix = clean[:3]
     suffix = clean[3:]
 
-    print(f"✈️ [Air India] Split: {prefix} + {suffix}")
+    logger.info("✈️ [Air India] Split: %s + %s", prefix, suffix)
 
     await page.goto("https://cargo.airindia.com/in/en/track-shipment.html", timeout=60000)
 
@@ -25,19 +29,19 @@ async def drive_air_india(page, tracking_number):
     await page.fill("input[formcontrolname='airwayBillNumber']", suffix)
 
     # 4. Click Track
-    print("   -> Clicking Track button...")
+    logger.debug("Clicking Track button...")
     await page.click("button[title='Track Shipment']")
 
     # 5. Wait for Results (The Robust Way)
-    print("   -> Waiting for results...")
+    logger.debug("Waiting for results...")
 
     try:
         # We wait for the text "SHIPMENT DETAILS" or "Origin" which appears in the result table
         # This is better than looking for a specific class ID
         await page.wait_for_selector("text=SHIPMENT DETAILS", timeout=20000)
-        print("   -> 'SHIPMENT DETAILS' text found. Success.")
+        logger.debug("'SHIPMENT DETAILS' text found. Success.")
     except:
-        print("   -> Text match timed out. Trying generic load wait...")
+        logger.debug("Text match timed out. Trying generic load wait...")
         # Backup: Just wait for the network to stop loading things
         await page.wait_for_load_state("networkidle", timeout=5000)
 
@@ -1,28 +1,31 @@
-import base64
-import asyncio
-from services.utils import human_type, kill_cookie_banners
-from services.ai_service import solve_captcha_image
+import logging
+from services.utils import human_type, kill_cookie_banners, wait_for_image, is_context_warm
+from services.captcha import solve_captcha, record_outcome
+
+logger = logging.getLogger(__name__)
+
 
 async def drive_china_airlines(page, tracking_number):
     """
     China Airlines (CI) Driver
-    Features: AI Vision Captcha Solver + New Tab Handling + Frame Support
+    Features: Captcha Solver (cache -> local OCR -> AI Vision) + New Tab Handling + Frame Support
     """
     clean = tracking_number.replace(" ", "").replace("-", "")
     prefix = clean[:3]
     suffix = clean[3:]
 
-    print(f"✈️ [China Airlines] Split: {prefix} + {suffix}")
+    logger.info("✈️ [China Airlines] Split: %s + %s", prefix, suffix)
 
     url = "https://cargo.china-airlines.com/CCNetv2/content/home/index.aspx"
     await page.goto(url, timeout=60000)
 
-    # Cookie Handling
-    try: await page.click("button:has-text('I accept')", timeout=3000)
-    except: await kill_cookie_banners(page)
+    # Cookie Handling (skipped when the saved session already holds consent)
+    if not is_context_warm(page.context):
+        try: await page.click("button:has-text('I accept')", timeout=3000)
+        except: await kill_cookie_banners(page)
 
     # Menu Interaction
-    print("   -> Clicking 'Shipment Tracking' menu...")
+    logger.debug("Clicking 'Shipment Tracking' menu...")
     await page.click("#shipment_traking")
     await page.wait_for_selector("#shipment_traking_block", state="visible", timeout=5000)
 
@@ -32,65 +35,68 @@ async def drive_china_airlines(page, tracking_number):
 
     # CAPTCHA LOOP
     for attempt in range(2):
-        print(f"   🔐 Captcha Attempt {attempt+1}...")
+        logger.info("🔐 Captcha Attempt %s...", attempt+1)
 
         # Screenshot
         img_selector = "#imgVldCode_Index_ShipmentTracking"
         captcha_element = page.locator(img_selector)
         await captcha_element.wait_for(state="visible")
-        await asyncio.sleep(1)
+        await wait_for_image(page, img_selector, driver="china_airlines")
         img_bytes = await captcha_element.screenshot()
-        base64_img = base64.b64encode(img_bytes).decode('utf-8')
 
         # Solve
-        captcha_text = await solve_captcha_image(base64_img)
-        if not captcha_text: raise Exception("AI Vision failed")
+        solution = await solve_captcha(img_bytes)
+        if not solution: raise Exception("Captcha solvers failed")
 
         # Fill & Search
-        await page.fill("#txtVldCode_Index_ShipmentTracking", captcha_text)
-        print("   -> Clicking Search (Waiting for Popup)...")
+        await page.fill("#txtVldCode_Index_ShipmentTracking", solution.text)
+        logger.debug("Clicking Search (Waiting for Popup)...")
 
+        # Only the popup tells us whether the captcha was right; extraction errors below are not captcha errors
         try:
             async with page.expect_popup(timeout=10000) as popup_info:
                 await page.click("#button_st")
-
             new_page = await popup_info.value
-            await new_page.wait_for_load_state("domcontentloaded")
-            print("   ✅ Popup captured!")
-
-            # --- ROBUST EXTRACTION ---
-            # 1. Wait for network to settle (data loading)
-            await new_page.wait_for_load_state("networkidle", timeout=10000)
-
-            # 2. Check for Frames (Old sites love frames)
-            frames = new_page.frames
-            content = ""
-
-            if len(frames) > 1:
-                print(f"   -> Detected {len(frames)} frames. Scanning all...")
-                for frame in frames:
-                    try:
-                        text = await frame.inner_text("body")
-                        if len(text) > 50: # Only keep if it has substance
-                            content += f"\n--- FRAME DATA ---\n{text}"
-                    except: pass
-            else:
-                # No frames, just grab body
-                print("   -> No frames detected. Grabbing main body.")
-                content = await new_page.inner_text("body")
-
-            # 3. Final Verification
-            if len(content.strip()) < 10:
-                print("   ⚠️ Content empty! Dumping HTML instead.")
-                content = await new_page.content() # Fallback to HTML if text is empty
-
-            print(f"   -> Extracted {len(content)} characters.")
-            return content
-
         except Exception as e:
-            print(f"   ⚠️ Popup failed (Captcha likely wrong): {e}")
+            logger.warning("⚠️ Popup failed (Captcha likely wrong): %s", e)
+            await record_outcome(solution, False)
+            old_src = await captcha_element.get_attribute("src")
             await page.click("#imgbReGen_Index_ShipmentTracking")
-            await asyncio.sleep(2)
+            # Wait for the new captcha image rather than a fixed 2s
+            await wait_for_image(page, img_selector, previous_src=old_src, driver="china_airlines", timeout=3000)
             continue
 
+        logger.info("✅ Popup captured!")
+        await record_outcome(solution, True)
+        await new_page.wait_for_load_state("domcontentloaded")
+
+        # --- ROBUST EXTRACTION ---
+        # 1. Wait for network to settle (data loading)
+        await new_page.wait_for_load_state("networkidle", timeout=10000)
+
+        # 2. Check for Frames (Old sites love frames)
+        frames = new_page.frames
+        content = ""
+
+        if len(frames) > 1:
+            logger.debug("Detected %s frames. Scanning all...", len(frames))
+            for frame in frames:
+                try:
+                    text = await frame.inner_text("body")
+                    if len(text) > 50: # Only keep if it has substance
+                        content += f"\n--- FRAME DATA ---\n{text}"
+                except: pass
+        else:
+            # No frames, just grab body
+            logger.debug("No frames detected. Grabbing main body.")
+            content = await new_page.inner_text("body")
+
+        # 3. Final Verification
+        if len(content.strip()) < 10:
+            logger.warning("⚠️ Content empty! Dumping HTML instead.")
+            content = await new_page.content() # Fallback to HTML if text is empty
+
+        logger.debug("Extracted %s characters.", len(content))
+        return content
+
     raise Exception("Failed to solve Captcha after 2 attempts.")
@@ -1,5 +1,9 @@
+import logging
 import asyncio
-from services.utils import human_type, kill_cookie_banners
+from services.utils import human_type, kill_cookie_banners, wait_ready
+
+logger = logging.getLogger(__name__)
+
 
 async def drive_etihad(page, tracking_number):
     """
@@ -11,7 +15,7 @@ async def drive_etihad(page, tracking_number):
     # Actually, aggregators usually prefer the raw clean number.
     clean = tracking_number.replace(" ", "").replace("-", "")
 
-    print(f"✈️ [Etihad] Routing via ParcelsApp: {clean}")
+    logger.info("✈️ [Etihad] Routing via ParcelsApp: %s", clean)
 
     await page.goto("https://parcelsapp.com/en/carriers/ethihad-airways-cargo", timeout=60000)
 
@@ -25,24 +29,28 @@ async def drive_etihad(page, tracking_number):
 
     # 2. Click Track
     # Selector: <button class="btn btn-default btn-parcels">
-    print("   -> Clicking Track...")
+    # ParcelsApp results usually appear in a div with class 'states' or 'tracking-info'
+    # Start listening before the click so a fast AJAX response isn't missed
+    ready = asyncio.create_task(wait_ready(
+        page, driver="etihad",
+        response=r"parcelsapp\.com/api/.*track",
+        selector=".states, .tracking-info, .alert-danger",
+    ))
+    logger.debug("Clicking Track...")
     await page.click("button.btn-parcels")
 
     # 3. Wait for Results
-    print("   -> Waiting for results...")
+    logger.debug("Waiting for results...")
     try:
-        # ParcelsApp results usually appear in a div with class 'states' or 'tracking-info'
-        # We wait for the spinner to disappear or content to appear
-        await asyncio.sleep(5) # Initial wait for AJAX
-
-        # Wait for any text indicating results
-        await page.wait_for_selector(".states, .tracking-info, .alert-danger", timeout=20000)
+        if await ready == "response":
+            # Data is in; give the DOM a moment to render it
+            await wait_ready(page, driver="etihad", label="render", selector=".states, .tracking-info, .alert-danger", timeout=5000)
 
         # Extract
         content = await page.inner_text("body")
-        print(f"   -> Extracted {len(content)} chars.")
+        logger.debug("Extracted %s chars.", len(content))
         return content
 
     except Exception as e:
-        print(f"   ⚠️ Timeout waiting for ParcelsApp results: {e}")
+        logger.warning("⚠️ Timeout waiting for ParcelsApp results: %s", e)
         return await page.inner_text("body")
@@ -1,11 +1,18 @@
 import asyncio
+import logging
 from playwright.async_api import Page
+from services.utils import wait_ready, number_pattern
+
+TRACK_TRACE_URL = r"track-trace\.com"
+
+logger = logging.getLogger(__name__)
+
 
 async def drive_air_fallback(page: Page, tracking_number: str):
     """
     Service: Track-Trace Air Fallback
     """
-    print(f"✈️ [Fallback] Routing {tracking_number} to Track-Trace...")
+    logger.info("✈️ [Fallback] Routing %s to Track-Trace...", tracking_number)
 
     await page.goto("https://www.track-trace.com/aircargo", timeout=45000)
 
@@ -18,15 +25,22 @@ async def drive_air_fallback(page: Page, tracking_number: str):
         new_page = await popup_info.value
         await new_page.wait_for_load_state("domcontentloaded")
 
+        # Only the airline's page counts: its text shows the AWB, or an XHR asks for it
+        pattern = number_pattern(tracking_number)
+        ready = asyncio.create_task(wait_ready(
+            new_page, driver="air_fallback", response=pattern,
+            text_stable="body", text_pattern=pattern, away_from=TRACK_TRACE_URL,
+        ))
+
         # Interstitial
         try:
             btn = new_page.get_by_text("I'm sure, continue with", exact=False)
             if await btn.is_visible(timeout=3000): await btn.click()
         except: pass
 
-        await asyncio.sleep(5)
+        await ready
         return await new_page.inner_text("body")
 
     except Exception as e:
-        print(f"   ❌ Fallback Error: {e}")
+        logger.error("❌ Fallback Error: %s", e)
         return "Fallback failed."
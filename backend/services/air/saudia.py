@@ -1,5 +1,9 @@
-import asyncio
-from services.utils import human_type, kill_cookie_banners
+import logging
+from services.utils import human_type, kill_cookie_banners, wait_ready
+from services.reducer import reduce_raw_text
+
+logger = logging.getLogger(__name__)
+
 
 async def drive_saudia(page, tracking_number):
     """
@@ -8,7 +12,7 @@ async def drive_saudia(page, tracking_number):
     """
     # Clean the number (065-12345678 -> 06512345678)
     clean = tracking_number.replace(" ", "").replace("-", "")
-    print(f"✈️ [Saudia] Tracking: {clean}")
+    logger.info("✈️ [Saudia] Tracking: %s", clean)
 
     # 1. Navigate
     await page.goto("https://saudiacargo.com/en/digital-services?tab=trackShipment", timeout=60000)
@@ -20,7 +24,7 @@ async def drive_saudia(page, tracking_number):
     # Target: <input placeholder="Enter AWB Number">
     input_sel = "input[placeholder='Enter AWB Number']"
 
-    print("   -> Waiting for input...")
+    logger.debug("Waiting for input...")
     await page.wait_for_selector(input_sel, state="visible")
 
     # Clear and Type
@@ -30,35 +34,35 @@ async def drive_saudia(page, tracking_number):
 
     # 4. Click Submit
     # Target: <button ...>Submit</button>
-    print("   -> Clicking Submit...")
+    logger.debug("Clicking Submit...")
     submit_btn = page.locator("button").filter(has_text="Submit")
     await submit_btn.click()
 
     # 5. Wait for Results
-    print("   -> Waiting for data...")
+    logger.debug("Waiting for data...")
     try:
         # Wait for network requests to finish (API calls) - be more lenient
         try:
             await page.wait_for_load_state("networkidle", timeout=20000)
-            print("   -> Network idle reached")
+            logger.debug("Network idle reached")
         except:
-            print("   -> Network idle timeout, continuing anyway...")
+            logger.debug("Network idle timeout, continuing anyway...")
 
-        # Wait a bit more for dynamic content to load
-        await asyncio.sleep(5)
-        print("   -> Waited for dynamic content")
+        # Wait for dynamic content: results table, error banner or settled page text
+        await wait_ready(page, driver="saudia", selector="table, .text-red-600", text_stable="body")
+        logger.debug("Waited for dynamic content")
 
         # Check if error message appeared
         try:
             if await page.locator(".text-red-600").is_visible():
-                print("   ⚠️ Site reported an error (Invalid AWB or System Down).")
+                logger.warning("⚠️ Site reported an error (Invalid AWB or System Down).")
                 return "Error: Invalid AWB or system error"
         except:
             pass  # Element might not exist
 
         # First, let's see what's actually on the page now
         current_url = page.url
-        print(f"   -> Current URL: {current_url}")
+        logger.debug("Current URL: %s", current_url)
 
         # Try to find the results container - look for any element containing tracking data
         # Based on the HTML you showed, look for elements with AWB, Status, Date, etc.
@@ -89,7 +93,7 @@ async def drive_saudia(page, tracking_number):
                 elements = page.locator(selector)
                 count = await elements.count()
                 if count > 0:
-                    print(f"   -> Checking {count} elements with selector: {selector}")
+                    logger.debug("Checking %s elements with selector: %s", count, selector)
                     # Extract text from all matching elements
                     for i in range(min(count, 10)):  # Limit to first 10 to avoid spam
                         element = elements.nth(i)
@@ -99,20 +103,20 @@ async def drive_saudia(page, tracking_number):
                             has_tracking = any(indicator in text for indicator in tracking_indicators)
                             if has_tracking:
                                 results_content += f"\n--- TRACKING DATA ---\n{text}\n"
-                                print(f"   -> Found tracking data in element {i}: {len(text)} chars")
+                                logger.debug("Found tracking data in element %s: %s chars", i, len(text))
                     if results_content:
                         break
             except Exception as e:
-                print(f"   -> Selector {selector} failed: {e}")
+                logger.debug("Selector %s failed: %s", selector, e)
                 continue
 
         # If we found specific results, return them
         if results_content:
-            print(f"   -> Extracted specific results: {len(results_content)} chars")
+            logger.debug("Extracted specific results: %s chars", len(results_content))
             return results_content
 
         # Fallback: Extract body but look for tracking data specifically
-        print("   -> No specific results found, scanning entire page...")
+        logger.debug("No specific results found, scanning entire page...")
         body_text = await page.inner_text("body")
 
         # Look for tracking-related keywords and patterns
@@ -120,37 +124,17 @@ async def drive_saudia(page, tracking_number):
         has_tracking_data = any(keyword in body_text for keyword in tracking_keywords)
 
         if has_tracking_data:
-            print("   -> Found tracking keywords in body text")
-            # Extract just the relevant parts - look for lines that contain tracking info
-            lines = body_text.split('\n')
-            tracking_lines = []
-
-            # Collect lines that have tracking data
-            for line in lines:
-                line = line.strip()
-                if not line:
-                    continue
-
-                # Check if line contains tracking keywords or looks like data (contains dates, times, etc.)
-                has_keyword = any(keyword in line for keyword in tracking_keywords)
-                has_data_pattern = any(pattern in line for pattern in [":", "-", "/", "Local Time", "Flight", "Departed", "Arrived"])
-
-                if has_keyword or (has_data_pattern and len(line) > 5):
-                    tracking_lines.append(line)
-
-            if tracking_lines:
-                result = '\n'.join(tracking_lines)
-                print(f"   -> Extracted {len(tracking_lines)} tracking lines, {len(result)} chars")
-                return result
-
-            # If no specific lines found, return the whole body but limit it
-            return body_text[:5000]  # Limit to avoid too much data
+            logger.debug("Found tracking keywords in body text")
+            # Shared reducer keeps event rows, dates, codes and flights; drops menus/footers
+            result = reduce_raw_text(body_text)
+            logger.debug("Reduced body to %s chars", len(result))
+            return result[:5000]  # Limit to avoid too much data
         else:
-            print("   ⚠️ No tracking data found in response")
+            logger.warning("⚠️ No tracking data found in response")
             return "Error: No tracking data found"
 
     except Exception as e:
-        print(f"   ⚠️ Wait Error: {e}")
+        logger.warning("⚠️ Wait Error: %s", e)
         # Even on error, try to get whatever is there
         try:
             return await page.inner_text("body")
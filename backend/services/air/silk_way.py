@@ -1,5 +1,8 @@
-import asyncio
-from services.utils import human_type, kill_cookie_banners
+import logging
+from services.utils import human_type, kill_cookie_banners, wait_ready
+
+logger = logging.getLogger(__name__)
+
 
 async def drive_silk_way(page, tracking_number):
     """
@@ -11,7 +14,7 @@ async def drive_silk_way(page, tracking_number):
     prefix = clean[:3]
     suffix = clean[3:]
 
-    print(f"✈️ [Silk Way] Split: {prefix} + {suffix}")
+    logger.info("✈️ [Silk Way] Split: %s + %s", prefix, suffix)
 
     await page.goto("https://www.silkwaywest.com/e-services/shipment-tracking/", timeout=60000)
 
@@ -25,15 +28,15 @@ async def drive_silk_way(page, tracking_number):
     await page.fill("input[name='awb']", suffix)
 
     # 3. Click Track
-    print("   -> Clicking Track...")
+    logger.debug("Clicking Track...")
     await page.click(".call_iframe")
 
     # 4. Handle the iFrame
-    print("   -> Waiting for iFrame container...")
+    logger.debug("Waiting for iFrame container...")
     await page.wait_for_selector(".iframe_block", state="visible", timeout=10000)
 
-    # Wait for the iframe source to load (Critical delay)
-    await asyncio.sleep(5)
+    # Wait for the iframe source to load (resolves on frame navigation, not a fixed 5s)
+    await wait_ready(page, driver="silk_way", label="iframe", frame=".iframe_block iframe")
 
     # GET FRAME PROPERLY
     frame_element = await page.wait_for_selector(".iframe_block iframe")
@@ -42,7 +45,7 @@ async def drive_silk_way(page, tracking_number):
     if not frame:
         raise Exception("Could not attach to tracking iFrame.")
 
-    print("   -> Attached to iFrame. Waiting for data table...")
+    logger.debug("Attached to iFrame. Waiting for data table...")
 
     try:
         # Wait for the table rows to appear inside the frame
@@ -53,14 +56,14 @@ async def drive_silk_way(page, tracking_number):
         # We use evaluate to get innerText which preserves formatting better
         text = await frame.evaluate("document.body.innerText")
 
-        print(f"   -> Extracted {len(text)} chars from iFrame.")
+        logger.debug("Extracted %s chars from iFrame.", len(text))
 
         if len(text) < 50:
-            print("   ⚠️ Text too short. Dumping HTML.")
+            logger.warning("⚠️ Text too short. Dumping HTML.")
             return await frame.content()
 
         return text
 
     except Exception as e:
-        print(f"   ⚠️ Frame Read Error: {e}")
+        logger.warning("⚠️ Frame Read Error: %s", e)
         return await frame.content()
@@ -0,0 +1,148 @@
+import logging
+import os
+import asyncio
+from services.pipeline import track_shipment
+from services.ai_service import LLMBatcher, LLM_BATCH_ENABLED
+from services.cache import tracking_cache, cache_key
+from services.cargoes_flow import start_prefetch
+from services.registry import resolve
+from services.utils import normalize_tracking_number
+from services.validation import validation_error, negative_key, api_miss_key
+from services.responses import dumps, project
+
+logger = logging.getLogger(__name__)
+
+# --- CONCURRENCY LIMITS (override via .env) ---
+GLOBAL_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+# Unset: each driver's own max_concurrency from the registry
+PER_CARRIER_OVERRIDE = os.getenv("BATCH_PER_CARRIER_CONCURRENCY")
+
+# Shared across all running batches so two uploads can't double the load on a carrier
+_global_limit = None
+_carrier_limits = {}
+
+
+def _limits(spec):
+    global _global_limit
+    if _global_limit is None:
+        _global_limit = asyncio.Semaphore(GLOBAL_CONCURRENCY)
+    if spec.name not in _carrier_limits:
+        size = int(PER_CARRIER_OVERRIDE) if PER_CARRIER_OVERRIDE else spec.max_concurrency
+        _carrier_limits[spec.name] = asyncio.Semaphore(size)
+    return _global_limit, _carrier_limits[spec.name]
+
+
+def dedupe(rows):
+    """
+    Collapses rows that share a normalized tracking number.
+    Returns {key: {"row": first_row, "row_indexes": [...]}} in first-seen order.
+    """
+    unique = {}
+    for index, row in enumerate(rows):
+        clean = normalize_tracking_number(row.tracking_number)
+        if not clean:
+            continue
+        key = (clean, row.type)
+        if key not in unique:
+            unique[key] = {"row": row, "row_indexes": []}
+        elif row.force_refresh:
+            # Any duplicate asking for a refresh refreshes the shared lookup
+            unique[key]["row"] = row
+        unique[key]["row_indexes"].append(index)
+    return unique
+
+
+async def _track_one(key, entry, batcher):
+    clean, carrier_type = key
+    row = entry["row"]
+    parse = None
+    if batcher:
+        parse = lambda raw_text, carrier: batcher.parse(raw_text, carrier, clean)
+    # Limits are per scraping driver (e.g. every unknown prefix shares the track-trace fallback)
+    global_limit, carrier_limit = _limits(resolve(row.tracking_number, carrier_type, row.carrier))
+
+    # Per-carrier slot first, so a slow carrier queues without holding global slots
+    async with carrier_limit:
+        async with global_limit:
+            try:
+                result = await track_shipment(row.tracking_number, row.type, row.carrier, row.force_refresh, parse)
+            except Exception as e:
+                logger.error("❌ Batch row failed (%s): %s", row.tracking_number, e)
+                result = {
+                    "tracking_number": row.tracking_number,
+                    "carrier": row.carrier,
+                    "status": "Error",
+                    "live_eta": "N/A",
+                    "smart_summary": f"Error: {e}",
+                    "raw_data_snippet": "",
+                    "timeline": [],
+                }
+    result["row_indexes"] = entry["row_indexes"]
+    return result
+
+
+async def _needs_api(row, carrier_type):
+    # Invalid, recently-not-found or known-to-be-missing-upstream rows skip the bulk query
+    if validation_error(row.tracking_number, carrier_type, row.carrier):
+        return False
+    if row.force_refresh:
+        return True
+    cached = await asyncio.gather(
+        tracking_cache.get(cache_key(row.tracking_number, row.carrier, carrier_type)),
+        tracking_cache.get(negative_key(row.tracking_number, carrier_type)),
+        tracking_cache.get(api_miss_key(row.tracking_number, carrier_type)),
+    )
+    return not any(cached)
+
+
+async def _prefetch_tier1(unique):
+    """
+    Starts resolving Cargoes Flow in bulk for every uncached row. Returns the background tasks;
+    rows don't wait for the whole prefetch, only for the chunk holding their number.
+    """
+    keys = list(unique)
+    wanted = await asyncio.gather(*[_needs_api(unique[key]["row"], key[1]) for key in keys])
+    pending = {}
+    for (clean, carrier_type), needed in zip(keys, wanted):
+        if needed:
+            pending.setdefault(carrier_type, []).append(clean)
+    tasks = [start_prefetch(numbers, carrier_type) for carrier_type, numbers in pending.items()]
+    return [task for task in tasks if task]
+
+
+async def stream_batch(rows):
+    """
+    Tracks every unique row concurrently and yields each result as soon as it finishes.
+    """
+    unique = dedupe(rows)
+    logger.info("📦 Batch: %s rows -> %s unique shipments", len(rows), len(unique))
+
+    try:
+        prefetch = await _prefetch_tier1(unique)
+    except Exception as e:
+        # Rows fall back to their own per-number API call
+        logger.warning("⚠️ Batch API prefetch failed: %s", e)
+        prefetch = []
+
+    # Rows that need the LLM share batched chat-completions instead of one call each
+    batcher = LLMBatcher() if LLM_BATCH_ENABLED else None
+    tasks = [asyncio.create_task(_track_one(key, entry, batcher)) for key, entry in unique.items()]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            yield await finished
+    finally:
+        # Client disconnected or batch aborted: stop any work still queued
+        for task in tasks + prefetch:
+            if not task.done():
+                task.cancel()
+
+
+async def ndjson_stream(rows, view="full", fields=None):
+    async for result in stream_batch(rows):
+        yield dumps(project(result, view, fields)) + b"\n"
+
+
+async def sse_stream(rows, view="full", fields=None):
+    async for result in stream_batch(rows):
+        yield b"event: result\ndata: " + dumps(project(result, view, fields)) + b"\n\n"
+    yield b"event: done\ndata: {}\n\n"
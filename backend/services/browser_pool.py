@@ -0,0 +1,161 @@
+import logging
+import os
+import time
+import asyncio
+from contextlib import asynccontextmanager
+from playwright.async_api import async_playwright
+from dotenv import load_dotenv
+from services.utils import STEALTH_ARGS
+from services.metrics import register_pool_gauges
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# --- POOL CONFIG (override via .env) ---
+POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "2"))
+MAX_USES = int(os.getenv("BROWSER_MAX_USES", "50"))  # Contexts served before a browser is recycled
+HEADLESS = os.getenv("BROWSER_HEADLESS", "false").lower() in ("1", "true", "yes")
+VIEWPORT = {'width': 1920, 'height': 1080}
+
+
+class _Slot:
+    """One long-lived Chromium process and its usage counter."""
+
+    def __init__(self, index):
+        self.index = index
+        self.browser = None
+        self.uses = 0
+
+
+class BrowserPool:
+    """
+    Long-lived pool of Chromium browsers.
+    Each lease gets a fresh, isolated context on a pooled browser.
+    Browsers are recycled after MAX_USES leases or when a lease crashes.
+    """
+
+    def __init__(self, size=POOL_SIZE, max_uses=MAX_USES, headless=HEADLESS):
+        self.size = size
+        self.max_uses = max_uses
+        self.headless = headless
+        self._playwright = None
+        self._idle = None
+        self._slots = []
+        self._start_lock = asyncio.Lock()
+        self.metrics = {
+            "leased": 0,
+            "recycled": 0,
+            "crashes": 0,
+            "launches": 0,
+            "total_leases": 0,
+            "last_launch_ms": 0.0,
+            "avg_launch_ms": 0.0,
+        }
+
+    @property
+    def started(self):
+        return self._playwright is not None
+
+    async def start(self):
+        async with self._start_lock:
+            if self.started:
+                return
+            logger.info("🧭 Starting browser pool (size=%s, headless=%s)...", self.size, self.headless)
+            self._playwright = await async_playwright().start()
+            self._idle = asyncio.Queue()
+            self._slots = [_Slot(i) for i in range(self.size)]
+            for slot in self._slots:
+                await self._launch(slot)
+                self._idle.put_nowait(slot)
+
+    async def stop(self):
+        if not self.started:
+            return
+        logger.info("🧭 Stopping browser pool...")
+        for slot in self._slots:
+            await self._close(slot)
+        await self._playwright.stop()
+        self._playwright = None
+        self._slots = []
+
+    async def _launch(self, slot):
+        t0 = time.perf_counter()
+        slot.browser = await self._playwright.chromium.launch(headless=self.headless, args=STEALTH_ARGS)
+        slot.uses = 0
+        elapsed = (time.perf_counter() - t0) * 1000
+
+        m = self.metrics
+        m["launches"] += 1
+        m["last_launch_ms"] = round(elapsed, 1)
+        m["avg_launch_ms"] = round(m["avg_launch_ms"] + (elapsed - m["avg_launch_ms"]) / m["launches"], 1)
+
+    async def _close(self, slot):
+        if slot.browser is None:
+            return
+        try:
+            await slot.browser.close()
+        except Exception:
+            pass
+        slot.browser = None
+
+    async def _recycle(self, slot):
+        await self._close(slot)
+        self.metrics["recycled"] += 1
+        await self._launch(slot)
+
+    @asynccontextmanager
+    async def lease(self, **context_options):
+        """Yields an isolated BrowserContext. Extra kwargs go to new_context()."""
+        if not self.started:
+            await self.start()
+
+        slot = await self._idle.get()
+        self.metrics["leased"] += 1
+        self.metrics["total_leases"] += 1
+        crashed = False
+        context = None
+        try:
+            if slot.browser is None or not slot.browser.is_connected():
+                await self._recycle(slot)
+            options = {"viewport": VIEWPORT, **context_options}
+            context = await slot.browser.new_context(**options)
+            yield context
+        except Exception:
+            crashed = True
+            raise
+        finally:
+            if context is not None:
+                try:
+                    await context.close()
+                except Exception:
+                    crashed = True
+            slot.uses += 1
+            if slot.browser is None or not slot.browser.is_connected():
+                crashed = True
+            try:
+                if crashed:
+                    self.metrics["crashes"] += 1
+                if crashed or slot.uses >= self.max_uses:
+                    await self._recycle(slot)
+            except Exception as e:
+                logger.warning("⚠️ Browser relaunch failed: %s", e)
+            finally:
+                self.metrics["leased"] -= 1
+                self._idle.put_nowait(slot)
+
+    def snapshot(self):
+        idle = self._idle.qsize() if self._idle else 0
+        return {
+            "size": self.size,
+            "headless": self.headless,
+            "max_uses": self.max_uses,
+            "started": self.started,
+            "idle": idle,
+            **self.metrics,
+        }
+
+
+# Shared instance used by master_scraper and started from the FastAPI lifespan
+browser_pool = BrowserPool()
+register_pool_gauges(browser_pool)
@@ -0,0 +1,192 @@
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import threading
+from collections import OrderedDict
+from dotenv import load_dotenv
+from services.utils import DATA_DIR, normalize_tracking_number
+
+load_dotenv()
+
+# --- CACHE CONFIG (override via .env) ---
+CACHE_ENABLED = os.getenv("CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+CACHE_MEMORY_SIZE = int(os.getenv("CACHE_MEMORY_SIZE", "5000"))
+CACHE_DB_PATH = os.getenv("CACHE_DB_PATH", os.path.join(DATA_DIR, "tracking_cache.sqlite3"))
+
+# TTL (seconds) by parsed status. Finished shipments barely change, moving ones do.
+STATUS_TTLS = [
+    ("delivered", int(os.getenv("CACHE_TTL_DELIVERED", str(3 * 24 * 3600)))),
+    ("discharged", int(os.getenv("CACHE_TTL_DISCHARGED", str(12 * 3600)))),
+    ("arrived", int(os.getenv("CACHE_TTL_ARRIVED", str(6 * 3600)))),
+    ("in transit", int(os.getenv("CACHE_TTL_IN_TRANSIT", str(15 * 60)))),
+]
+DEFAULT_TTL = int(os.getenv("CACHE_TTL_DEFAULT", str(15 * 60)))
+# Failed lookups are never cached, the next request should retry
+# ("not found" goes to the shorter-lived negative cache instead, see services/validation.py)
+UNCACHEABLE_STATUSES = ("error", "ai parse failed", "not found")
+
+
+def cache_key(tracking_number: str, carrier: str, carrier_type: str):
+    return f"{carrier_type}|{str(carrier).strip().lower()}|{normalize_tracking_number(tracking_number)}"
+
+
+def ttl_for_status(status):
+    """Returns the TTL for a parsed status, or 0 if the result must not be cached."""
+    status_lower = str(status or "").lower()
+    if not status_lower or any(bad in status_lower for bad in UNCACHEABLE_STATUSES):
+        return 0
+    for keyword, ttl in STATUS_TTLS:
+        if keyword in status_lower:
+            return ttl
+    return DEFAULT_TTL
+
+
+class SingleFlight:
+    """
+    Concurrent calls with the same key share one run. The run is its own task, so a caller that
+    is cancelled (e.g. a disconnected batch) only stops waiting; the run is cancelled once nobody waits.
+    """
+
+    def __init__(self):
+        self._runs = {}  # key -> [task, waiters]
+
+    def __contains__(self, key):
+        return key in self._runs
+
+    def __len__(self):
+        return len(self._runs)
+
+    async def run(self, key, start):
+        """Awaits the run for `key`, starting it with `start()` (a coroutine) if none is in flight."""
+        entry = self._runs.get(key)
+        if entry is None:
+            entry = self._runs[key] = [asyncio.create_task(start()), 0]
+            entry[0].add_done_callback(lambda _: self._forget(key, entry))
+        task = entry[0]
+        entry[1] += 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0 and not task.done():
+                # Last waiter gave up: nobody wants the result any more
+                self._forget(key, entry)
+                task.cancel()
+
+    def _forget(self, key, entry):
+        if self._runs.get(key) is entry:
+            del self._runs[key]
+
+
+class TrackingCache:
+    """
+    Two tiers: an in-process LRU in front of a SQLite file that survives restarts.
+    Concurrent lookups for the same key share a single fetch.
+    """
+
+    def __init__(self, db_path=CACHE_DB_PATH, memory_size=CACHE_MEMORY_SIZE):
+        self.db_path = db_path
+        self.memory_size = memory_size
+        self._memory = OrderedDict()  # key -> (expires_at, value)
+        self._inflight = SingleFlight()
+        self._db = None
+        self._db_lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "coalesced": 0}
+
+    # --- DISK TIER ---
+    def _conn(self):
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, expires_at REAL, value TEXT)"
+            )
+        return self._db
+
+    def _disk_get(self, key):
+        with self._db_lock:
+            row = self._conn().execute("SELECT expires_at, value FROM results WHERE key = ?", (key,)).fetchone()
+        if not row:
+            return None
+        return row[0], json.loads(row[1])
+
+    def _disk_set(self, key, expires_at, value):
+        with self._db_lock:
+            db = self._conn()
+            db.execute(
+                "INSERT OR REPLACE INTO results (key, expires_at, value) VALUES (?, ?, ?)",
+                (key, expires_at, json.dumps(value)),
+            )
+            db.commit()
+
+    def _disk_delete(self, key):
+        with self._db_lock:
+            db = self._conn()
+            db.execute("DELETE FROM results WHERE key = ?", (key,))
+            db.commit()
+
+    # --- MEMORY TIER ---
+    def _remember(self, key, expires_at, value):
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    async def get(self, key):
+        now = time.time()
+        entry = self._memory.get(key)
+        if entry:
+            if entry[0] > now:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return entry[1]
+            del self._memory[key]
+
+        entry = await asyncio.to_thread(self._disk_get, key)
+        if entry and entry[0] > now:
+            self._remember(key, *entry)
+            self.stats["disk_hits"] += 1
+            return entry[1]
+        return None
+
+    async def set(self, key, value, ttl):
+        if ttl <= 0 or not CACHE_ENABLED:
+            return
+        expires_at = time.time() + ttl
+        self._remember(key, expires_at, value)
+        await asyncio.to_thread(self._disk_set, key, expires_at, value)
+
+    async def invalidate(self, key):
+        self._memory.pop(key, None)
+        await asyncio.to_thread(self._disk_delete, key)
+
+    async def get_or_fetch(self, key, fetch, force_refresh=False):
+        """
+        Returns (value, hit). `fetch` is an async callable producing the result dict;
+        its "status" decides the TTL.
+        """
+        if CACHE_ENABLED and not force_refresh:
+            cached = await self.get(key)
+            if cached is not None:
+                return cached, True
+
+        # Single-flight: piggyback on a fetch that is already running for this key
+        if key in self._inflight:
+            self.stats["coalesced"] += 1
+        else:
+            self.stats["misses"] += 1
+        return await self._inflight.run(key, lambda: self._fetch_and_store(key, fetch)), False
+
+    async def _fetch_and_store(self, key, fetch):
+        value = await fetch()
+        await self.set(key, value, ttl_for_status(value.get("status")))
+        return value
+
+    def snapshot(self):
+        return {"memory_entries": len(self._memory), "inflight": len(self._inflight), **self.stats}
+
+
+tracking_cache = TrackingCache()
@@ -0,0 +1,172 @@
+import logging
+import os
+import io
+import re
+import json
+import time
+import base64
+import asyncio
+import hashlib
+from dataclasses import dataclass
+from dotenv import load_dotenv
+from services.utils import DATA_DIR
+from services.ai_service import solve_captcha_image
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# Local OCR is optional: pip install pytesseract pillow (+ the tesseract binary)
+try:
+    import pytesseract
+    from PIL import Image, ImageFilter, ImageOps
+    OCR_AVAILABLE = True
+except ImportError:
+    OCR_AVAILABLE = False
+
+# --- SOLVER CONFIG (override via .env) ---
+OCR_ENABLED = os.getenv("CAPTCHA_OCR_ENABLED", "true").lower() in ("1", "true", "yes")
+OCR_MIN_CONFIDENCE = float(os.getenv("CAPTCHA_OCR_MIN_CONFIDENCE", "80"))
+# What a plausible answer looks like (China Airlines: short alphanumeric codes)
+ANSWER_RE = re.compile(os.getenv("CAPTCHA_ANSWER_PATTERN", r"^[A-Za-z0-9]{4,6}$"))
+CACHE_PATH = os.path.join(DATA_DIR, "captcha_cache.json")
+CACHE_MAX = 5000
+
+# solver -> {"attempts", "correct", "wrong", "total_ms"}
+CAPTCHA_STATS = {}
+
+
+@dataclass
+class CaptchaSolution:
+    text: str
+    solver: str          # "cache" | "ocr" | "vision"
+    confidence: float    # 0-100; vision/cache answers are reported as 100
+    image_hash: str
+    elapsed_ms: float
+
+
+# --- CACHE: image hash -> confirmed answer ---
+_cache = None
+
+
+def _load_cache():
+    global _cache
+    if _cache is None:
+        try:
+            with open(CACHE_PATH, encoding="utf-8") as f:
+                _cache = json.load(f)
+        except (OSError, ValueError):
+            _cache = {}
+    return _cache
+
+
+def _save_cache():
+    while len(_cache) > CACHE_MAX:
+        _cache.pop(next(iter(_cache)))
+    # Snapshot on the loop, write in a thread: the file write must not stall other scrapes
+    return asyncio.to_thread(_write_cache, dict(_cache))
+
+
+def _write_cache(snapshot):
+    os.makedirs(os.path.dirname(CACHE_PATH), exist_ok=True)
+    tmp = CACHE_PATH + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f)
+    os.replace(tmp, CACHE_PATH)
+
+
+def image_hash(img_bytes: bytes):
+    return hashlib.sha256(img_bytes).hexdigest()
+
+
+# --- LOCAL OCR (CPU only) ---
+def _preprocess(img_bytes: bytes):
+    image = Image.open(io.BytesIO(img_bytes)).convert("L")
+    # Upscale, denoise and binarize: captcha glyphs are small and sit on noisy backgrounds
+    image = image.resize((image.width * 3, image.height * 3), Image.LANCZOS)
+    image = image.filter(ImageFilter.MedianFilter(3))
+    image = ImageOps.autocontrast(image)
+    return image.point(lambda p: 255 if p > 140 else 0)
+
+
+def ocr_solve(img_bytes: bytes):
+    """Returns (text, confidence 0-100). ("", 0) if OCR is unavailable or reads nothing."""
+    if not (OCR_AVAILABLE and OCR_ENABLED):
+        return "", 0.0
+    try:
+        data = pytesseract.image_to_data(
+            _preprocess(img_bytes),
+            config="--psm 7 -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789",
+            output_type=pytesseract.Output.DICT,
+        )
+    except Exception as e:
+        logger.warning("⚠️ OCR Error: %s", e)
+        return "", 0.0
+
+    words, confidences = [], []
+    for text, conf in zip(data["text"], data["conf"]):
+        text = text.strip()
+        if text and float(conf) >= 0:
+            words.append(text)
+            confidences.append(float(conf))
+    if not words:
+        return "", 0.0
+    answer = "".join(words)
+    # Weakest word decides: one misread glyph fails the whole captcha
+    confidence = min(confidences)
+    if not ANSWER_RE.match(answer):
+        confidence = min(confidence, OCR_MIN_CONFIDENCE - 1)
+    return answer, confidence
+
+
+# --- SOLVER CHAIN ---
+async def solve_captcha(img_bytes: bytes):
+    """
+    Cache -> local OCR (if confident) -> GPT-4o vision.
+    Returns a CaptchaSolution, or None if every solver failed.
+    """
+    t0 = time.perf_counter()
+    digest = image_hash(img_bytes)
+
+    cached = (await asyncio.to_thread(_load_cache)).get(digest)
+    if cached:
+        logger.info("🔐 Captcha answer from cache.")
+        return CaptchaSolution(cached, "cache", 100.0, digest, (time.perf_counter() - t0) * 1000)
+
+    # Tesseract runs as a subprocess: keep it off the event loop
+    text, confidence = await asyncio.to_thread(ocr_solve, img_bytes)
+    if text and confidence >= OCR_MIN_CONFIDENCE:
+        logger.info("🔐 Local OCR: '%s' (%.0f%%)", text, confidence)
+        return CaptchaSolution(text, "ocr", confidence, digest, (time.perf_counter() - t0) * 1000)
+    if text:
+        logger.info("🔐 Local OCR unsure ('%s', %.0f%%), escalating to vision...", text, confidence)
+
+    answer = await solve_captcha_image(base64.b64encode(img_bytes).decode("utf-8"))
+    if not answer:
+        return None
+    return CaptchaSolution(answer.strip(), "vision", 100.0, digest, (time.perf_counter() - t0) * 1000)
+
+
+async def record_outcome(solution: CaptchaSolution, correct: bool):
+    """Called by the driver once the site accepted or rejected the answer."""
+    stats = CAPTCHA_STATS.setdefault(solution.solver, {"attempts": 0, "correct": 0, "wrong": 0, "total_ms": 0.0})
+    stats["attempts"] += 1
+    stats["correct" if correct else "wrong"] += 1
+    stats["total_ms"] = round(stats["total_ms"] + solution.elapsed_ms, 1)
+    logger.info("📊 Captcha [%s] %s (%s/%s correct)", solution.solver,
+                "accepted" if correct else "rejected", stats["correct"], stats["attempts"])
+
+    cache = await asyncio.to_thread(_load_cache)
+    if correct and solution.solver != "cache":
+        cache[solution.image_hash] = solution.text
+        await _save_cache()
+    elif not correct and cache.pop(solution.image_hash, None) is not None:
+        await _save_cache()
+
+
+def captcha_report():
+    report = {}
+    for solver, s in CAPTCHA_STATS.items():
+        attempts = max(s["attempts"], 1)
+        report[solver] = {**s, "accuracy": round(s["correct"] / attempts, 3), "avg_ms": round(s["total_ms"] / attempts, 1)}
+    return {"ocr_available": OCR_AVAILABLE and OCR_ENABLED, "solvers": report}
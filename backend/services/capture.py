@@ -0,0 +1,212 @@
+import logging
+import os
+import re
+import json
+import asyncio
+import httpx
+from dotenv import load_dotenv
+from services.utils import DATA_DIR
+from services.fixtures import http_transport
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# ============================================================
+# RESPONSE CAPTURE: read carrier JSON APIs instead of rendered DOM
+# ============================================================
+# URL patterns of the XHR/fetch calls that carry tracking results, per driver.
+# Extend when a carrier moves its API; unmatched drivers simply fall back to body text.
+CAPTURE_PATTERNS = {
+    "msc": r"msc\.com/api/feature/tools/TrackingInfo",
+    "af_klm": r"afklcargo\.com/.*api.*shipment",
+    "saudia": r"saudiacargo\.com/.*api.*(track|awb|shipment)",
+    "air_india": r"airindia\.com/.*(track|awb|shipment)",
+    "etihad": r"parcelsapp\.com/api/.*track",
+}
+REPLAY_ENABLED = os.getenv("CAPTURE_REPLAY_ENABLED", "true").lower() in ("1", "true", "yes")
+TEMPLATES_PATH = os.path.join(DATA_DIR, "replay_templates.json")
+MAX_CAPTURE_BYTES = 2_000_000
+# Request headers worth replaying; cookies/auth tokens from the browser session are not kept
+REPLAY_HEADERS = {"accept", "content-type", "user-agent", "referer", "origin", "x-requested-with"}
+
+
+class ResponseCapture:
+    """
+    Records JSON responses whose URL matches `pattern` on a BrowserContext (popups included)
+    while a driver runs.
+    """
+
+    def __init__(self, context, pattern: str):
+        self.context = context
+        self.regex = re.compile(pattern)
+        self.captured = []  # {"url", "method", "headers", "post_data", "payload"}
+        self._tasks = set()
+        context.on("response", self._on_response)
+
+    def _on_response(self, response):
+        if not self.regex.search(response.url):
+            return
+        task = asyncio.ensure_future(self._record(response))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _record(self, response):
+        try:
+            if not response.ok or "json" not in response.headers.get("content-type", ""):
+                return
+            body = await response.body()
+            if len(body) > MAX_CAPTURE_BYTES:
+                return
+            request = response.request
+            self.captured.append({
+                "url": response.url,
+                "method": request.method,
+                "headers": {k: v for k, v in request.headers.items() if k.lower() in REPLAY_HEADERS},
+                "post_data": request.post_data,
+                "payload": json.loads(body),
+            })
+        except Exception:
+            # Page closed mid-read or body wasn't valid JSON
+            pass
+
+    async def settle(self):
+        """Waits for in-flight body reads so nothing captured late is lost."""
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    def detach(self):
+        try:
+            self.context.remove_listener("response", self._on_response)
+        except Exception:
+            pass
+
+    def best(self, clean_number: str):
+        """The largest captured call that mentions the number, or None (config/analytics calls don't)."""
+        matching = [(len(text), entry) for entry in self.captured
+                    for text in [json.dumps(entry["payload"])] if mentions_number(text, clean_number)]
+        if not matching:
+            return None
+        return max(matching, key=lambda x: x[0])[1]
+
+
+def mentions_number(text: str, clean_number: str):
+    """Does a payload name this shipment? Split-field APIs may echo only the serial after the prefix."""
+    text = text.upper()
+    suffix = clean_number[3:]
+    return clean_number in text or (len(suffix) >= 7 and suffix in text)
+
+
+def format_captured(driver: str, payload):
+    return f"Source: {driver} API (captured)\n{json.dumps(payload, separators=(',', ':'))}"
+
+
+# ============================================================
+# DIRECT REPLAY: skip the browser once we've seen a carrier's API call
+# ============================================================
+_templates = None
+_client = None
+
+
+def _load_templates():
+    global _templates
+    if _templates is None:
+        try:
+            with open(TEMPLATES_PATH, encoding="utf-8") as f:
+                _templates = json.load(f)
+        except (OSError, ValueError):
+            _templates = {}
+    return _templates
+
+
+def _save_templates():
+    os.makedirs(os.path.dirname(TEMPLATES_PATH), exist_ok=True)
+    tmp = TEMPLATES_PATH + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(_templates, f, indent=2)
+    os.replace(tmp, TEMPLATES_PATH)
+
+
+def _templatize(text, clean_number: str):
+    """Swaps the tracking number for placeholders. Returns (text, found)."""
+    if not text:
+        return text, False
+    if clean_number in text:
+        return text.replace(clean_number, "{{NUMBER}}"), True
+    prefix, suffix = clean_number[:3], clean_number[3:]
+    if len(suffix) >= 7 and suffix in text:
+        # Split-field forms (Air India, Silk Way): airline prefix and serial sent separately
+        return text.replace(suffix, "{{SUFFIX}}").replace(f'"{prefix}"', '"{{PREFIX}}"').replace(f"={prefix}", "={{PREFIX}}"), True
+    return text, False
+
+
+def remember_template(driver: str, entry, clean_number: str):
+    """Stores a captured request as a replayable template if the number can be substituted."""
+    if not REPLAY_ENABLED or entry is None:
+        return
+    url, in_url = _templatize(entry["url"], clean_number)
+    body, in_body = _templatize(entry["post_data"], clean_number)
+    if not (in_url or in_body):
+        return
+    _load_templates()[driver] = {"method": entry["method"], "url": url, "headers": entry["headers"], "post_data": body}
+    _save_templates()
+    logger.info("💾 Saved direct API template for %s", driver)
+
+
+def forget_template(driver: str):
+    if _load_templates().pop(driver, None) is not None:
+        _save_templates()
+
+
+def _fill(text, clean_number: str):
+    if not text:
+        return text
+    return text.replace("{{NUMBER}}", clean_number).replace("{{PREFIX}}", clean_number[:3]).replace("{{SUFFIX}}", clean_number[3:])
+
+
+def _get_client():
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(15.0, connect=5.0), follow_redirects=True, transport=http_transport("carrier_api")
+        )
+    return _client
+
+
+async def close_replay_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def replay_lookup(driver: str, clean_number: str):
+    """
+    Calls a carrier's captured JSON API directly over HTTP (no browser).
+    Returns a parser-ready string, or None (template missing, blocked, or empty result).
+    """
+    if not REPLAY_ENABLED:
+        return None
+    template = _load_templates().get(driver)
+    if not template:
+        return None
+
+    logger.info("⚡ Replaying %s API directly...", driver)
+    try:
+        response = await _get_client().request(
+            template["method"],
+            _fill(template["url"], clean_number),
+            headers=template["headers"],
+            content=_fill(template["post_data"], clean_number),
+        )
+        if response.status_code == 200 and "json" in response.headers.get("content-type", ""):
+            payload = response.json()
+            if payload and mentions_number(response.text, clean_number):
+                return format_captured(driver, payload)
+            # API answered but knows nothing about this number: the template is still good
+            return None
+        logger.info("🔸 Replay got %s; dropping template, browser next time.", response.status_code)
+    except Exception as e:
+        logger.warning("⚠️ Replay failed: %s", e)
+    forget_template(driver)
+    return None
@@ -1,7 +1,17 @@
+import logging
 import os
 import json
+import time
+import random
+import asyncio
 import httpx
 from dotenv import load_dotenv
+from services.fixtures import http_transport
+from services.resilience import guard, CircuitOpen
+from services.cache import tracking_cache
+from services.validation import NEGATIVE_TTL, api_miss_key
+
+logger = logging.getLogger(__name__)
 
 load_dotenv()
 
@@ -12,85 +22,332 @@ API_BASE_URL = "https://connect.cargoes.com/flow/api/public_tracking/v1/shipment
 API_KEY = os.getenv("CARGOES_FLOW_API_KEY", "").strip()
 ORG_TOKEN = os.getenv("CARGOES_FLOW_ORG_TOKEN", "").strip()
 
-async def check_cargoes_flow(tracking_number: str, carrier_type: str):
-    """
-    Queries Cargoes Flow API using Browser-like Headers.
-    """
-    if not API_KEY or not ORG_TOKEN:
-        print("   ⚠️ Missing Cargoes Flow keys.")
-        return None
+# --- CONNECTION / RETRY TUNING (override via .env) ---
+MAX_CONNECTIONS = int(os.getenv("CARGOES_FLOW_MAX_CONNECTIONS", "20"))
+MAX_KEEPALIVE = int(os.getenv("CARGOES_FLOW_MAX_KEEPALIVE", "10"))
+MAX_RETRIES = int(os.getenv("CARGOES_FLOW_MAX_RETRIES", "3"))
+BACKOFF_BASE = float(os.getenv("CARGOES_FLOW_BACKOFF_BASE", "0.5"))
+# Longest Retry-After we honour; a longer one fails the call (Tier 2 takes over) instead of stalling the row
+MAX_RETRY_AFTER = float(os.getenv("CARGOES_FLOW_MAX_RETRY_AFTER", "20"))
+# Numbers sent per upstream query by batch prefetches (1 = one request per number)
+BATCH_SIZE = int(os.getenv("CARGOES_FLOW_BATCH_SIZE", "25"))
+BATCH_CONCURRENCY = int(os.getenv("CARGOES_FLOW_BATCH_CONCURRENCY", "4"))
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+try:
+    import h2  # noqa: F401  (HTTP/2 needs the httpx[http2] extra)
+    HTTP2 = True
+except ImportError:
+    HTTP2 = False
+
+# HEADERS matching your successful browser request
+HEADERS = {
+    "X-DPW-ApiKey": API_KEY,
+    "X-DPW-Org-Token": ORG_TOKEN,
+    "Content-Type": "application/json",
+    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Accept": "application/json"
+}
+
+_client = None
+
 
-    clean_number = tracking_number.replace(" ", "").replace("-", "")
-    print(f"   ⚡ API: Checking Cargoes Flow for {clean_number}...")
+def get_client():
+    """One keep-alive client for the whole process, so lookups reuse TCP+TLS connections."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            http2=HTTP2,
+            headers=HEADERS,
+            timeout=httpx.Timeout(20.0, connect=5.0),
+            limits=httpx.Limits(
+                max_connections=MAX_CONNECTIONS,
+                max_keepalive_connections=MAX_KEEPALIVE,
+                keepalive_expiry=60.0,
+            ),
+            transport=http_transport("cargoes_flow"),
+        )
+    return _client
 
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def _clean(tracking_number: str):
+    return tracking_number.replace(" ", "").replace("-", "")
+
+
+def _build_params(numbers, carrier_type: str):
     # Parameters from your browser request
-    params = {}
+    joined = ",".join(numbers)
+    limit = str(max(50, len(numbers) * 2))
     if carrier_type == "sea":
-        params = {
+        return {
             "shipmentType": "INTERMODAL_SHIPMENT",
-            "containerNumber": clean_number,
+            "containerNumber": joined,
             "includeUniqueContainers": "true", # From your curl
-            "_limit": "50"
-        }
-    else:
-        params = {
-            "shipmentType": "AIR_SHIPMENT",
-            "awbNumber": clean_number,
-            "_limit": "50"
+            "_limit": limit
         }
+    return {
+        "shipmentType": "AIR_SHIPMENT",
+        "awbNumber": joined,
+        "_limit": limit
+    }
+
+
+def _retry_delay(attempt: int, response=None):
+    """Seconds before the next attempt, or None when Retry-After asks for more than MAX_RETRY_AFTER."""
+    if response is not None:
+        try:
+            retry_after = float(response.headers.get("Retry-After", ""))
+        except ValueError:
+            retry_after = None  # Missing, or an HTTP date
+        if retry_after is not None:
+            return max(retry_after, 0.0) if retry_after <= MAX_RETRY_AFTER else None
+    # Exponential backoff with full jitter
+    return min(random.uniform(0, BACKOFF_BASE * (2 ** attempt)), MAX_RETRY_AFTER)
+
 
-    # HEADERS matching your successful browser request
-    headers = {
-        "X-DPW-ApiKey": API_KEY,
-        "X-DPW-Org-Token": ORG_TOKEN,
-        "Content-Type": "application/json",
-        "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-        "Accept": "application/json"
+async def _get_with_retries(params, api_guard):
+    client = get_client()
+    for attempt in range(MAX_RETRIES + 1):
+        if attempt:
+            await api_guard.bucket.acquire()
+        try:
+            response = await client.get(API_BASE_URL, params=params)
+        except httpx.TransportError as e:
+            if attempt == MAX_RETRIES:
+                logger.warning("⚠️ API Connection Failed: %s", e)
+                return None
+            await asyncio.sleep(_retry_delay(attempt))
+            continue
+
+        if response.status_code in RETRY_STATUSES and attempt < MAX_RETRIES:
+            delay = _retry_delay(attempt, response)
+            if delay is None:
+                logger.warning("⏳ API %s asks to wait %ss; giving up.", response.status_code, response.headers.get("Retry-After"))
+                return response
+            logger.info("🔁 API %s, retrying in %.1fs...", response.status_code, delay)
+            await asyncio.sleep(delay)
+            continue
+        return response
+
+
+async def _get(params):
+    """GET with retries on 429/5xx and connection errors. Returns the final response or None."""
+    api_guard = guard("cargoes_flow")
+    try:
+        async with api_guard.protect() as outcome:
+            response = await _get_with_retries(params, api_guard)
+            # 404 (not tracked there) is a healthy answer; an outage is not
+            outcome.failed = response is None or response.status_code in RETRY_STATUSES
+            return response
+    except CircuitOpen:
+        logger.info("⛔ Cargoes Flow circuit open; skipping API.")
+        return None
+
+
+def _extract(shipment):
+    # --- SMART EXTRACTION ---
+    # We extract specific fields to help the AI
+    legs = shipment.get("shipmentLegs", {}).get("portToPort", {})
+
+    return {
+        "carrier_status": shipment.get("status"),
+        "latest_event": shipment.get("subStatus1"),
+        "origin": legs.get("firstPort"),
+        "destination": legs.get("lastPort"),
+        "predicted_arrival": legs.get("destinationOceanPortEta") or legs.get("lastPortEta"),
+        "co2_emissions": shipment.get("emissions", {}).get("co2e", {}).get("value", "N/A"),
+        "full_raw_data": shipment # Keep raw for deep analysis (and its events for the timeline)
     }
 
+
+def _shipment_numbers(shipment):
+    """Normalized identifiers a shipment answers to (used to fan batch results back out)."""
+    found = set()
+    for field in ("awbNumber", "containerNumber", "mawbNumber", "shipmentNumber"):
+        value = shipment.get(field)
+        if isinstance(value, str) and value:
+            found.add(_clean(value).upper())
+    for container in shipment.get("containers", []) or []:
+        if isinstance(container, dict) and container.get("containerNumber"):
+            found.add(_clean(container["containerNumber"]).upper())
+    return found
+
+
+def _handle_error_status(response):
+    if response.status_code == 404:
+        logger.info("🔸 API: Shipment not found.")
+    elif response.status_code == 401:
+        logger.warning("⛔ API Auth Failed (401).")
+    else:
+        logger.info("🔸 API Error %s: %s", response.status_code, response.text)
+
+
+async def remember_miss(clean_number: str, carrier_type: str):
+    # Only definite answers (404 / empty list) are cached; outages and errors are retried
+    await tracking_cache.set(api_miss_key(clean_number, carrier_type), {"status": "not found"}, NEGATIVE_TTL)
+
+
+async def forget_miss(tracking_number: str, carrier_type: str):
+    await tracking_cache.invalidate(api_miss_key(_clean(tracking_number), carrier_type))
+
+
+async def check_cargoes_flow(tracking_number: str, carrier_type: str):
+    """
+    Queries Cargoes Flow API using Browser-like Headers.
+    """
+    if not API_KEY or not ORG_TOKEN:
+        logger.warning("⚠️ Missing Cargoes Flow keys.")
+        return None
+
+    clean_number = _clean(tracking_number)
+
+    # A batch run may already have resolved this number
+    prefetched = await _take_prefetched(clean_number, carrier_type)
+    if prefetched is not _MISSING:
+        return prefetched
+
+    # Recently unknown to Cargoes Flow: don't ask again until NEGATIVE_CACHE_TTL passes
+    if await tracking_cache.get(api_miss_key(clean_number, carrier_type)):
+        logger.info("🔸 API: %s recently not found, skipping.", clean_number)
+        return None
+
+    logger.info("⚡ API: Checking Cargoes Flow for %s...", clean_number)
+
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                API_BASE_URL,
-                params=params,
-                headers=headers,
-                timeout=20.0
-            )
-
-            if response.status_code == 200:
-                data = response.json()
-                if isinstance(data, list) and len(data) > 0:
-                    shipment = data[0] # Get first match
-
-                    # --- SMART EXTRACTION ---
-                    # We extract specific fields to help the AI
-                    legs = shipment.get("shipmentLegs", {}).get("portToPort", {})
-
-                    extracted_info = {
-                        "carrier_status": shipment.get("status"),
-                        "latest_event": shipment.get("subStatus1"),
-                        "origin": legs.get("firstPort"),
-                        "destination": legs.get("lastPort"),
-                        "predicted_arrival": legs.get("destinationOceanPortEta") or legs.get("lastPortEta"),
-                        "co2_emissions": shipment.get("emissions", {}).get("co2e", {}).get("value", "N/A"),
-                        "full_raw_data": shipment # Keep raw for deep analysis
-                    }
-
-                    print(f"   ✅ API Success! ETA: {extracted_info['predicted_arrival']} | CO2: {extracted_info['co2_emissions']}")
-                    return json.dumps(extracted_info, indent=2)
-                else:
-                    print("   🔸 API returned 200 but list is empty.")
-                    return None
-            elif response.status_code == 404:
-                print("   🔸 API: Shipment not found.")
-                return None
-            elif response.status_code == 401:
-                print("   ⛔ API Auth Failed (401).")
-                return None
+        response = await _get(_build_params([clean_number], carrier_type))
+        if response is None:
+            return None
+
+        if response.status_code == 200:
+            data = response.json()
+            if isinstance(data, list) and len(data) > 0:
+                extracted_info = _extract(data[0]) # Get first match
+                logger.info("✅ API Success! ETA: %s | CO2: %s", extracted_info['predicted_arrival'], extracted_info['co2_emissions'])
+                return json.dumps(extracted_info, separators=(",", ":"))
             else:
-                print(f"   🔸 API Error {response.status_code}: {response.text}")
+                logger.info("🔸 API returned 200 but list is empty.")
+                await remember_miss(clean_number, carrier_type)
                 return None
+        _handle_error_status(response)
+        if response.status_code == 404:
+            await remember_miss(clean_number, carrier_type)
+        return None
+
+    except Exception as e:
+        logger.warning("⚠️ API Connection Failed: %s", e)
+        return None
+
+
+async def _fetch_chunk(numbers, carrier_type, limit):
+    """Shipments for one chunk query, [] if the API has none, or None if the query failed."""
+    async with limit:
+        response = await _get(_build_params(numbers, carrier_type))
+    if response is None:
+        return None
+    if response.status_code == 404:
+        return []
+    if response.status_code != 200:
+        _handle_error_status(response)
+        return None
+    data = response.json()
+    return data if isinstance(data, list) else []
 
+
+async def _resolve_chunk(chunk, carrier_type, limit):
+    """{clean_number: extracted JSON string or None} for one chunk, or None if the query failed."""
+    try:
+        shipments = await _fetch_chunk(chunk, carrier_type, limit)
     except Exception as e:
-        print(f"   ⚠️ API Connection Failed: {e}")
+        logger.warning("⚠️ API batch chunk failed: %s", e)
+        return None
+    if shipments is None:
         return None
+
+    results = {number: None for number in chunk}
+    wanted = set(chunk)
+    for shipment in shipments:
+        if not isinstance(shipment, dict):
+            continue
+        matches = _shipment_numbers(shipment) & wanted
+        # A single-number query can be attributed even if the payload doesn't echo it
+        if not matches and len(chunk) == 1:
+            matches = wanted
+        for number in matches:
+            if results[number] is None:  # Keep the first match, like check_cargoes_flow
+                results[number] = json.dumps(_extract(shipment), separators=(",", ":"))
+    return results
+
+
+def _chunks(tracking_numbers):
+    cleaned = list(dict.fromkeys(_clean(n).upper() for n in tracking_numbers if n))
+    return [cleaned[i:i + BATCH_SIZE] for i in range(0, len(cleaned), max(BATCH_SIZE, 1))]
+
+
+# --- PREFETCH HAND-OFF ---
+# Batch runs resolve Tier 1 in bulk while results stream; master_scraper's per-number call
+# waits for its own chunk here instead of going back upstream.
+PREFETCH_TTL = 600
+_MISSING = object()
+_prefetched = {}  # (carrier_type, clean_number) -> (expires_at, future)
+
+
+def start_prefetch(tracking_numbers, carrier_type: str):
+    """
+    Starts the bulk lookup in the background and returns its task (cancel it when the batch ends).
+    Each number's answer is handed over as soon as its chunk returns. A failed chunk, or a number
+    missing from a multi-number answer, hands over nothing, so those rows make their own call.
+    """
+    if not API_KEY or not ORG_TOKEN:
+        return None
+    now = time.time()
+    for key in [k for k, (expires_at, _) in _prefetched.items() if expires_at < now]:
+        del _prefetched[key]
+
+    chunks = _chunks(tracking_numbers)
+    loop = asyncio.get_running_loop()
+    futures = {number: loop.create_future() for chunk in chunks for number in chunk}
+    for number, future in futures.items():
+        _prefetched[(carrier_type, number)] = (now + PREFETCH_TTL, future)
+    logger.info("⚡ API: Prefetching %s numbers in %s request(s)...", len(futures), len(chunks))
+    return asyncio.create_task(_run_prefetch(chunks, carrier_type, futures))
+
+
+async def _run_prefetch(chunks, carrier_type, futures):
+    limit = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def one(chunk):
+        results = None
+        try:
+            results = await _resolve_chunk(chunk, carrier_type, limit)
+        finally:
+            # Also runs on cancel: nobody may be left waiting on an unresolved chunk
+            for number in chunk:
+                # Absent from a multi-number answer isn't proof: that row confirms with its own query
+                answer = _MISSING if results is None or (results[number] is None and len(chunk) > 1) else results[number]
+                if answer is _MISSING:
+                    entry = _prefetched.get((carrier_type, number))
+                    if entry is not None and entry[1] is futures[number]:
+                        del _prefetched[(carrier_type, number)]
+                if not futures[number].done():
+                    futures[number].set_result(answer)
+
+    await asyncio.gather(*[one(chunk) for chunk in chunks])
+    # Only single-number queries prove a miss: a multi-number filter the API applied partly
+    # (or ignored) would otherwise keep a whole batch out of Tier 1 for NEGATIVE_CACHE_TTL
+    misses = [number for number, future in futures.items() if future.result() is None]
+    await asyncio.gather(*[remember_miss(number, carrier_type) for number in misses])
+
+
+async def _take_prefetched(clean_number: str, carrier_type: str):
+    entry = _prefetched.pop((carrier_type, clean_number.upper()), None)
+    if entry is None or entry[0] < time.time():
+        return _MISSING
+    # shield: a cancelled row must not resolve the future for the prefetch task
+    return await asyncio.shield(entry[1])
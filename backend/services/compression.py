@@ -0,0 +1,141 @@
+import os
+import zlib
+from dotenv import load_dotenv
+from starlette.datastructures import Headers, MutableHeaders
+
+load_dotenv()
+
+# Brotli is optional: pip install brotli (without it clients get gzip)
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# ============================================================
+# RESPONSE COMPRESSION: brotli or gzip, negotiated from Accept-Encoding
+# ============================================================
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "true").lower() in ("1", "true", "yes")
+# Bodies smaller than this go out as-is (headers would eat the saving)
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "500"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "5"))
+# 0-11; 4 compresses about as well as gzip -6 and much faster than the default 11
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+# SSE goes uncompressed: some proxies buffer compressed event streams
+SKIP_CONTENT_TYPES = ("text/event-stream", "image/", "application/zip", "application/vnd.apache.parquet",
+                      "application/vnd.openxmlformats")
+
+
+def negotiate(accept_encoding: str):
+    """Encodings we can use from an Accept-Encoding header (q=0 means refused), best first."""
+    offered = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        offered[name.strip()] = q
+    wildcard = offered.get("*", 0.0)
+    accepted = []
+    if brotli is not None and offered.get("br", wildcard) > 0:
+        accepted.append("br")
+    if offered.get("gzip", wildcard) > 0:
+        accepted.append("gzip")
+    return tuple(accepted)
+
+
+class _Encoder:
+    """Streaming encoder: every chunk is flushed, so NDJSON lines still arrive as they are produced."""
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            # wbits 31 = gzip container
+            self._zlib = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def chunk(self, data: bytes):
+        if self.encoding == "br":
+            return self._brotli.process(data) + self._brotli.flush()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b""):
+        if self.encoding == "br":
+            return self._brotli.process(data) + self._brotli.finish()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_FINISH)
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing JSON/NDJSON/CSV responses for clients that accept it."""
+
+    def __init__(self, app, minimum_size=COMPRESS_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not COMPRESSION_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        accepted = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if not accepted:
+            await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, _Responder(send, accepted, self.minimum_size).send)
+
+
+class _Responder:
+    def __init__(self, send, accepted, minimum_size):
+        self._send = send
+        self.accepted = accepted
+        self.minimum_size = minimum_size
+        self.start = None
+        self.encoder = None
+        self.passthrough = False
+
+    async def send(self, message):
+        if message["type"] == "http.response.start":
+            # Held until the first body chunk shows whether compressing is worth it
+            self.start = message
+            return
+        if message["type"] != "http.response.body":
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more = message.get("more_body", False)
+        if self.start is not None:
+            start, self.start = self.start, None
+            headers = MutableHeaders(raw=start["headers"])
+            content_type = headers.get("content-type", "")
+            if (
+                "content-encoding" in headers
+                or any(content_type.startswith(skip) for skip in SKIP_CONTENT_TYPES)
+                or (not more and len(body) < self.minimum_size)
+            ):
+                self.passthrough = True
+                await self._send(start)
+                await self._send(message)
+                return
+            # Brotli wins on whole bodies; flushed line by line (streams) gzip is smaller and faster
+            encoding = "gzip" if more and "gzip" in self.accepted else self.accepted[0]
+            self.encoder = _Encoder(encoding)
+            headers["Content-Encoding"] = encoding
+            headers.add_vary_header("Accept-Encoding")
+            if more:
+                del headers["Content-Length"]
+                body = self.encoder.chunk(body)
+            else:
+                body = self.encoder.finish(body)
+                headers["Content-Length"] = str(len(body))
+            await self._send(start)
+            await self._send({"type": "http.response.body", "body": body, "more_body": more})
+            return
+
+        if self.passthrough:
+            await self._send(message)
+            return
+        body = self.encoder.chunk(body) if more else self.encoder.finish(body)
+        await self._send({"type": "http.response.body", "body": body, "more_body": more})
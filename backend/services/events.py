@@ -0,0 +1,199 @@
+import json
+from dataclasses import dataclass, asdict
+from datetime import datetime, timezone
+from typing import Optional
+from services.fast_parser import parse_eta
+from services.reducer import extract_events, MILESTONE_RE, MILESTONE_MAP
+
+# ============================================================
+# EVENT TIMELINE: typed tracking events from API payloads and scraped pages
+# ============================================================
+# Canonical milestone (services.reducer) -> short code. Air uses Cargo-IMP codes.
+MILESTONE_CODES = {
+    "Booked": "BKD", "Received": "RCS", "Manifested": "MAN", "Departed": "DEP", "Arrived": "ARR",
+    "Notified": "NFD", "Delivered": "DLV", "Transferred": "TFD", "Documents Delivered": "AWD",
+    "Estimated Arrival": "ETA", "Discharged": "DIS", "Gate Out": "GTOT", "Gate In": "GTIN",
+    "Loaded": "LOD", "Transshipment": "TSP", "Customs": "CUS", "Released": "REL",
+    "In Transit": "TRN", "Empty Return": "EMR",
+}
+# Date shapes the reducer finds that fast_parser.parse_eta doesn't read
+EXTRA_DATE_FORMATS = ["%d%b%y", "%d-%b-%y", "%d.%m.%Y", "%d-%m-%y", "%d/%m/%y", "%b %d, %Y", "%b %d %Y", "%d %B %Y"]
+
+# Keys API payloads use for an event's parts (first one present wins)
+NAME_KEYS = ("name", "eventName", "event", "description", "status", "statusDescription", "milestone", "code", "eventCode")
+TIME_KEYS = ("actualTime", "actualDate", "eventTime", "eventDate", "timestamp", "date", "dateTime", "estimateTime", "time")
+LOCATION_KEYS = ("location", "locationName", "port", "portName", "station", "airport", "place", "locode", "city")
+VESSEL_KEYS = ("vesselName", "vessel", "vesselname")
+VOYAGE_KEYS = ("voyage", "voyageNumber", "voyageNo")
+FLIGHT_KEYS = ("flightNumber", "flightNo", "flight")
+CODE_KEYS = ("code", "eventCode", "statusCode")
+
+
+@dataclass(slots=True)
+class TrackingEvent:
+    code: str                           # "DEP", "ARR", "DIS"... ("" when the milestone is unknown)
+    milestone: str                      # "Departed"
+    location: str = ""
+    timestamp: Optional[datetime] = None  # None when the source gave no readable date
+    vessel: str = ""
+    flight: str = ""
+    source: str = ""                    # "cargoes_flow", a captured carrier API, or the scraping driver
+
+    def key(self):
+        """Identity used to tell a new event from one already seen."""
+        return (self.code or self.milestone, self.location, self.timestamp.isoformat() if self.timestamp else "")
+
+    def to_dict(self):
+        data = asdict(self)
+        data["timestamp"] = self.timestamp.isoformat() if self.timestamp else None
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        timestamp = data.get("timestamp")
+        return cls(**{**data, "timestamp": datetime.fromisoformat(timestamp) if timestamp else None})
+
+
+def milestone_code(milestone: str):
+    return MILESTONE_CODES.get(milestone, "")
+
+
+def _canonical(text: str):
+    match = MILESTONE_RE.search(text or "")
+    if not match:
+        return (text or "").strip()[:60]
+    return MILESTONE_MAP.get(match.group(0).lower(), match.group(0))
+
+
+def parse_timestamp(date_text, time_text=""):
+    """'26-Jan-2026' + '14:05' -> datetime(2026, 1, 26, 14, 5). Epoch ms and ISO strings work too."""
+    if date_text in (None, ""):
+        return None
+    if isinstance(date_text, (int, float)):
+        try:
+            return datetime.fromtimestamp(date_text / 1000, tz=timezone.utc).replace(tzinfo=None)
+        except (OverflowError, OSError, ValueError):
+            return None
+    text = str(date_text).strip()
+    try:
+        parsed = datetime.fromisoformat(text.replace("Z", "+00:00"))
+        if parsed.tzinfo:
+            parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+        return parsed
+    except ValueError:
+        pass
+    day = parse_eta(text)
+    if day is None:
+        for fmt in EXTRA_DATE_FORMATS:
+            try:
+                day = datetime.strptime(text, fmt).date()
+                break
+            except ValueError:
+                continue
+    if day is None:
+        return None
+    hour, minute = 0, 0
+    if time_text:
+        parts = str(time_text).split(":")
+        hour, minute = int(parts[0]), int(parts[1])
+    return datetime(day.year, day.month, day.day, hour, minute)
+
+
+# --- FROM SCRAPED PAGES ---
+def events_from_text(raw_text: str, source: str):
+    """The reducer's canonical events as TrackingEvents (page order)."""
+    _, events, _ = extract_events(raw_text)
+    return [
+        TrackingEvent(
+            code=milestone_code(e["milestone"]),
+            milestone=e["milestone"],
+            location=e["location"],
+            timestamp=parse_timestamp(e["date"], e["time"]),
+            vessel=e["vessel"],
+            flight=e["flight"],
+            source=source,
+        )
+        for e in events
+    ]
+
+
+# --- FROM API PAYLOADS ---
+def _first(item, keys):
+    for key in keys:
+        value = item.get(key)
+        if value not in (None, "", [], {}):
+            return value
+    return None
+
+
+def _text(value):
+    if isinstance(value, dict):
+        return str(_first(value, ("name", "portName", "locationName", "code", "locode")) or "")
+    return str(value or "")
+
+
+def _event_lists(node, depth=0):
+    """Lists of dicts that look like events (a name and a time), anywhere in the payload."""
+    if depth > 6:
+        return
+    if isinstance(node, list):
+        if node and all(isinstance(item, dict) for item in node) and any(
+            _first(item, NAME_KEYS) and _first(item, TIME_KEYS) for item in node
+        ):
+            yield node
+            return
+        for item in node:
+            yield from _event_lists(item, depth + 1)
+    elif isinstance(node, dict):
+        for value in node.values():
+            yield from _event_lists(value, depth + 1)
+
+
+def events_from_payload(payload, source: str):
+    events = []
+    for items in _event_lists(payload):
+        for item in items:
+            name = _text(_first(item, NAME_KEYS))
+            milestone = _canonical(name)
+            vessel = _text(_first(item, VESSEL_KEYS))
+            voyage = _text(_first(item, VOYAGE_KEYS))
+            events.append(TrackingEvent(
+                code=milestone_code(milestone) or str(_first(item, CODE_KEYS) or "")[:8],
+                milestone=milestone,
+                location=_text(_first(item, LOCATION_KEYS)),
+                timestamp=parse_timestamp(_first(item, TIME_KEYS)),
+                vessel=f"{vessel} {voyage}".strip() if vessel else "",
+                flight=_text(_first(item, FLIGHT_KEYS)),
+                source=source,
+            ))
+    return events
+
+
+def build_timeline(raw_text: str, source: str):
+    """
+    Events from whatever master_scraper returned, oldest first (undated events keep page order, last).
+    API answers ("Source: ... API\\n{json}") are read from the JSON; page dumps through the reducer.
+    """
+    if not raw_text or raw_text.startswith(("Error", "Fallback failed", "Driver Not Implemented")):
+        return []
+    if raw_text.startswith("Source: "):
+        header, _, body = raw_text.partition("\n")
+        try:
+            payload = json.loads(body[body.find("{"):]) if "{" in body else None
+        except ValueError:
+            payload = None
+        if payload is None:
+            return []
+        if header.startswith("Source: Cargoes Flow API"):
+            source = "cargoes_flow"
+        events = events_from_payload(payload, source)
+    else:
+        events = events_from_text(raw_text, source)
+    dated = sorted((e for e in events if e.timestamp), key=lambda e: e.timestamp)
+    return dated + [e for e in events if not e.timestamp]
+
+
+def new_events(timeline, previous_timeline):
+    """Events not in the previously stored timeline (list of dicts)."""
+    seen = {TrackingEvent.from_dict(e).key() for e in previous_timeline or []}
+    return [e for e in timeline if e.key() not in seen]
@@ -0,0 +1,128 @@
+import json
+import re
+from datetime import datetime, date, timezone
+
+# Local rule engine mirroring ai_service.SYSTEM_PROMPT for structured (Cargoes Flow) payloads.
+# Returns None whenever the rules can't decide, so the caller falls back to the LLM.
+
+ETA_FORMATS = ["%Y-%m-%d", "%d-%b-%Y", "%d-%m-%Y", "%d/%m/%Y", "%Y/%m/%d", "%d %b %Y"]
+# ETA passed by more than this many days -> "Arrived / Delayed"
+DELAY_GRACE_DAYS = 2
+
+# Whole words only: "Undelivered" is not "delivered"
+DELIVERED_RE = re.compile(r"\bdelivered\b")
+DISCHARGED_RE = re.compile(r"\bdischarg(?:e|ed|ing)\b")
+# A discharge at a transshipment port is not the end of the voyage
+TRANSSHIPMENT_RE = re.compile(r"\btrans-?ship|\btranship|\bt/s\b")
+# "Not delivered", "yet to be discharged", "awaiting discharge" ... just before the milestone
+NEGATED_BEFORE_RE = re.compile(r"\b(?:not|no|never|yet to be|awaiting|pending|failed to be)\s+(?:\w+\s+)?$")
+# "Discharge pending", "delivery failed" ... just after it
+NEGATED_AFTER_RE = re.compile(r"^\s+(?:pending|planned|scheduled|expected|failed|not)\b")
+
+
+def _load_payload(raw_text: str):
+    """Pulls the JSON object out of 'Source: Cargoes Flow API\\n{...}'."""
+    if not raw_text or not raw_text.startswith("Source: Cargoes Flow API"):
+        return None
+    start = raw_text.find("{")
+    if start == -1:
+        return None
+    try:
+        payload = json.loads(raw_text[start:])
+    except ValueError:
+        return None
+    return payload if isinstance(payload, dict) else None
+
+
+def parse_eta(value):
+    if not value:
+        return None
+    if isinstance(value, (int, float)):
+        # Epoch milliseconds
+        try:
+            return datetime.fromtimestamp(value / 1000, tz=timezone.utc).date()
+        except (OverflowError, OSError, ValueError):
+            return None
+    text = str(value).strip()
+    try:
+        return datetime.fromisoformat(text.replace("Z", "+00:00")).date()
+    except ValueError:
+        pass
+    for fmt in ETA_FORMATS:
+        try:
+            return datetime.strptime(text[:11].strip(), fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def format_date(d: date):
+    return d.strftime("%d-%b-%Y")
+
+
+def _place_name(place):
+    if isinstance(place, dict):
+        return place.get("name") or place.get("code") or place.get("locode") or ""
+    return str(place or "")
+
+
+def _co2_text(co2):
+    if co2 in (None, "", "N/A"):
+        return ""
+    try:
+        value = float(co2)
+    except (TypeError, ValueError):
+        return f" CO2: {co2}."
+    return f" CO2: {int(value) if value.is_integer() else round(value, 1)}kg."
+
+
+def _says(pattern, events: str):
+    """True when a milestone is stated positively somewhere in the event text."""
+    for match in pattern.finditer(events):
+        if not NEGATED_BEFORE_RE.search(events[:match.start()]) and not NEGATED_AFTER_RE.match(events[match.end():]):
+            return True
+    return False
+
+
+def parse_structured(raw_text: str, today: date = None):
+    """
+    Deterministic status/ETA/summary for Cargoes Flow payloads.
+    Returns {"latest_date", "status", "summary"} or None if the LLM should decide.
+    """
+    payload = _load_payload(raw_text)
+    if payload is None:
+        return None
+
+    today = today or date.today()
+    eta = parse_eta(payload.get("predicted_arrival"))
+    if eta is None:
+        # The "N/A (History)" rule needs event dates; leave it to the LLM
+        return None
+
+    # " | " keeps a negation in one field from reaching into the other
+    events = f"{payload.get('carrier_status') or ''} | {payload.get('latest_event') or ''}".lower()
+    destination = _place_name(payload.get("destination")) or "destination"
+    co2 = _co2_text(payload.get("co2_emissions"))
+    eta_text = format_date(eta)
+    days_late = (today - eta).days
+
+    # Events first: a stated milestone beats whatever the ETA implies
+    if _says(DELIVERED_RE, events):
+        status = "Delivered"
+        summary = f"Shipment delivered at {destination} (ETA was {eta_text})."
+    elif _says(DISCHARGED_RE, events) and not TRANSSHIPMENT_RE.search(events):
+        # Ships often berth ahead of a stale ETA, so the discharge counts whatever the date
+        status = "Discharged / Port"
+        summary = f"Shipment discharged at {destination} (ETA: {eta_text})."
+    elif days_late <= 0:
+        # ETA today or ahead with no discharge reported yet
+        status = "In Transit"
+        summary = f"Shipment is in transit to {destination} (ETA: {eta_text})."
+    elif days_late > DELAY_GRACE_DAYS:
+        status = "Arrived / Delayed"
+        summary = f"Shipment is LATE: ETA to {destination} was {eta_text}, {days_late} days ago."
+    else:
+        # ETA passed within the grace window: not clearly in transit nor delayed
+        return None
+
+    return {"latest_date": eta_text, "status": status, "summary": summary + co2}
@@ -0,0 +1,126 @@
+import os
+import json
+import time
+import base64
+import asyncio
+import hashlib
+import logging
+import httpx
+from dotenv import load_dotenv
+from services.utils import DATA_DIR
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# ============================================================
+# RECORD / REPLAY FIXTURES (benchmarks and offline runs)
+# ============================================================
+# record: live traffic is saved as it happens (carrier pages as HAR, Cargoes Flow/OpenAI as JSON)
+# replay: everything is served from those files, and nothing leaves the machine
+# off:    normal operation (default)
+FIXTURE_MODE = os.getenv("FIXTURE_MODE", "off").lower()
+FIXTURE_DIR = os.getenv("FIXTURE_DIR", os.path.join(DATA_DIR, "fixtures"))
+# Sleep for the recorded upstream latency on replay instead of answering instantly
+REPLAY_LATENCY = os.getenv("FIXTURE_REPLAY_LATENCY", "false").lower() in ("1", "true", "yes")
+ACTIVE = FIXTURE_MODE in ("record", "replay")
+# Stored bodies are already decoded, so these would describe the wrong bytes
+_DROP_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection"}
+
+
+def har_path(driver: str, clean_number: str):
+    return os.path.join(FIXTURE_DIR, "har", driver, f"{clean_number}.har")
+
+
+def ignore_system_messages(body):
+    """Chat-completion key: the system prompt carries today's date, so it can't be part of the match."""
+    return {**body, "messages": [m for m in body.get("messages", []) if m.get("role") != "system"]}
+
+
+class FixtureTransport(httpx.AsyncBaseTransport):
+    """httpx transport that saves responses (record) or serves them without a network (replay)."""
+
+    def __init__(self, name: str, key_body=None):
+        self.name = name
+        self.key_body = key_body
+        self._inner = httpx.AsyncHTTPTransport() if FIXTURE_MODE == "record" else None
+
+    def _path(self, request):
+        body = request.content or b""
+        if self.key_body and body:
+            try:
+                body = json.dumps(self.key_body(json.loads(body)), sort_keys=True).encode()
+            except ValueError:
+                pass
+        digest = hashlib.sha256(request.method.encode() + b" " + str(request.url).encode() + b"\n" + body).hexdigest()[:24]
+        return os.path.join(FIXTURE_DIR, "http", self.name, f"{digest}.json")
+
+    async def handle_async_request(self, request):
+        path = self._path(request)
+        if FIXTURE_MODE == "replay":
+            return await self._replay(request, path)
+
+        t0 = time.perf_counter()
+        response = await self._inner.handle_async_request(request)
+        content = await response.aread()  # Decompressed
+        elapsed_ms = (time.perf_counter() - t0) * 1000
+        headers = {k: v for k, v in response.headers.items() if k.lower() not in _DROP_HEADERS}
+        try:
+            body = {"text": content.decode("utf-8")}
+        except UnicodeDecodeError:
+            body = {"base64": base64.b64encode(content).decode("ascii")}
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "method": request.method, "url": str(request.url), "status": response.status_code,
+                "headers": headers, "elapsed_ms": round(elapsed_ms, 1), **body,
+            }, f, indent=2)
+        return httpx.Response(response.status_code, headers=headers, content=content, request=request)
+
+    async def _replay(self, request, path):
+        try:
+            with open(path, encoding="utf-8") as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            # Looks like a network failure to the caller, same as an unreachable host
+            raise httpx.ConnectError(f"No {self.name} fixture for {request.method} {request.url}", request=request)
+        if REPLAY_LATENCY:
+            await asyncio.sleep(saved.get("elapsed_ms", 0) / 1000)
+        content = saved["text"].encode("utf-8") if "text" in saved else base64.b64decode(saved["base64"])
+        return httpx.Response(saved["status"], headers=saved["headers"], content=content, request=request)
+
+    async def aclose(self):
+        if self._inner is not None:
+            await self._inner.aclose()
+
+
+def http_transport(name: str, key_body=None):
+    """A FixtureTransport while recording/replaying, else None (httpx's normal transport)."""
+    return FixtureTransport(name, key_body) if ACTIVE else None
+
+
+def http_client(name: str, key_body=None):
+    """AsyncClient for SDKs that take one (OpenAI); None outside record/replay so they use their default."""
+    if not ACTIVE:
+        return None
+    return httpx.AsyncClient(transport=FixtureTransport(name, key_body), timeout=httpx.Timeout(60.0, connect=5.0))
+
+
+async def _abort(route):
+    await route.abort()
+
+
+async def route_har(context, driver: str, clean_number: str):
+    """Records the context's traffic to a HAR, or serves it back from one (unmatched requests are aborted)."""
+    if not ACTIVE:
+        return
+    path = har_path(driver, clean_number)
+    if FIXTURE_MODE == "record":
+        # Written when the context closes at the end of the lease
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        await context.route_from_har(path, update=True, update_content="embed")
+    elif os.path.exists(path):
+        await context.route_from_har(path, not_found="abort")
+    else:
+        logger.warning("⚠️ No HAR fixture for %s/%s; blocking all requests.", driver, clean_number)
+        await context.route("**/*", _abort)
@@ -0,0 +1,249 @@
+import os
+import glob
+import json
+import time
+import asyncio
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from dotenv import load_dotenv
+from services.utils import DATA_DIR, normalize_tracking_number
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# pyarrow is optional: pip install pyarrow (without it events are still returned, just not kept)
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# ============================================================
+# EVENT HISTORY: columnar (Parquet) store of every new tracking event, partitioned by day
+# ============================================================
+HISTORY_ENABLED = os.getenv("HISTORY_ENABLED", "true").lower() in ("1", "true", "yes")
+HISTORY_DIR = os.getenv("HISTORY_DIR", os.path.join(DATA_DIR, "history"))
+# Buffered events are written once this many pile up, or every FLUSH_SECONDS
+FLUSH_ROWS = int(os.getenv("HISTORY_FLUSH_ROWS", "5000"))
+FLUSH_SECONDS = float(os.getenv("HISTORY_FLUSH_SECONDS", "60"))
+# A query that loses a file to a concurrent compaction lists the folder again, this many times
+QUERY_ATTEMPTS = 3
+
+SCHEMA = pa.schema([
+    ("tracking_number", pa.string()),
+    ("carrier_type", pa.string()),
+    ("carrier", pa.string()),
+    ("code", pa.string()),
+    ("milestone", pa.string()),
+    ("location", pa.string()),
+    ("timestamp", pa.timestamp("s")),
+    ("vessel", pa.string()),
+    ("flight", pa.string()),
+    ("source", pa.string()),
+    ("observed_at", pa.timestamp("s")),
+]) if pa else None
+
+
+def _today():
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+
+class EventHistory:
+    """
+    Appends events to HISTORY_DIR/day=YYYY-MM-DD/*.parquet (day = when the event was observed).
+    Each process writes its own part files; a finished day is later merged into one file.
+    """
+
+    def __init__(self, root=HISTORY_DIR):
+        self.root = root
+        self._rows = []
+        self._lock = threading.Lock()
+        self._task = None
+        self.stats = {"appended": 0, "written": 0, "files": 0, "compacted_days": 0}
+
+    @property
+    def enabled(self):
+        return HISTORY_ENABLED and pa is not None
+
+    def append(self, tracking_number, carrier_type, carrier, events):
+        if not self.enabled or not events:
+            return
+        observed_at = datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+        clean = normalize_tracking_number(tracking_number)
+        rows = [
+            {
+                "tracking_number": clean, "carrier_type": carrier_type, "carrier": carrier,
+                "code": e.code, "milestone": e.milestone, "location": e.location, "timestamp": e.timestamp,
+                "vessel": e.vessel, "flight": e.flight, "source": e.source, "observed_at": observed_at,
+            }
+            for e in events
+        ]
+        with self._lock:
+            self._rows.extend(rows)
+            self.stats["appended"] += len(rows)
+            full = len(self._rows) >= FLUSH_ROWS
+        if full:
+            asyncio.get_running_loop().run_in_executor(None, self._flush).add_done_callback(self._flushed)
+
+    @staticmethod
+    def _flushed(future):
+        if not future.cancelled() and future.exception():
+            logger.error("❌ Event history flush failed: %s", future.exception())
+
+    # --- SYNC (run in a thread) ---
+    def _flush(self):
+        with self._lock:
+            rows, self._rows = self._rows, []
+        if not rows:
+            return 0
+        by_day = {}
+        for row in rows:
+            by_day.setdefault(row["observed_at"].strftime("%Y-%m-%d"), []).append(row)
+        written = 0
+        try:
+            for day, day_rows in by_day.items():
+                folder = os.path.join(self.root, f"day={day}")
+                os.makedirs(folder, exist_ok=True)
+                name = f"part-{os.getpid()}-{time.time_ns()}.parquet"
+                # Written under a dot-name (skipped by queries and compaction), then renamed whole
+                staging = os.path.join(folder, f".{name}")
+                pq.write_table(pa.Table.from_pylist(day_rows, schema=SCHEMA), staging, compression="zstd")
+                os.replace(staging, os.path.join(folder, name))
+                self.stats["files"] += 1
+                written += len(day_rows)
+        except Exception:
+            # Days not on disk go back to the front of the buffer for the next flush
+            unwritten = [row for day_rows in by_day.values() for row in day_rows][written:]
+            with self._lock:
+                self._rows[:0] = unwritten
+            raise
+        finally:
+            self.stats["written"] += written
+        return written
+
+    @staticmethod
+    def _live_files(folder):
+        """
+        (live, superseded) parquet files of one day. A compacted file names the files it merged in
+        its "replaces" metadata; those stay on disk briefly but must not be read twice.
+        """
+        paths = sorted(glob.glob(os.path.join(folder, "*.parquet")))
+        replaced = set()
+        for path in paths:
+            if os.path.basename(path).startswith("compacted-"):
+                metadata = pq.read_schema(path).metadata or {}
+                replaced.update(json.loads(metadata.get(b"replaces", b"[]")))
+        live = [path for path in paths if os.path.basename(path) not in replaced]
+        superseded = [path for path in paths if os.path.basename(path) in replaced]
+        return live, superseded
+
+    def _compact(self, day):
+        """
+        Merges one day's part files (written by every process) into a single file, together with
+        the day's earlier compacted file when a late flush added parts after it.
+        """
+        folder = os.path.join(self.root, f"day={day}")
+        files, superseded = self._live_files(folder)
+        parts = [path for path in files if os.path.basename(path).startswith("part-")]
+        merge = bool(parts) and len(files) >= 2
+        if merge:
+            table = pa.concat_tables([pq.read_table(path, schema=SCHEMA) for path in files])
+            table = table.sort_by([("tracking_number", "ascending"), ("timestamp", "ascending")])
+            # Readers skip the merged files as soon as this file exists, even before they are removed
+            table = table.replace_schema_metadata({"replaces": json.dumps([os.path.basename(path) for path in files])})
+            merged = os.path.join(folder, f"compacted-{time.time_ns()}.parquet")
+            staging = os.path.join(folder, f".{os.path.basename(merged)}")
+            pq.write_table(table, staging, compression="zstd")
+            os.replace(staging, merged)
+            superseded += files
+            self.stats["compacted_days"] += 1
+        # Also clears files a crashed compaction left behind
+        for path in superseded:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        return merge
+
+    def _compact_finished_days(self):
+        # Days before today only get late flushes from other processes; merge any day that has parts
+        today = _today()
+        days = {
+            os.path.basename(os.path.dirname(path))[len("day="):]
+            for path in glob.glob(os.path.join(self.root, "day=*", "part-*.parquet"))
+        }
+        for day in sorted(d for d in days if d < today):
+            self._compact(day)
+
+    def _query(self, tracking_number, since, until, limit):
+        for attempt in range(QUERY_ATTEMPTS):
+            try:
+                return self._query_once(tracking_number, since, until, limit)
+            except FileNotFoundError:
+                # A compaction removed a file between listing and reading; its rows are in the merged file
+                if attempt == QUERY_ATTEMPTS - 1:
+                    raise
+
+    def _query_once(self, tracking_number, since, until, limit):
+        files = []
+        for folder in sorted(glob.glob(os.path.join(self.root, "day=*"))):
+            if since <= os.path.basename(folder)[len("day="):] <= until:
+                files += self._live_files(folder)[0]
+        if not files:
+            return []
+        dataset = ds.dataset(files, format="parquet", schema=SCHEMA)
+        condition = None
+        if tracking_number:
+            condition = ds.field("tracking_number") == normalize_tracking_number(tracking_number)
+        table = dataset.to_table(filter=condition, columns=SCHEMA.names)
+        table = table.sort_by([("timestamp", "ascending"), ("observed_at", "ascending")]).slice(0, limit)
+        return [
+            {**row, "timestamp": row["timestamp"].isoformat() if row["timestamp"] else None,
+             "observed_at": row["observed_at"].isoformat()}
+            for row in table.to_pylist()
+        ]
+
+    # --- ASYNC API ---
+    async def flush(self):
+        if self.enabled:
+            await asyncio.to_thread(self._flush)
+
+    async def query(self, tracking_number=None, days=30, limit=1000):
+        """Events observed in the last `days` days, oldest first; one shipment or all of them."""
+        if pa is None:
+            return []
+        until = _today()
+        since = (datetime.now(timezone.utc) - timedelta(days=days)).strftime("%Y-%m-%d")
+        await self.flush()
+        return await asyncio.to_thread(self._query, tracking_number, since, until, limit)
+
+    def start(self, compact=False):
+        """Periodic flush; `compact` also merges finished days (run it in one process only)."""
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._loop(compact))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    async def _loop(self, compact):
+        while True:
+            await asyncio.sleep(FLUSH_SECONDS)
+            try:
+                await asyncio.to_thread(self._flush)
+                if compact:
+                    await asyncio.to_thread(self._compact_finished_days)
+            except Exception as e:
+                logger.error("❌ Event history flush failed: %s", e)
+
+    def snapshot(self):
+        return {"enabled": self.enabled, "buffered": len(self._rows), **self.stats}
+
+
+event_history = EventHistory()
@@ -0,0 +1,283 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import asyncio
+import threading
+from dotenv import load_dotenv
+from services.utils import DATA_DIR
+
+load_dotenv()
+
+# Redis is optional: pip install redis (only needed for JOB_QUEUE_URL=redis://...)
+try:
+    import redis.asyncio as aioredis
+except ImportError:
+    aioredis = None
+
+# --- JOB QUEUE CONFIG (override via .env) ---
+# sqlite:///path/to/jobs.sqlite3 (default, works across local worker processes) or redis://host:6379/0
+JOB_QUEUE_URL = os.getenv("JOB_QUEUE_URL", f"sqlite:///{os.path.join(DATA_DIR, 'jobs.sqlite3')}")
+# A running job not finished after this long is handed to another worker (its worker probably died)
+JOB_TIMEOUT = int(os.getenv("JOB_TIMEOUT_SECONDS", "300"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+
+FINISHED = ("done", "failed")
+
+
+def _new_id():
+    return uuid.uuid4().hex
+
+
+class SQLiteJobQueue:
+    """
+    Jobs table shared by the API and worker processes through one SQLite file.
+    Claims run in an IMMEDIATE transaction so two workers never take the same job.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._db = None
+        self._lock = threading.Lock()
+
+    def _conn(self):
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            # Autocommit; transactions are opened explicitly where they matter
+            self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+            self._db.row_factory = sqlite3.Row
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY, status TEXT, payload TEXT, result TEXT, error TEXT,
+                    attempts INTEGER DEFAULT 0, worker TEXT,
+                    created_at REAL, started_at REAL, finished_at REAL
+                )
+            """)
+            self._db.execute("CREATE INDEX IF NOT EXISTS jobs_queued ON jobs (status, created_at)")
+        return self._db
+
+    @staticmethod
+    def _row(row):
+        if row is None:
+            return None
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def _enqueue(self, payloads):
+        now = time.time()
+        ids = [_new_id() for _ in payloads]
+        with self._lock:
+            db = self._conn()
+            # One transaction per call: autocommit would sync to disk once per job (manifests queue thousands)
+            db.execute("BEGIN")
+            try:
+                db.executemany(
+                    "INSERT INTO jobs (id, status, payload, created_at) VALUES (?, 'queued', ?, ?)",
+                    [(job_id, json.dumps(payload), now) for job_id, payload in zip(ids, payloads)],
+                )
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+        return ids
+
+    def _claim(self, worker):
+        now = time.time()
+        with self._lock:
+            db = self._conn()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                # Jobs whose worker vanished go back to the queue, or fail after JOB_MAX_ATTEMPTS
+                db.execute(
+                    "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END, "
+                    "error = CASE WHEN attempts >= ? THEN 'Worker timed out' ELSE error END "
+                    "WHERE status = 'running' AND started_at < ?",
+                    (JOB_MAX_ATTEMPTS, JOB_MAX_ATTEMPTS, now - JOB_TIMEOUT),
+                )
+                row = db.execute(
+                    "SELECT * FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+                ).fetchone()
+                if row:
+                    db.execute(
+                        "UPDATE jobs SET status = 'running', worker = ?, started_at = ?, attempts = attempts + 1 WHERE id = ?",
+                        (worker, now, row["id"]),
+                    )
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+        if not row:
+            return None
+        job = self._row(row)
+        return {**job, "status": "running", "worker": worker, "started_at": now, "attempts": job["attempts"] + 1}
+
+    def _finish(self, job_id, status, result=None, error=None):
+        with self._lock:
+            self._conn().execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+                (status, json.dumps(result) if result is not None else None, error, time.time(), job_id),
+            )
+
+    def _get(self, job_id):
+        with self._lock:
+            row = self._conn().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row(row)
+
+    def _counts(self, ids=None):
+        with self._lock:
+            db = self._conn()
+            if ids is None:
+                rows = db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+                return {status: count for status, count in rows}
+            counts = {}
+            # Chunked to stay under SQLite's bound-parameter limit (manifests queue 100k jobs)
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                for status, count in db.execute(
+                    f"SELECT status, COUNT(*) FROM jobs WHERE id IN ({','.join('?' * len(chunk))}) GROUP BY status",
+                    chunk,
+                ):
+                    counts[status] = counts.get(status, 0) + count
+        return counts
+
+    async def enqueue(self, payloads):
+        return await asyncio.to_thread(self._enqueue, list(payloads))
+
+    async def claim(self, worker: str):
+        return await asyncio.to_thread(self._claim, worker)
+
+    async def complete(self, job_id: str, result):
+        await asyncio.to_thread(self._finish, job_id, "done", result)
+
+    async def fail(self, job_id: str, error: str):
+        await asyncio.to_thread(self._finish, job_id, "failed", None, error)
+
+    async def get(self, job_id: str):
+        return await asyncio.to_thread(self._get, job_id)
+
+    async def counts(self, ids=None):
+        """Jobs per status: the whole queue, or just `ids`."""
+        return await asyncio.to_thread(self._counts, list(ids) if ids is not None else None)
+
+
+class RedisJobQueue:
+    """
+    Same interface on Redis: a list of queued ids, a list of running ids plus one hash per job.
+    Claims move an id to the running list atomically; ids left there past JOB_TIMEOUT are requeued
+    (or failed after JOB_MAX_ATTEMPTS) by the next claim, like the SQLite queue.
+    """
+
+    QUEUE = "mp:jobs:queued"
+    RUNNING = "mp:jobs:running"
+    JOB_PREFIX = "mp:job:"
+
+    # KEYS: queued list, running list. ARGV: job key prefix, worker, now, cutoff, max attempts
+    CLAIM_SCRIPT = """
+    for _, id in ipairs(redis.call('LRANGE', KEYS[2], 0, -1)) do
+        local key = ARGV[1] .. id
+        local job = redis.call('HMGET', key, 'status', 'started_at', 'attempts')
+        if job[1] ~= 'running' then
+            redis.call('LREM', KEYS[2], 0, id)
+        elseif tonumber(job[2] or '0') < tonumber(ARGV[4]) then
+            redis.call('LREM', KEYS[2], 0, id)
+            if tonumber(job[3] or '0') >= tonumber(ARGV[5]) then
+                redis.call('HSET', key, 'status', 'failed', 'error', 'Worker timed out', 'finished_at', ARGV[3])
+            else
+                redis.call('HSET', key, 'status', 'queued')
+                redis.call('RPUSH', KEYS[1], id)
+            end
+        end
+    end
+    local id = redis.call('RPOPLPUSH', KEYS[1], KEYS[2])
+    if not id then return false end
+    local key = ARGV[1] .. id
+    redis.call('HSET', key, 'status', 'running', 'worker', ARGV[2], 'started_at', ARGV[3])
+    redis.call('HINCRBY', key, 'attempts', 1)
+    return id
+    """
+
+    def __init__(self, url):
+        if aioredis is None:
+            raise RuntimeError("JOB_QUEUE_URL is redis:// but the redis package is not installed.")
+        self.redis = aioredis.from_url(url, decode_responses=True)
+        self._claim_script = self.redis.register_script(self.CLAIM_SCRIPT)
+
+    @classmethod
+    def _key(cls, job_id):
+        return f"{cls.JOB_PREFIX}{job_id}"
+
+    async def enqueue(self, payloads):
+        ids = []
+        now = time.time()
+        async with self.redis.pipeline() as pipe:
+            for payload in payloads:
+                job_id = _new_id()
+                ids.append(job_id)
+                pipe.hset(self._key(job_id), mapping={
+                    "id": job_id, "status": "queued", "payload": json.dumps(payload), "attempts": 0, "created_at": now,
+                })
+                pipe.lpush(self.QUEUE, job_id)
+            await pipe.execute()
+        return ids
+
+    async def claim(self, worker: str):
+        now = time.time()
+        job_id = await self._claim_script(
+            keys=[self.QUEUE, self.RUNNING],
+            args=[self.JOB_PREFIX, worker, now, now - JOB_TIMEOUT, JOB_MAX_ATTEMPTS],
+        )
+        if not job_id:
+            return None
+        return await self.get(job_id)
+
+    async def _finish(self, job_id, fields):
+        # MULTI: a job is never finished while still listed as running
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hset(self._key(job_id), mapping={**fields, "finished_at": time.time()})
+            pipe.lrem(self.RUNNING, 0, job_id)
+            await pipe.execute()
+
+    async def complete(self, job_id: str, result):
+        await self._finish(job_id, {"status": "done", "result": json.dumps(result)})
+
+    async def fail(self, job_id: str, error: str):
+        await self._finish(job_id, {"status": "failed", "error": error})
+
+    async def get(self, job_id: str):
+        job = await self.redis.hgetall(self._key(job_id))
+        if not job:
+            return None
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job.get("result") else None
+        job["attempts"] = int(job.get("attempts", 0))
+        for field in ("created_at", "started_at", "finished_at"):
+            if job.get(field):
+                job[field] = float(job[field])
+        return job
+
+    async def counts(self, ids=None):
+        if ids is None:
+            return {"queued": await self.redis.llen(self.QUEUE), "running": await self.redis.llen(self.RUNNING)}
+        counts = {}
+        async with self.redis.pipeline() as pipe:
+            for job_id in ids:
+                pipe.hget(self._key(job_id), "status")
+            for status in await pipe.execute():
+                if status:
+                    counts[status] = counts.get(status, 0) + 1
+        return counts
+
+
+def open_queue(url=JOB_QUEUE_URL):
+    if url.startswith("redis://") or url.startswith("rediss://"):
+        return RedisJobQueue(url)
+    if url.startswith("sqlite:///"):
+        return SQLiteJobQueue(url[len("sqlite:///"):])
+    raise ValueError(f"Unsupported JOB_QUEUE_URL: {url}")
+
+
+job_queue = open_queue()
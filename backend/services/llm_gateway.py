@@ -0,0 +1,264 @@
+import os
+import time
+import json
+import random
+import asyncio
+import hashlib
+import logging
+from collections import deque
+import httpx
+from openai import AsyncOpenAI, APIConnectionError, APIStatusError, APITimeoutError
+from dotenv import load_dotenv
+from services.fixtures import http_client, ignore_system_messages
+from services.cache import SingleFlight
+from services.metrics import count_llm_tokens
+from services.resilience import guard
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# ============================================================
+# LLM GATEWAY: every chat-completion goes through chat() below
+# ============================================================
+# Unset: OPENAI_BASE_URL / the OpenAI API. Any OpenAI-compatible server works (vLLM, Ollama, a stub)
+LLM_BASE_URL = os.getenv("LLM_BASE_URL") or None
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+# Per model; override one with LLM_CONCURRENCY_<MODEL> / LLM_TPM_<MODEL>, e.g. LLM_TPM_GPT_4O=30000
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "8"))
+LLM_TPM = int(os.getenv("LLM_TPM", "200000"))
+# Output allowance reserved for calls that don't set max_tokens
+DEFAULT_COMPLETION_TOKENS = 500
+# A low-res captcha crop; high-detail images cost more, but captchas are tiny
+IMAGE_TOKENS = 255
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+RECENT_CALLS = 200
+
+# SDK retries are off: ours are jittered and reuse the TPM reservation
+client = AsyncOpenAI(
+    api_key=os.getenv("OPENAI_API_KEY"),
+    base_url=LLM_BASE_URL,
+    timeout=httpx.Timeout(LLM_TIMEOUT_SECONDS, connect=5.0),
+    max_retries=0,
+    http_client=http_client("openai", ignore_system_messages),
+)
+
+
+def estimate_tokens(text: str):
+    # ~4 chars per token is close enough for budgeting English/JSON text
+    return len(text) // 4 + 1
+
+
+def estimate_request_tokens(kwargs):
+    """Prompt + reserved completion tokens of a chat.completions.create call, before sending it."""
+    total = 0
+    for message in kwargs.get("messages", []):
+        content = message.get("content") or ""
+        if isinstance(content, str):
+            total += estimate_tokens(content)
+            continue
+        for part in content:
+            total += IMAGE_TOKENS if part.get("type") == "image_url" else estimate_tokens(part.get("text", ""))
+    return total + (kwargs.get("max_tokens") or DEFAULT_COMPLETION_TOKENS)
+
+
+def _env_name(model: str):
+    return "".join(c if c.isalnum() else "_" for c in model).upper()
+
+
+class TokenBudget:
+    """
+    Tokens-per-minute bucket. acquire() reserves a call's estimate (waiting if the minute is spent),
+    settle() swaps the estimate for the usage the API reported.
+    """
+
+    def __init__(self, tpm: int):
+        self.capacity = tpm
+        self.rate = tpm / 60
+        self.tokens = float(tpm)
+        self.updated = time.monotonic()
+        self.waited = 0.0
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, tokens: int):
+        # A prompt bigger than the whole budget waits for a full bucket instead of forever
+        tokens = min(tokens, self.capacity)
+        while True:
+            self._refill()
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return
+            # Re-check often: finishing calls refund unused reservations
+            delay = min((tokens - self.tokens) / self.rate, 0.25)
+            self.waited += delay
+            await asyncio.sleep(delay)
+
+    def settle(self, reserved: int, used: int):
+        # Refund an overestimate; an underestimate goes negative and slows the next calls
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + min(reserved, self.capacity) - used)
+
+
+class ModelLane:
+    """Concurrency cap, TPM budget and usage counters for one model."""
+
+    def __init__(self, model: str):
+        self.model = model
+        name = _env_name(model)
+        self.limit = asyncio.Semaphore(int(os.getenv(f"LLM_CONCURRENCY_{name}", LLM_CONCURRENCY)))
+        self.budget = TokenBudget(int(os.getenv(f"LLM_TPM_{name}", LLM_TPM)))
+        self.active = 0
+        self.stats = {
+            "calls": 0, "errors": 0, "retries": 0, "coalesced": 0,
+            "prompt_tokens": 0, "completion_tokens": 0, "total_ms": 0.0, "max_ms": 0.0,
+        }
+
+    def snapshot(self):
+        s = self.stats
+        finished = s["calls"] - s["errors"]
+        return {
+            **s,
+            "total_ms": round(s["total_ms"]),
+            "max_ms": round(s["max_ms"]),
+            "avg_ms": round(s["total_ms"] / finished) if finished else None,
+            "active": self.active,
+            "tpm_available": round(self.budget.tokens),
+            "tpm_waited_s": round(self.budget.waited, 1),
+        }
+
+
+_lanes = {}
+_inflight = SingleFlight()
+# Most recent calls, newest last: {model, purpose, prompt/completion tokens, latency, attempts, outcome}
+RECENT = deque(maxlen=RECENT_CALLS)
+
+
+def _lane(model: str):
+    if model not in _lanes:
+        _lanes[model] = ModelLane(model)
+    return _lanes[model]
+
+
+def _header_seconds(headers, name, scale=1.0):
+    try:
+        return float(headers.get(name, "")) / scale
+    except ValueError:
+        return None  # Missing, or an HTTP date
+
+
+def _retry_delay(attempt: int, error):
+    """
+    Seconds before the next attempt, or None when the server asks us to wait longer than
+    LLM_TIMEOUT_SECONDS (the caller is better off with the error than with a stalled request).
+    """
+    response = getattr(error, "response", None)
+    if response is not None:
+        retry_after = _header_seconds(response.headers, "retry-after-ms", 1000)
+        if retry_after is None:
+            retry_after = _header_seconds(response.headers, "retry-after")
+        if retry_after is not None:
+            return max(retry_after, 0.0) if retry_after <= LLM_TIMEOUT_SECONDS else None
+    # Exponential backoff with full jitter
+    return min(random.uniform(0, LLM_BACKOFF_BASE * (2 ** attempt)), LLM_TIMEOUT_SECONDS)
+
+
+def _retryable(error):
+    if isinstance(error, (APITimeoutError, APIConnectionError)):
+        return True
+    return isinstance(error, APIStatusError) and error.status_code in RETRY_STATUSES
+
+
+def _record(lane, purpose, response, started, attempts, outcome):
+    latency_ms = (time.perf_counter() - started) * 1000
+    usage = getattr(response, "usage", None)
+    prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+    completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+    s = lane.stats
+    s["calls"] += 1
+    s["retries"] += attempts - 1
+    if outcome != "ok":
+        s["errors"] += 1
+    else:
+        s["total_ms"] += latency_ms
+        s["max_ms"] = max(s["max_ms"], latency_ms)
+    s["prompt_tokens"] += prompt_tokens
+    s["completion_tokens"] += completion_tokens
+    count_llm_tokens(lane.model, prompt_tokens, completion_tokens)
+    RECENT.append({
+        "model": lane.model, "purpose": purpose, "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens, "latency_ms": round(latency_ms), "attempts": attempts,
+        "outcome": outcome, "at": time.time(),
+    })
+    logger.debug("🧠 %s [%s] %s+%s tokens in %.0fms (%s attempt(s), %s)",
+                 lane.model, purpose, prompt_tokens, completion_tokens, latency_ms, attempts, outcome)
+    return prompt_tokens + completion_tokens
+
+
+async def _call(lane, purpose, kwargs):
+    """One logical call: model slot -> breaker -> TPM reservation -> attempts with jittered retry."""
+    reserved = estimate_request_tokens(kwargs)
+    openai_guard = guard("openai")
+    async with lane.limit:
+        lane.active += 1
+        started, attempts, held, used = time.perf_counter(), 0, 0, 0
+        try:
+            async with openai_guard.protect():
+                await lane.budget.acquire(reserved)
+                held = reserved
+                # Latency is the API's (retries included); queueing shows up in tpm_waited_s
+                started = time.perf_counter()
+                while True:
+                    attempts += 1
+                    try:
+                        response = await client.chat.completions.create(**kwargs)
+                        used = _record(lane, purpose, response, started, attempts, "ok")
+                        return response
+                    except Exception as e:
+                        delay = _retry_delay(attempts - 1, e) if _retryable(e) and attempts <= LLM_MAX_RETRIES else None
+                        if delay is None:
+                            _record(lane, purpose, None, started, attempts, type(e).__name__)
+                            raise
+                        logger.info("🔁 LLM %s (%s), retrying in %.1fs...", lane.model,
+                                    getattr(e, "status_code", type(e).__name__), delay)
+                        await asyncio.sleep(delay)
+                        await openai_guard.bucket.acquire()
+        finally:
+            lane.active -= 1
+            lane.budget.settle(held, used)
+
+
+def _request_key(kwargs):
+    return hashlib.sha256(json.dumps(kwargs, sort_keys=True, default=str).encode()).hexdigest()
+
+
+async def chat(purpose: str = "", **kwargs):
+    """
+    chat.completions.create through the gateway. Identical requests already in flight share one
+    call, which is only cancelled once every caller has gone. Raises CircuitOpen while the OpenAI
+    breaker is open, and the last API error once retries are spent (or retry-after is too long).
+    """
+    lane = _lane(kwargs["model"])
+    key = _request_key(kwargs)
+    # Single-flight: piggyback on an identical request that is already running
+    if key in _inflight:
+        lane.stats["coalesced"] += 1
+    return await _inflight.run(key, lambda: _call(lane, purpose, kwargs))
+
+
+async def close_llm_client():
+    await client.close()
+
+
+def llm_report():
+    return {
+        "base_url": str(client.base_url),
+        "models": {model: lane.snapshot() for model, lane in _lanes.items()},
+        "inflight": len(_inflight),
+        "recent": list(RECENT)[-20:],
+    }
@@ -0,0 +1,390 @@
+import os
+import csv
+import json
+import time
+import uuid
+import codecs
+import sqlite3
+import asyncio
+import logging
+import threading
+from datetime import date, datetime
+from dotenv import load_dotenv
+from services.utils import DATA_DIR, normalize_tracking_number
+from services.validation import AWB_RE, validation_error, awb_check_ok
+from services.cache import cache_key
+from services.store import shipment_store
+from services.jobs import job_queue
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# openpyxl is only needed for .xlsx uploads (CSV works without it)
+try:
+    from openpyxl import load_workbook
+except ImportError:
+    load_workbook = None
+
+# ============================================================
+# MANIFEST INGESTION: stream an uploaded XLSX/CSV, queue every unique shipment
+# ============================================================
+# Rows parsed, validated and queued per step; memory stays flat whatever the file size
+CHUNK_ROWS = int(os.getenv("MANIFEST_CHUNK_ROWS", "5000"))
+MANIFEST_DB_PATH = os.getenv("MANIFEST_DB_PATH", os.path.join(DATA_DIR, "manifests.sqlite3"))
+
+# Same header guesses as the dashboard's normalizeKeys (frontend/utils/excel.ts)
+COLUMN_KEYWORDS = {
+    "tracking_number": ("container", "awb", "tracking"),
+    "carrier": ("carrier", "shipping line", "airline"),
+    "system_eta": ("eta", "arrival"),
+    "destination": ("destination", "pod", "port of discharge"),
+}
+# Headerless cargo CSVs: Container,Vessel,Carrier,ETD,ETA,Destination,ATA
+DEFAULT_COLUMNS = {"tracking_number": 0, "carrier": 2, "system_eta": 4, "destination": 5}
+
+
+class ManifestError(ValueError):
+    """The upload can't be read as a manifest (bad format, no tracking column)."""
+
+
+# --- READING (sync; chunks are pulled through asyncio.to_thread) ---
+class NumericCell(str):
+    """An XLSX cell Excel stored as a number, so any leading zero is already gone."""
+
+
+def _cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.date().isoformat() if value.time() == datetime.min.time() else value.isoformat(" ")
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, float) and value.is_integer():
+        return NumericCell(int(value))
+    if isinstance(value, int) and not isinstance(value, bool):
+        return NumericCell(value)
+    return str(value).strip()
+
+
+def _csv_rows(file):
+    sample = file.read(8192)
+    file.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample.decode("utf-8-sig", errors="replace"), delimiters=",;\t|")
+    except csv.Error:
+        dialect = csv.excel
+    for row in csv.reader(codecs.iterdecode(file, "utf-8-sig", errors="replace"), dialect):
+        yield [cell.strip() for cell in row]
+
+
+def _xlsx_rows(file):
+    if load_workbook is None:
+        raise ManifestError("XLSX uploads need openpyxl (pip install openpyxl); upload a CSV instead.")
+    # read_only streams the sheet XML row by row instead of building the whole workbook
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        for row in workbook.worksheets[0].iter_rows(values_only=True):
+            yield [_cell(value) for value in row]
+    finally:
+        workbook.close()
+
+
+def iter_rows(file, filename: str):
+    name = (filename or "").lower()
+    if name.endswith((".xlsx", ".xlsm")):
+        return _xlsx_rows(file)
+    if name.endswith((".csv", ".txt", ".tsv")) or not name:
+        return _csv_rows(file)
+    raise ManifestError(f"Unsupported manifest format: {filename} (use .xlsx or .csv)")
+
+
+def iter_chunks(rows, size=CHUNK_ROWS):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# --- COLUMN INFERENCE ---
+def infer_columns(first_row):
+    """
+    Maps fields to column indexes from the first row. Returns (columns, has_header).
+    A first row that starts with something shaped like a tracking number is data:
+    the file is a headerless cargo CSV (Container,Vessel,Carrier,ETD,ETA,Destination,ATA).
+    """
+    first = str(first_row[0]).strip() if first_row else ""
+    if len(first) >= 10 and any(ch.isdigit() for ch in first):
+        # Header cells don't carry digits; a long alphanumeric first cell is a tracking number
+        return dict(DEFAULT_COLUMNS), False
+
+    columns = {}
+    for index, header in enumerate(first_row):
+        lower = str(header).lower().strip()
+        for field, keywords in COLUMN_KEYWORDS.items():
+            # First matching column wins (a later "Container Type" doesn't replace "Container No")
+            if field not in columns and any(keyword in lower for keyword in keywords):
+                columns[field] = index
+                break
+    if columns:
+        if "tracking_number" not in columns:
+            # Headers, but none for the number: same positional guess as normalizeKeys
+            columns = {**DEFAULT_COLUMNS, **columns, "tracking_number": 0}
+        return columns, True
+    raise ManifestError("No tracking number column found (expected a Container / AWB / Tracking header).")
+
+
+def shipment_type(tracking_number: str):
+    """Air for AWBs ('098-12345675' or 11 digits), sea for everything else (containers, B/Ls)."""
+    number = str(tracking_number).strip()
+    if "-" in number and len(number.split("-")[1]) == 8:
+        return "air"
+    return "air" if AWB_RE.match(normalize_tracking_number(number)) else "sea"
+
+
+def lost_leading_zero(cell, clean: str):
+    """
+    True for a 10-digit number that is an AWB whose prefix lost its leading zero (098, 057...):
+    the XLSX cell was numeric, or the zero-padded number passes the AWB check digit. Anything
+    else, such as a 10-digit sea B/L in a CSV, is kept as it was.
+    """
+    if not (clean.isdigit() and len(clean) == 10):
+        return False
+    return isinstance(cell, NumericCell) or awb_check_ok(clean.zfill(11))
+
+
+def _value(row, columns, field):
+    index = columns.get(field)
+    return row[index] if index is not None and index < len(row) else ""
+
+
+class ManifestStore:
+    """
+    Uploaded manifests and their unique shipments (with the job tracking each one).
+    SQLite in DATA_DIR; calls run in a thread so the event loop never blocks on disk.
+    """
+
+    def __init__(self, db_path=MANIFEST_DB_PATH):
+        self.db_path = db_path
+        self._db = None
+        self._lock = threading.Lock()
+
+    def _conn(self):
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.row_factory = sqlite3.Row
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript("""
+                CREATE TABLE IF NOT EXISTS manifests (
+                    id TEXT PRIMARY KEY, filename TEXT, status TEXT, columns TEXT,
+                    rows INTEGER DEFAULT 0, shipments INTEGER DEFAULT 0, duplicates INTEGER DEFAULT 0,
+                    invalid INTEGER DEFAULT 0, skipped INTEGER DEFAULT 0,
+                    error TEXT, created_at REAL, finished_at REAL
+                );
+                CREATE TABLE IF NOT EXISTS manifest_items (
+                    manifest_id TEXT, position INTEGER,
+                    tracking_number TEXT, carrier TEXT, type TEXT, system_eta TEXT, destination TEXT,
+                    row_count INTEGER DEFAULT 1, job_id TEXT, error TEXT,
+                    PRIMARY KEY (manifest_id, position)
+                );
+            """)
+        return self._db
+
+    # --- SYNC (run via asyncio.to_thread) ---
+    def _create(self, manifest_id, filename):
+        with self._lock:
+            db = self._conn()
+            db.execute(
+                "INSERT INTO manifests (id, filename, status, created_at) VALUES (?, ?, 'ingesting', ?)",
+                (manifest_id, filename, time.time()),
+            )
+            db.commit()
+
+    def _add_items(self, manifest_id, items):
+        with self._lock:
+            db = self._conn()
+            db.executemany(
+                "INSERT INTO manifest_items (manifest_id, position, tracking_number, carrier, type, system_eta, "
+                "destination, job_id, error) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (manifest_id, item["position"], item["tracking_number"], item["carrier"], item["type"],
+                     item["system_eta"], item["destination"], item.get("job_id"), item.get("error"))
+                    for item in items
+                ],
+            )
+            db.commit()
+
+    def _finish(self, manifest_id, status, stats, columns, duplicate_counts, error):
+        with self._lock:
+            db = self._conn()
+            db.executemany(
+                "UPDATE manifest_items SET row_count = ? WHERE manifest_id = ? AND position = ?",
+                [(count, manifest_id, position) for position, count in duplicate_counts.items()],
+            )
+            db.execute(
+                "UPDATE manifests SET status = ?, columns = ?, rows = ?, shipments = ?, duplicates = ?, invalid = ?, "
+                "skipped = ?, error = ?, finished_at = ? WHERE id = ?",
+                (status, json.dumps(columns), stats["rows"], stats["shipments"], stats["duplicates"],
+                 stats["invalid"], stats["skipped"], error, time.time(), manifest_id),
+            )
+            db.commit()
+
+    def _get(self, manifest_id):
+        with self._lock:
+            row = self._conn().execute("SELECT * FROM manifests WHERE id = ?", (manifest_id,)).fetchone()
+        if row is None:
+            return None
+        manifest = dict(row)
+        manifest["columns"] = json.loads(manifest["columns"]) if manifest["columns"] else None
+        return manifest
+
+    def _items(self, manifest_id, offset, limit):
+        with self._lock:
+            rows = self._conn().execute(
+                "SELECT * FROM manifest_items WHERE manifest_id = ? ORDER BY position LIMIT ? OFFSET ?",
+                (manifest_id, limit, offset),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def _job_ids(self, manifest_id):
+        with self._lock:
+            rows = self._conn().execute(
+                "SELECT job_id FROM manifest_items WHERE manifest_id = ? AND job_id IS NOT NULL", (manifest_id,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    # --- ASYNC API ---
+    async def create(self, manifest_id, filename):
+        await asyncio.to_thread(self._create, manifest_id, filename)
+
+    async def add_items(self, manifest_id, items):
+        await asyncio.to_thread(self._add_items, manifest_id, items)
+
+    async def finish(self, manifest_id, status, stats, columns, duplicate_counts, error=None):
+        await asyncio.to_thread(self._finish, manifest_id, status, stats, columns, duplicate_counts, error)
+
+    async def get(self, manifest_id):
+        return await asyncio.to_thread(self._get, manifest_id)
+
+    async def items(self, manifest_id, offset=0, limit=500):
+        return await asyncio.to_thread(self._items, manifest_id, offset, limit)
+
+    async def job_ids(self, manifest_id):
+        return await asyncio.to_thread(self._job_ids, manifest_id)
+
+
+manifest_store = ManifestStore()
+
+
+async def _queue_chunk(manifest_id, items, watch):
+    valid = [item for item in items if not item.get("error")]
+    if valid:
+        job_ids = await job_queue.enqueue(
+            {"tracking_number": item["tracking_number"], "carrier": item["carrier"], "type": item["type"],
+             "force_refresh": False, "manifest_id": manifest_id}
+            for item in valid
+        )
+        for item, job_id in zip(valid, job_ids):
+            item["job_id"] = job_id
+        if watch:
+            await shipment_store.watch(
+                (cache_key(item["tracking_number"], item["carrier"], item["type"]),
+                 item["tracking_number"], item["carrier"], item["type"])
+                for item in valid
+            )
+    await manifest_store.add_items(manifest_id, items)
+
+
+async def ingest_manifest(file, filename: str, watch: bool = False):
+    """
+    Reads the upload CHUNK_ROWS rows at a time: infers columns from the first row, drops blank
+    and duplicate rows, validates numbers and queues one tracking job per unique shipment.
+    Only the dedupe index grows with the file; rows themselves never pile up in memory.
+    """
+    manifest_id = uuid.uuid4().hex
+    await manifest_store.create(manifest_id, filename)
+    stats = {"rows": 0, "shipments": 0, "duplicates": 0, "invalid": 0, "skipped": 0}
+    seen = {}                # (clean number, type) -> position of the first row
+    duplicate_counts = {}    # position -> rows sharing it (only when > 1)
+    columns = None
+    t0 = time.perf_counter()
+
+    try:
+        chunks = iter_chunks(iter_rows(file, filename))
+        while True:
+            chunk = await asyncio.to_thread(next, chunks, None)
+            if chunk is None:
+                break
+            if columns is None:
+                columns, has_header = infer_columns(chunk[0])
+                if has_header:
+                    chunk = chunk[1:]
+
+            items = []
+            for row in chunk:
+                stats["rows"] += 1
+                number = _value(row, columns, "tracking_number")
+                clean = normalize_tracking_number(number)
+                if not clean or clean == "UNKNOWN":
+                    stats["skipped"] += 1
+                    continue
+                if lost_leading_zero(number, clean):
+                    number = clean = clean.zfill(11)
+                carrier_type = shipment_type(number)
+                key = (clean, carrier_type)
+                if key in seen:
+                    stats["duplicates"] += 1
+                    position = seen[key]
+                    duplicate_counts[position] = duplicate_counts.get(position, 1) + 1
+                    continue
+                seen[key] = position = stats["shipments"]
+                stats["shipments"] += 1
+                error = validation_error(number, carrier_type, _value(row, columns, "carrier"))
+                if error:
+                    stats["invalid"] += 1
+                items.append({
+                    "position": position,
+                    "tracking_number": number,
+                    "carrier": _value(row, columns, "carrier"),
+                    "type": carrier_type,
+                    "system_eta": _value(row, columns, "system_eta"),
+                    "destination": _value(row, columns, "destination"),
+                    "error": error,
+                })
+            await _queue_chunk(manifest_id, items, watch)
+    except Exception as e:
+        logger.error("❌ Manifest %s failed after %s rows: %s", manifest_id, stats["rows"], e)
+        await manifest_store.finish(manifest_id, "failed", stats, columns, duplicate_counts, str(e))
+        raise
+
+    await manifest_store.finish(manifest_id, "queued", stats, columns, duplicate_counts)
+    logger.info(
+        "📑 Manifest %s: %s rows -> %s shipments queued (%s duplicate, %s invalid) in %.1fs",
+        manifest_id, stats["rows"], stats["shipments"] - stats["invalid"], stats["duplicates"],
+        stats["invalid"], time.perf_counter() - t0,
+    )
+    return {"manifest_id": manifest_id, "status": "queued", "columns": columns, **stats}
+
+
+async def manifest_progress(manifest_id: str):
+    """The manifest's counters plus where its tracking jobs are (queued/running/done/failed)."""
+    manifest = await manifest_store.get(manifest_id)
+    if manifest is None:
+        return None
+    manifest["jobs"] = await job_queue.counts(await manifest_store.job_ids(manifest_id))
+    return manifest
+
+
+async def manifest_items(manifest_id: str, offset: int = 0, limit: int = 500):
+    """One page of unique shipments, each with its job's status and result when finished."""
+    items = await manifest_store.items(manifest_id, offset, limit)
+    for item in items:
+        job = await job_queue.get(item["job_id"]) if item["job_id"] else None
+        item["job_status"] = job["status"] if job else ("invalid" if item["error"] else None)
+        item["result"] = job["result"] if job else None
+    return items
@@ -0,0 +1,102 @@
+import logging
+import time
+import asyncio
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Prometheus export is optional: pip install prometheus-client
+try:
+    from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+    CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+# ============================================================
+# STAGE LATENCY: one histogram, labeled by stage / carrier / outcome
+# ============================================================
+# Stages: cargoes_flow, replay, lease, driver, scrape (whole master_scraper), reduce, parse, llm
+# Buckets span a cache-speed API hit (~50ms) up to a captcha-heavy scrape (~2 min)
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+MAX_LABEL_CHARS = 32
+
+if PROMETHEUS_AVAILABLE:
+    STAGE_SECONDS = Histogram(
+        "mp_stage_duration_seconds",
+        "Time spent in each tracking stage",
+        ["stage", "carrier", "outcome"],
+        buckets=BUCKETS,
+    )
+    LLM_TOKENS = Counter(
+        "mp_llm_tokens",
+        "Tokens reported by the LLM API",
+        ["model", "kind"],
+    )
+
+
+def _label(value):
+    # Carrier names come from user input: bound their length so the series count stays sane
+    return (str(value or "").strip().lower()[:MAX_LABEL_CHARS]) or "unknown"
+
+
+def observe(stage: str, carrier: str, outcome: str, seconds: float):
+    logger.debug("⏱️ %s [%s] %s in %.0fms", stage, carrier, outcome, seconds * 1000)
+    if PROMETHEUS_AVAILABLE:
+        STAGE_SECONDS.labels(stage, _label(carrier), outcome).observe(seconds)
+
+
+def count_llm_tokens(model: str, prompt_tokens: int, completion_tokens: int):
+    if PROMETHEUS_AVAILABLE:
+        LLM_TOKENS.labels(_label(model), "prompt").inc(prompt_tokens)
+        LLM_TOKENS.labels(_label(model), "completion").inc(completion_tokens)
+
+
+class Span:
+    """Outcome holder for `span()`; set `.outcome` before the block ends (defaults to "ok")."""
+
+    __slots__ = ("stage", "carrier", "outcome")
+
+    def __init__(self, stage: str, carrier: str):
+        self.stage = stage
+        self.carrier = carrier
+        self.outcome = "ok"
+
+
+@contextmanager
+def span(stage: str, carrier: str = ""):
+    """
+    Times a block into mp_stage_duration_seconds.
+    An exception records outcome "error" (or "cancelled") and is re-raised.
+    """
+    current = Span(stage, carrier)
+    t0 = time.perf_counter()
+    try:
+        yield current
+    except asyncio.CancelledError:
+        current.outcome = "cancelled"
+        raise
+    except Exception:
+        current.outcome = "error"
+        raise
+    finally:
+        observe(stage, current.carrier, current.outcome, time.perf_counter() - t0)
+
+
+def register_pool_gauges(pool):
+    """Browser pool occupancy, read at scrape time."""
+    if not PROMETHEUS_AVAILABLE:
+        return
+    Gauge("mp_browser_contexts_leased", "Browser contexts currently leased").set_function(
+        lambda: pool.metrics["leased"])
+    Gauge("mp_browser_leases", "Contexts served since start").set_function(
+        lambda: pool.metrics["total_leases"])
+    Gauge("mp_browser_recycles", "Browsers recycled (max uses or crash)").set_function(
+        lambda: pool.metrics["recycled"])
+
+
+def metrics_response():
+    """(body, content_type) for the /metrics endpoint."""
+    if not PROMETHEUS_AVAILABLE:
+        return b"# prometheus-client is not installed\n", CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
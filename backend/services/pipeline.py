@@ -0,0 +1,97 @@
+import json
+from services.scraper_engine import master_scraper
+from services.cargoes_flow import forget_miss
+from services.ai_service import parse_tracking_data
+from services.cache import tracking_cache, cache_key
+from services.reducer import reduce_raw_text
+from services.metrics import span
+from services.registry import resolve
+from services.events import build_timeline, new_events
+from services.history import event_history
+from services.store import shipment_store, content_hash, reusable_parse
+from services.validation import (
+    NOT_FOUND_STATUS, NEGATIVE_TTL, validation_error, invalid_result, negative_key, looks_not_found, is_not_found,
+)
+
+
+async def _lookup(key: str, tracking_number: str, carrier_type: str, carrier: str, parse):
+    # 1. Scrape/API
+    raw_text = await master_scraper(tracking_number, carrier_type, carrier)
+    not_found = looks_not_found(raw_text)
+    # Metric labels and event sources use the driver name: the carrier string is free user input
+    driver = resolve(tracking_number, carrier_type, carrier).name
+    # Events come from the full page (or API JSON), before reduction drops anything
+    timeline = build_timeline(raw_text, driver)
+    # 2. Reduce page dumps to tracking-relevant lines + canonical events (API JSON passes through)
+    with span("reduce", driver):
+        raw_text = reduce_raw_text(raw_text)
+    # 3. AI Parse, unless the page is identical to the last one we parsed for this shipment
+    previous = await shipment_store.get(key)
+    reused = reusable_parse(previous, content_hash(raw_text))
+    with span("parse", driver) as stage:
+        if not_found:
+            # The carrier's "no such shipment" page needs no LLM to read
+            ai_result = {
+                "status": NOT_FOUND_STATUS, "latest_date": "N/A",
+                "summary": "The carrier has no record of this number.", "parsed_by": "rules",
+            }
+        elif reused:
+            ai_result = {
+                "status": previous["status"], "latest_date": previous["live_eta"],
+                "summary": previous["smart_summary"], "parsed_by": "unchanged",
+            }
+        else:
+            ai_result = await parse(raw_text, carrier)
+        stage.outcome = ai_result.get("parsed_by") or "none"
+
+    result = {
+        "tracking_number": tracking_number,
+        "carrier": carrier,
+        "status": ai_result.get("status"),
+        "live_eta": ai_result.get("latest_date"),
+        "smart_summary": ai_result.get("summary"),
+        "parsed_by": ai_result.get("parsed_by"),  # "rules" (local fast path), "llm", or "unchanged" (stored parse reused)
+        "raw_data_snippet": raw_text[:200],
+        "timeline": [event.to_dict() for event in timeline],
+    }
+    # 4. Persist and diff against the last good state; events not seen before go to the history store
+    result["changes"] = await shipment_store.record(
+        key, tracking_number, carrier, carrier_type, result, raw_text, parsed=not reused, timeline=result["timeline"],
+    )
+    if timeline and not reused:
+        previous_timeline = json.loads(previous["timeline"]) if previous and previous.get("timeline") else []
+        event_history.append(tracking_number, carrier_type, carrier, new_events(timeline, previous_timeline))
+    return result
+
+
+async def track_shipment(tracking_number: str, carrier_type: str = "air", carrier: str = "", force_refresh: bool = False, parse=None):
+    """
+    Full lookup for one shipment: Validate -> Cache -> Scrape/API -> AI Parse -> API response dict.
+    Shared by /track/single and /track/batch. `parse` replaces parse_tracking_data (batch runs pass an LLMBatcher).
+    """
+    # Impossible numbers (bad check digit, wrong shape) never reach the network
+    problem = validation_error(tracking_number, carrier_type, carrier)
+    if problem:
+        return {**invalid_result(tracking_number, carrier, problem), "cached": False, "changes": []}
+    # Recently "not found" under any carrier name: answer from the negative cache
+    missing_key = negative_key(tracking_number, carrier_type)
+    if force_refresh:
+        # A forced refresh asks Cargoes Flow again even if it recently had nothing
+        await forget_miss(tracking_number, carrier_type)
+    else:
+        missing = await tracking_cache.get(missing_key)
+        if missing:
+            return {**missing, "tracking_number": tracking_number, "carrier": carrier, "cached": True, "changes": []}
+
+    parse = parse or parse_tracking_data
+    key = cache_key(tracking_number, carrier, carrier_type)
+    result, hit = await tracking_cache.get_or_fetch(
+        key,
+        lambda: _lookup(key, tracking_number, carrier_type, carrier, parse),
+        force_refresh=force_refresh,
+    )
+    if not hit and is_not_found(result):
+        await tracking_cache.set(missing_key, result, NEGATIVE_TTL)
+    # Copy: callers annotate the result and must not mutate the cached entry
+    # A cached answer carries no news; changes are reported once, by the lookup that saw them
+    return {**result, "tracking_number": tracking_number, "cached": hit, "changes": [] if hit else result.get("changes", [])}
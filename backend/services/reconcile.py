@@ -0,0 +1,232 @@
+import io
+import os
+import json
+import logging
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+from services.fast_parser import ETA_FORMATS
+from services.manifest import manifest_store
+from services.store import shipment_store
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# xlsxwriter streams rows to disk (constant_memory); openpyxl builds every cell object first
+try:
+    import xlsxwriter
+except ImportError:
+    xlsxwriter = None
+
+# ============================================================
+# RECONCILIATION: customer (system) ETA vs tracked (live) ETA for a whole manifest
+# ============================================================
+# Column operations over the manifest, never a Python loop per shipment.
+# Drift within this many days either way counts as on time
+ON_TIME_DAYS = int(os.getenv("RECONCILE_ON_TIME_DAYS", "1"))
+# Drift at least this large (either way) lands on the exceptions list
+EXCEPTION_DAYS = int(os.getenv("RECONCILE_EXCEPTION_DAYS", "3"))
+# Rows per XLSX sheet; spreadsheets are written cell by cell, CSV/Parquet always hold every row
+XLSX_MAX_ROWS = int(os.getenv("RECONCILE_XLSX_MAX_ROWS", "20000"))
+
+ITEM_COLUMNS = ["position", "tracking_number", "carrier", "type", "system_eta", "destination", "row_count", "error"]
+STATE_COLUMNS = ["key", "status", "live_eta", "smart_summary", "checked_at"]
+# Flags that are exceptions whatever the drift
+EXCEPTION_FLAGS = ("invalid", "not_found", "no_live_eta")
+REPORT_COLUMNS = [
+    "tracking_number", "carrier", "type", "destination", "row_count", "status", "system_eta", "live_eta",
+    "system_eta_date", "live_eta_date", "drift_days", "flag", "late", "early", "exception", "smart_summary",
+]
+EXPORT_FORMATS = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def parse_dates(values: pd.Series):
+    """
+    Vectorized fast_parser.parse_eta. Each distinct string is parsed once (manifests repeat a
+    handful of dates thousands of times), one ETA format at a time; anything else is NaT.
+    """
+    codes, uniques = pd.factorize(values.fillna("").astype(str).str.strip())
+    text = pd.Series(uniques, dtype=object)
+    # ISO first, ignoring any time part ("2026-02-01T10:00:00Z")
+    parsed = pd.to_datetime(text.str[:10], format="%Y-%m-%d", errors="coerce")
+    short = text.str[:11].str.strip()
+    for fmt in ETA_FORMATS:
+        missing = parsed.isna()
+        if not missing.any():
+            break
+        parsed[missing] = pd.to_datetime(short[missing], format=fmt, errors="coerce")
+    dates = parsed.to_numpy(dtype="datetime64[ns]")
+    return pd.Series(dates[codes] if len(dates) else dates[:0], index=values.index)
+
+
+def cache_keys(frame: pd.DataFrame):
+    """services.cache.cache_key for every row at once."""
+    number = frame["tracking_number"].astype(str).str.replace(" ", "", regex=False).str.replace("-", "", regex=False)
+    carrier = frame["carrier"].fillna("").astype(str).str.strip().str.lower()
+    return frame["type"] + "|" + carrier + "|" + number.str.strip().str.upper()
+
+
+def reconcile(frame: pd.DataFrame):
+    """
+    Adds system/live ETA dates, drift_days (live - system, positive = late) and a flag per row:
+    invalid, pending (not tracked yet), not_found, no_live_eta, no_system_eta, late, early, on_time.
+    """
+    system = parse_dates(frame["system_eta"])
+    live = parse_dates(frame["live_eta"])
+    drift = (live - system).dt.days
+    status = frame["status"].fillna("").astype(str).str.lower()
+
+    conditions = [
+        frame["error"].fillna("").astype(bool),
+        frame["checked_at"].isna() & frame["status"].isna(),
+        status.str.contains("not found", regex=False),
+        live.isna(),
+        system.isna(),
+        drift > ON_TIME_DAYS,
+        drift < -ON_TIME_DAYS,
+    ]
+    flags = ["invalid", "pending", "not_found", "no_live_eta", "no_system_eta", "late", "early"]
+    flag = np.select(conditions, flags, default="on_time")
+
+    report = frame.assign(
+        system_eta_date=system,
+        live_eta_date=live,
+        drift_days=drift,
+        flag=flag,
+        late=flag == "late",
+        early=flag == "early",
+        exception=np.isin(flag, EXCEPTION_FLAGS) | (drift.abs() >= EXCEPTION_DAYS).to_numpy(),
+    )
+    return report[REPORT_COLUMNS]
+
+
+def group_stats(report: pd.DataFrame, by: str):
+    """Delay statistics per carrier / destination, worst (most late shipments) first."""
+    frame = report.assign(
+        **{by: report[by].fillna("").replace("", "Unknown")},
+        compared=report["drift_days"].notna(),
+        on_time=report["flag"] == "on_time",
+    )
+    groups = frame.groupby(by, sort=False)
+    stats = groups.agg(
+        shipments=("tracking_number", "size"),
+        compared=("compared", "sum"),
+        late=("late", "sum"),
+        early=("early", "sum"),
+        on_time=("on_time", "sum"),
+        exceptions=("exception", "sum"),
+        mean_drift_days=("drift_days", "mean"),
+        median_drift_days=("drift_days", "median"),
+        max_drift_days=("drift_days", "max"),
+    )
+    stats["p90_drift_days"] = groups["drift_days"].quantile(0.9)
+    stats["late_pct"] = stats["late"] / stats["compared"].where(stats["compared"] > 0) * 100
+    return stats.round(2).sort_values(["late", "shipments"], ascending=False).reset_index()
+
+
+def summarize(report: pd.DataFrame):
+    drift = report["drift_days"]
+    return {
+        "shipments": int(len(report)),
+        "compared": int(drift.notna().sum()),
+        "exceptions": int(report["exception"].sum()),
+        "flags": {flag: int(count) for flag, count in report["flag"].value_counts().items()},
+        "mean_drift_days": None if drift.isna().all() else round(float(drift.mean()), 2),
+        "median_drift_days": None if drift.isna().all() else round(float(drift.median()), 2),
+        "on_time_days": ON_TIME_DAYS,
+        "exception_days": EXCEPTION_DAYS,
+    }
+
+
+def build_report(frame: pd.DataFrame):
+    report = reconcile(frame)
+    exceptions = report[report["exception"]].sort_values("drift_days", ascending=False, key=lambda d: d.abs())
+    return {
+        "summary": summarize(report),
+        "shipments": report,
+        "exceptions": exceptions,
+        "by_carrier": group_stats(report, "carrier"),
+        "by_destination": group_stats(report, "destination"),
+    }
+
+
+def records(frame: pd.DataFrame, limit: int = None):
+    """JSON-safe rows (NaN/NaT -> null, dates as ISO strings)."""
+    if limit is not None:
+        frame = frame.head(limit)
+    return json.loads(frame.to_json(orient="records", date_format="iso"))
+
+
+def export_report(report, fmt: str):
+    """
+    xlsx: one sheet each for summary, shipments, exceptions, by carrier and by destination
+    (shipments/exceptions capped at XLSX_MAX_ROWS, worst drift first for exceptions).
+    csv / parquet: the per-shipment table (flags and drift included).
+    """
+    buffer = io.BytesIO()
+    if fmt == "csv":
+        report["shipments"].to_csv(buffer, index=False)
+    elif fmt == "parquet":
+        # Needs pyarrow (or fastparquet)
+        report["shipments"].to_parquet(buffer, index=False)
+    elif fmt == "xlsx":
+        summary = report["summary"]
+        metrics = [(k, v) for k, v in summary.items() if k != "flags"] + list(summary["flags"].items())
+        if len(report["shipments"]) > XLSX_MAX_ROWS:
+            metrics.append(("sheet_rows_capped_at", XLSX_MAX_ROWS))
+        sheets = {
+            "Summary": pd.DataFrame(metrics, columns=["metric", "value"]),
+            "Shipments": report["shipments"].head(XLSX_MAX_ROWS),
+            "Exceptions": report["exceptions"].head(XLSX_MAX_ROWS),
+            "By carrier": report["by_carrier"],
+            "By destination": report["by_destination"],
+        }
+        if xlsxwriter is not None:
+            _write_xlsx_streaming(buffer, sheets)
+        else:
+            with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
+                for name, frame in sheets.items():
+                    frame.to_excel(writer, sheet_name=name, index=False)
+    else:
+        raise ValueError(f"Unsupported export format: {fmt} (use {', '.join(EXPORT_FORMATS)})")
+    return buffer.getvalue()
+
+
+def _write_xlsx_streaming(buffer, sheets):
+    """
+    Row-by-row xlsxwriter output in constant_memory mode (pandas' to_excel writes column by
+    column, which that mode can't take). About twice as fast as openpyxl, in flat memory.
+    """
+    workbook = xlsxwriter.Workbook(buffer, {
+        "constant_memory": True, "default_date_format": "yyyy-mm-dd",
+        # Carrier text is data: no per-cell formula/URL sniffing (faster, and no formula injection)
+        "strings_to_formulas": False, "strings_to_urls": False,
+    })
+    try:
+        bold = workbook.add_format({"bold": True})
+        for name, frame in sheets.items():
+            sheet = workbook.add_worksheet(name)
+            sheet.write_row(0, 0, [str(column) for column in frame.columns], bold)
+            # Plain Python values; NaN/NaT become empty cells
+            rows = frame.astype(object).where(frame.notna(), None).values.tolist()
+            for index, row in enumerate(rows, start=1):
+                sheet.write_row(index, 0, row)
+    finally:
+        workbook.close()
+
+
+async def load_manifest_frame(manifest_id: str):
+    """A manifest's unique shipments joined with their latest tracked state from the shipment store."""
+    if await manifest_store.get(manifest_id) is None:
+        return None
+    items = pd.DataFrame.from_records(await manifest_store.items(manifest_id, 0, -1), columns=ITEM_COLUMNS)
+    items["key"] = cache_keys(items)
+    states = pd.DataFrame.from_records(
+        await shipment_store.states(items["key"].unique().tolist()), columns=STATE_COLUMNS,
+    )
+    return items.merge(states, on="key", how="left")
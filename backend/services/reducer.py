@@ -0,0 +1,229 @@
+import re
+
+# Shared pre-LLM reduction stage: turns a whole-page inner_text dump (menus, footers,
+# cookie text) into the lines that carry tracking data plus a canonical event list.
+
+MONTHS = r"(?:jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*"
+DATE_RE = re.compile(
+    r"\b(?:\d{4}[-/.]\d{1,2}[-/.]\d{1,2}"             # 2026-01-26
+    r"|\d{1,2}[-/.]\d{1,2}[-/.]\d{2,4}"                # 26/01/2026
+    r"|\d{1,2}[\s-]?" + MONTHS + r"[\s-]?\d{2,4}(?![:\d])"  # 26-Jan-2026, 26JAN26
+    r"|\d{1,2}\s?" + MONTHS + r"\b"                     # 26 Jan
+    r"|" + MONTHS + r"\s\d{1,2},?\s\d{4})\b",           # Jan 26, 2026
+    re.IGNORECASE,
+)
+TIME_RE = re.compile(r"\b(?:[01]?\d|2[0-3]):[0-5]\d(?::[0-5]\d)?\b")
+# "PORT KLANG, MY" style place names, then IATA airport (BOM) or UN/LOCODE (BEANR) tokens
+PLACE_RE = re.compile(r"\b[A-Z][A-Za-z.'\- ]{1,40}, [A-Z]{2}\b")
+LOCATION_RE = re.compile(r"\b[A-Z]{3}\b|\b[A-Z]{2}[A-Z2-9]{3}\b")
+FLIGHT_RE = re.compile(r"\b(?:[A-Z]{2}|[A-Z]\d|\d[A-Z])\s?\d{2,4}[A-Z]?\b")
+VESSEL_RE = re.compile(r"\b(?:vessel|voyage|v\.|m/v|mv)\s*[:\-]?\s*([A-Z0-9][\w .\-/]{2,40})", re.IGNORECASE)
+
+# Milestone keyword -> canonical milestone (case-insensitive prefix match)
+MILESTONES = [
+    ("estimated time of arrival", "Estimated Arrival"), ("eta", "Estimated Arrival"),
+    ("delivered", "Delivered"), ("discharg", "Discharged"),
+    ("gate out", "Gate Out"), ("gate in", "Gate In"),
+    ("loaded", "Loaded"), ("load on", "Loaded"),
+    ("departed", "Departed"), ("departure", "Departed"),
+    ("arrived", "Arrived"), ("arrival", "Arrived"),
+    ("received", "Received"), ("accepted", "Received"),
+    ("notified", "Notified"), ("manifested", "Manifested"), ("booked", "Booked"),
+    ("transshipment", "Transshipment"), ("transhipment", "Transshipment"),
+    ("customs", "Customs"), ("released", "Released"),
+    ("in transit", "In Transit"), ("empty return", "Empty Return"),
+]
+# Cargo-IMP status codes, upper-case whole words only ("DEP", not "department")
+STATUS_CODES = {
+    "BKD": "Booked", "RCS": "Received", "MAN": "Manifested", "DEP": "Departed",
+    "ARR": "Arrived", "RCF": "Received", "NFD": "Notified", "DLV": "Delivered",
+    "TFD": "Transferred", "FOH": "Received", "AWD": "Documents Delivered",
+}
+MILESTONE_RE = re.compile(
+    r"(?i:\b(" + "|".join(re.escape(k) for k, _ in MILESTONES) + r"))"
+    r"|\b(" + "|".join(STATUS_CODES) + r")\b"
+)
+MILESTONE_MAP = {**dict(MILESTONES), **{code.lower(): name for code, name in STATUS_CODES.items()}}
+# Upper-case tokens that look like location codes but aren't
+NOT_LOCATIONS = set(STATUS_CODES) | {
+    "AWB", "ETA", "ETD", "ATA", "ATD", "POL", "POD", "UTC", "GMT", "KGS", "PCS", "CBM",
+    "THE", "AND", "FOR", "YES", "NOT", "USD", "EUR", "MSC", "CMA", "CGM", "TEU", "FCL", "LCL",
+}
+
+# "Label: value" facts worth keeping even without a date
+FACT_LABELS = re.compile(
+    r"^\s*(origin|destination|from|to|pol|pod|port of loading|port of discharge|eta|etd|ata|atd|"
+    r"pieces|total pieces|weight|volume|status|awb|container|bill of lading|b/l|commodity|"
+    r"final pod|shipped from|shipped to|transit time|estimated|route)\b(\s*[:|])?",
+    re.IGNORECASE,
+)
+# Table header cell -> event field, for tab-separated result tables
+HEADER_ROLES = [
+    ("vessel", "vessel"), ("voyage", "vessel"), ("flight", "flight"),
+    ("date", "date"), ("time", "date"),
+    ("location", "location"), ("station", "location"), ("airport", "location"),
+    ("port", "location"), ("place", "location"), ("from", "location"),
+    ("description", "milestone"), ("status", "milestone"), ("event", "milestone"),
+    ("activity", "milestone"), ("movement", "milestone"),
+]
+BOILERPLATE_RE = re.compile(
+    r"cookie|privacy|consent|subscribe|newsletter|sign in|log ?in|register|©|copyright|"
+    r"all rights reserved|terms (?:of|and)|follow us|download (?:the|our) app|javascript",
+    re.IGNORECASE,
+)
+MAX_LINE_CHARS = 300
+
+
+def _locations(line: str):
+    places = [m.group(0).strip() for m in PLACE_RE.finditer(line)]
+    codes = [m.group(0) for m in LOCATION_RE.finditer(line) if m.group(0) not in NOT_LOCATIONS]
+    return places + codes
+
+
+def _is_fact(line: str):
+    label = FACT_LABELS.search(line)
+    if not label:
+        return False
+    # "Origin: BOM" / "Weight | 845" / "Route FRA - JFK", but not a bare menu item like "Container Tracking"
+    return bool(label.group(2)) or any(ch.isdigit() for ch in line) or bool(_locations(line[label.end():]))
+
+
+def _classify(line: str):
+    """Returns (keep, milestone_match)."""
+    has_date = bool(DATE_RE.search(line))
+    milestone = MILESTONE_RE.search(line)
+    if BOILERPLATE_RE.search(line) and not has_date:
+        return False, None
+    if _is_fact(line):
+        return True, None
+    has_location = bool(_locations(line))
+    if milestone and (has_date or has_location or TIME_RE.search(line)):
+        return True, milestone
+    if has_date and (has_location or FLIGHT_RE.search(line) or TIME_RE.search(line)):
+        return True, milestone
+    if milestone and len(line) <= 60:
+        # Short status cells ("Delivered", "Discharged at BEANR")
+        return True, milestone
+    return False, None
+
+
+def _header_roles(cells):
+    """Maps column index -> event field if the row looks like a table header, else None."""
+    if len(cells) < 3 or any(DATE_RE.search(c) or any(ch.isdigit() for ch in c) for c in cells):
+        return None
+    roles = {}
+    for index, cell in enumerate(cells):
+        lower = cell.lower()
+        for keyword, role in HEADER_ROLES:
+            if keyword in lower:
+                roles.setdefault(index, role)
+                break
+    return roles if len(roles) >= 2 else None
+
+
+def _milestone_name(match):
+    keyword = match.group(0) if match else ""
+    return MILESTONE_MAP.get(keyword.lower(), keyword)
+
+
+def _event(line: str, milestone, cells=None, roles=None):
+    date = DATE_RE.search(line)
+    time = TIME_RE.search(line)
+    flight = FLIGHT_RE.search(line)
+    vessel = VESSEL_RE.search(line)
+    locations = _locations(line)
+    event = {
+        "milestone": _milestone_name(milestone),
+        "date": date.group(0) if date else "",
+        "time": time.group(0) if time else "",
+        "location": locations[0] if locations else "",
+        "flight": flight.group(0) if flight and not vessel else "",
+        "vessel": vessel.group(1).strip() if vessel else "",
+    }
+    # A known table header beats the regex guesses for the columns it names
+    if roles and cells:
+        location_columns = [i for i, r in roles.items() if r == "location"]
+        for index, role in roles.items():
+            if index >= len(cells) or not cells[index]:
+                continue
+            value = cells[index]
+            if role == "milestone":
+                event["milestone"] = _milestone_name(MILESTONE_RE.search(value)) or value[:40]
+            elif role == "location" and index == location_columns[0]:
+                event["location"] = value
+            elif role in ("vessel", "flight"):
+                event[role] = value
+    return event
+
+
+def extract_events(raw_text: str):
+    """Returns (kept_lines, events, event_lines) from a page dump."""
+    kept, events, event_lines, seen = [], [], set(), set()
+    roles = None
+    for raw_line in raw_text.splitlines():
+        # Table cells arrive tab-separated from inner_text; keep them readable on one line
+        cells = [part.strip() for part in raw_line.split("\t") if part.strip()]
+        line = re.sub(r"\s{2,}", " ", " | ".join(cells)).strip()[:MAX_LINE_CHARS]
+        if len(line) < 2 or line in seen:
+            continue
+
+        header = _header_roles(cells)
+        if header:
+            roles = header
+            continue
+        if len(cells) < 2:
+            roles = None if not DATE_RE.search(line) else roles
+
+        keep, milestone = _classify(line)
+        if not keep:
+            continue
+        seen.add(line)
+        kept.append(line)
+        if milestone or DATE_RE.search(line):
+            event = _event(line, milestone, cells, roles if len(cells) >= 2 else None)
+            if event["milestone"] or event["location"]:
+                events.append(event)
+                event_lines.add(line)
+    return kept, events, event_lines
+
+
+def format_events(events):
+    rows = []
+    for e in events:
+        where = e["location"] or "-"
+        what = e["milestone"] or "Event"
+        via = e["flight"] or e["vessel"]
+        rows.append(" | ".join(x for x in [f"{e['date']} {e['time']}".strip() or "-", where, what, via] if x))
+    return rows
+
+
+def reduce_raw_text(raw_text: str, min_ratio: float = 0.9):
+    """
+    Compact representation of a scraped page for the parser:
+    FACTS (label/value lines) + EVENTS (canonical date | location | milestone | flight/vessel).
+    Structured API payloads and short texts are returned untouched, as is anything the
+    reducer can't find tracking data in.
+    """
+    if not raw_text or raw_text.startswith(("Source: ", "Error", "FACTS:", "EVENTS (")):
+        return raw_text
+
+    kept, events, event_lines = extract_events(raw_text)
+    if not kept:
+        return raw_text
+
+    facts = [line for line in kept if FACT_LABELS.search(line)]
+    # Lines already captured as a canonical event aren't repeated
+    detail = [line for line in kept if line not in facts and line not in event_lines]
+    sections = []
+    if facts:
+        sections.append("FACTS:\n" + "\n".join(facts))
+    if events:
+        sections.append("EVENTS (date | location | milestone | flight/vessel):\n" + "\n".join(format_events(events)))
+    if detail:
+        sections.append("LINES:\n" + "\n".join(detail))
+    reduced = "\n\n".join(sections)
+
+    # Not worth it if we barely shrank the page
+    if len(reduced) > len(raw_text) * min_ratio:
+        return raw_text
+    return reduced
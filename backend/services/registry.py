@@ -0,0 +1,136 @@
+import re
+import importlib
+from dataclasses import dataclass, field
+
+# ============================================================
+# DRIVER REGISTRY
+# ============================================================
+# Drivers are declared in services/air/__init__.py and services/sea/__init__.py by module
+# path, so routing needs no Playwright import and a driver module loads on first use.
+
+
+@dataclass(frozen=True)
+class DriverSpec:
+    name: str
+    module: str                 # "services.air.air_india"
+    func: str                   # "drive_air_india"
+    type: str                   # "air" | "sea"
+    prefixes: tuple = ()        # IATA airline prefixes ("098",)
+    aliases: tuple = ()         # Carrier names / SCAC codes, lower-case ("msc", "mscu")
+    capabilities: frozenset = field(default_factory=frozenset)  # "captcha", "iframe", "popup", "full_number", "stub"
+    max_concurrency: int = 2    # Parallel scrapes against this carrier
+    fallback: bool = False      # Used when nothing else matches this type
+
+
+_by_prefix = {}    # (type, prefix) -> spec
+_by_alias = {}     # (type, alias) -> spec
+_by_name = {}
+_fallbacks = {}    # type -> spec
+_loaded = {}       # name -> driver callable
+_declared = False
+
+
+def register(spec: DriverSpec):
+    if spec.name in _by_name:
+        raise ValueError(f"Driver '{spec.name}' is already registered.")
+    _by_name[spec.name] = spec
+    for prefix in spec.prefixes:
+        _by_prefix[(spec.type, prefix)] = spec
+    for alias in spec.aliases:
+        _by_alias[(spec.type, alias.lower())] = spec
+    if spec.fallback:
+        _fallbacks[spec.type] = spec
+    return spec
+
+
+def _ensure_declared():
+    # Importing the packages runs their register() calls (driver modules stay unloaded)
+    global _declared
+    if not _declared:
+        importlib.import_module("services.air")
+        importlib.import_module("services.sea")
+        _declared = True
+
+
+def _alias_candidates(carrier_name: str):
+    """'Hapag-Lloyd AG' -> 'hapag-lloyd ag', 'hapag', 'lloyd', 'ag', 'hapag lloyd', 'lloyd ag'."""
+    lower = str(carrier_name or "").strip().lower()
+    if not lower:
+        return []
+    tokens = [t for t in re.split(r"[^a-z0-9]+", lower) if t]
+    pairs = [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    return [lower] + tokens + pairs
+
+
+def resolve(tracking_number: str, carrier_type: str = "air", carrier_name: str = ""):
+    """
+    Picks the driver for a shipment: IATA prefix (air), then carrier alias, then the container's
+    owner code (sea, e.g. MSCU), then the type's fallback.
+    """
+    _ensure_declared()
+    carrier_type = "sea" if carrier_type == "sea" else "air"
+    clean = tracking_number.replace(" ", "").replace("-", "")
+
+    if carrier_type == "air":
+        spec = _by_prefix.get(("air", clean[:3]))
+        if spec:
+            return spec
+
+    spec = by_carrier_name(carrier_name, carrier_type)
+    if spec:
+        return spec
+
+    if carrier_type == "sea":
+        spec = by_owner_code(clean)
+        if spec:
+            return spec
+
+    return _fallbacks[carrier_type]
+
+
+def by_carrier_name(carrier_name: str, carrier_type: str = "air"):
+    """Driver whose alias matches the carrier name, or None."""
+    _ensure_declared()
+    carrier_type = "sea" if carrier_type == "sea" else "air"
+    for candidate in _alias_candidates(carrier_name):
+        spec = _by_alias.get((carrier_type, candidate))
+        if spec:
+            return spec
+    return None
+
+
+def by_owner_code(container_number: str):
+    """Sea driver whose SCAC alias is the container's ISO 6346 owner code (first four letters), or None."""
+    _ensure_declared()
+    return _by_alias.get(("sea", container_number[:4].lower()))
+
+
+def fallback_for(carrier_type: str = "air"):
+    _ensure_declared()
+    return _fallbacks["sea" if carrier_type == "sea" else "air"]
+
+
+def get_spec(name: str):
+    _ensure_declared()
+    return _by_name.get(name)
+
+
+def all_drivers():
+    _ensure_declared()
+    return list(_by_name.values())
+
+
+def load_driver(spec: DriverSpec):
+    """Imports the driver module on first use and returns its coroutine function."""
+    driver = _loaded.get(spec.name)
+    if driver is None:
+        driver = getattr(importlib.import_module(spec.module), spec.func)
+        _loaded[spec.name] = driver
+    return driver
+
+
+def driver_argument(spec: DriverSpec, tracking_number: str):
+    """Most drivers take the cleaned number; some want it exactly as the user typed it."""
+    if "full_number" in spec.capabilities:
+        return tracking_number
+    return tracking_number.replace(" ", "").replace("-", "")
@@ -0,0 +1,179 @@
+import os
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# ============================================================
+# RATE LIMITS + CIRCUIT BREAKERS (per carrier driver, Cargoes Flow, OpenAI)
+# ============================================================
+# Rate as "<requests per minute>/<burst>". Override one target with RATE_LIMIT_<NAME>, e.g. RATE_LIMIT_MSC=10/2
+DEFAULT_RATE = os.getenv("RATE_LIMIT_DEFAULT", "20/5")
+RATE_DEFAULTS = {"cargoes_flow": "120/20", "openai": "500/50"}
+# Consecutive failures that open a breaker, and how long it stays open before one probe is let through
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("BREAKER_RESET_SECONDS", "60"))
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling a target whose breaker is open."""
+
+    def __init__(self, name):
+        super().__init__(f"Circuit open for {name}")
+        self.name = name
+
+
+class TokenBucket:
+    """Refills `rate` tokens per second up to `burst`; acquire() waits for a token."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.waited = 0.0
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        while True:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            delay = (1 - self.tokens) / self.rate
+            self.waited += delay
+            await asyncio.sleep(delay)
+
+
+class CircuitBreaker:
+    """
+    closed: calls pass, consecutive failures are counted.
+    open: calls fail fast until BREAKER_RESET_SECONDS have passed.
+    half_open: one probe call; success closes the breaker, failure opens it again.
+    """
+
+    def __init__(self, name, threshold=BREAKER_FAILURES, reset_after=BREAKER_RESET_SECONDS):
+        self.name = name
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.stats = {"trips": 0, "rejected": 0}
+
+    def allow(self):
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_after:
+            self.state = "half_open"
+        if self.state == "closed":
+            return True
+        if self.state == "half_open" and not self.probing:
+            self.probing = True
+            return True
+        self.stats["rejected"] += 1
+        return False
+
+    def success(self):
+        if self.state != "closed":
+            logger.info("🟢 %s recovered; circuit closed.", self.name)
+        self.state = "closed"
+        self.failures = 0
+        self.probing = False
+
+    def failure(self):
+        self.failures += 1
+        self.probing = False
+        if self.state == "half_open" or self.failures >= self.threshold:
+            if self.state != "open":
+                self.stats["trips"] += 1
+                logger.warning("⛔ %s failed %s time(s); circuit open for %.0fs.", self.name, self.failures, self.reset_after)
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def release(self):
+        # A probe that ended without a verdict (cancelled) lets the next call probe instead
+        self.probing = False
+
+
+class Outcome:
+    """Handed out by Guard.protect(); set `failed = True` for soft failures that don't raise."""
+
+    __slots__ = ("failed",)
+
+    def __init__(self):
+        self.failed = False
+
+
+def _parse_rate(spec: str):
+    rate, _, burst = spec.partition("/")
+    return float(rate) / 60, int(burst or 1)
+
+
+class Guard:
+    """Token bucket + circuit breaker for one target."""
+
+    def __init__(self, name: str):
+        self.name = name
+        spec = os.getenv(f"RATE_LIMIT_{name.upper()}", RATE_DEFAULTS.get(name, DEFAULT_RATE))
+        self.bucket = TokenBucket(*_parse_rate(spec))
+        self.breaker = CircuitBreaker(name)
+
+    def available(self):
+        """Would a call be let through now? (Doesn't claim the half-open probe.)"""
+        breaker = self.breaker
+        return breaker.state == "closed" or (
+            not breaker.probing and time.monotonic() - breaker.opened_at >= breaker.reset_after
+        )
+
+    @asynccontextmanager
+    async def protect(self):
+        """
+        Raises CircuitOpen without running the block if the breaker is open.
+        An exception or `outcome.failed = True` counts as a failure, anything else as a success.
+        """
+        if not self.breaker.allow():
+            raise CircuitOpen(self.name)
+        outcome = Outcome()
+        try:
+            await self.bucket.acquire()
+            yield outcome
+        except asyncio.CancelledError:
+            self.breaker.release()
+            raise
+        except Exception:
+            self.breaker.failure()
+            raise
+        if outcome.failed:
+            self.breaker.failure()
+        else:
+            self.breaker.success()
+
+    def snapshot(self):
+        return {
+            "state": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            **self.breaker.stats,
+            "rate_limited_s": round(self.bucket.waited, 1),
+        }
+
+
+_guards = {}
+
+
+def guard(name: str):
+    if name not in _guards:
+        _guards[name] = Guard(name)
+    return _guards[name]
+
+
+def resilience_report():
+    return {name: g.snapshot() for name, g in _guards.items()}
@@ -0,0 +1,184 @@
+import logging
+import os
+import re
+import time
+import random
+import sqlite3
+import asyncio
+import threading
+from dotenv import load_dotenv
+from services.utils import DATA_DIR
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# ============================================================
+# RESOURCE BLOCKING: only download what a driver needs to read the results
+# ============================================================
+RESOURCE_BLOCKING = os.getenv("RESOURCE_BLOCKING", "true").lower() in ("1", "true", "yes")
+# Share of scrapes run unblocked anyway, so one process measures both modes (0 = never)
+RESOURCE_FULL_SAMPLE_RATE = float(os.getenv("RESOURCE_FULL_SAMPLE_RATE", "0.05"))
+# Totals survive restarts and are shared by the API and worker processes
+RESOURCE_STATS_PATH = os.getenv("RESOURCE_STATS_PATH", os.path.join(DATA_DIR, "resource_stats.sqlite3"))
+BLOCKED_TYPES = {t.strip() for t in os.getenv("BLOCKED_RESOURCE_TYPES", "image,media,font").split(",") if t.strip()}
+
+# Analytics, ad and session-recording hosts carrier homepages pull in
+BLOCKED_DOMAINS = re.compile(
+    r"google-analytics\.com|googletagmanager\.com|doubleclick\.net|googlesyndication\.com|"
+    r"adservice\.google\.|facebook\.net|connect\.facebook|hotjar\.com|clarity\.ms|"
+    r"linkedin\.com/px|licdn\.com|bat\.bing\.com|yandex\.ru/metrika|mc\.yandex|"
+    r"newrelic\.com|nr-data\.net|segment\.(io|com)|mixpanel\.com|tiktok\.com|"
+    r"criteo\.|taboola\.com|outbrain\.com|adnxs\.com|quantserve\.com|scorecardresearch\.com"
+)
+
+# Per-driver URL patterns that always load, even if their type is blocked
+DRIVER_ALLOWLIST = {
+    # The captcha image is screenshotted and sent to the solver
+    "china_airlines": [r"china-airlines\.com"],
+}
+
+# Lighter context: no service workers (they bypass routing and cache extra assets)
+LIGHT_CONTEXT_OPTIONS = {"service_workers": "block", "reduced_motion": "reduce"}
+
+STAT_FIELDS = ("runs", "bytes", "requests", "blocked", "load_ms", "driver_ms")
+_db = None
+_db_lock = threading.Lock()
+
+
+def choose_mode():
+    """"blocked" or "full" for the next scrape context."""
+    if not RESOURCE_BLOCKING:
+        return "full"
+    return "full" if random.random() < RESOURCE_FULL_SAMPLE_RATE else "blocked"
+
+
+def context_options(mode: str = "blocked"):
+    return dict(LIGHT_CONTEXT_OPTIONS) if mode == "blocked" else {}
+
+
+def _conn():
+    global _db
+    if _db is None:
+        os.makedirs(os.path.dirname(RESOURCE_STATS_PATH), exist_ok=True)
+        _db = sqlite3.connect(RESOURCE_STATS_PATH, check_same_thread=False)
+        _db.execute("PRAGMA journal_mode=WAL")
+        _db.execute(
+            "CREATE TABLE IF NOT EXISTS resource_stats (driver TEXT, mode TEXT, runs INTEGER, bytes INTEGER, "
+            "requests INTEGER, blocked INTEGER, load_ms REAL, driver_ms REAL, PRIMARY KEY (driver, mode))"
+        )
+    return _db
+
+
+def _add_run(driver, mode, values):
+    # Increments in SQL, so concurrent worker processes don't overwrite each other's totals
+    with _db_lock:
+        db = _conn()
+        db.execute(
+            f"INSERT INTO resource_stats (driver, mode, {', '.join(STAT_FIELDS)}) VALUES (?, ?, {', '.join('?' * len(STAT_FIELDS))}) "
+            f"ON CONFLICT (driver, mode) DO UPDATE SET {', '.join(f'{f} = {f} + excluded.{f}' for f in STAT_FIELDS)}",
+            (driver, mode, *values),
+        )
+        db.commit()
+
+
+def _load_stats():
+    with _db_lock:
+        rows = _conn().execute(f"SELECT driver, mode, {', '.join(STAT_FIELDS)} FROM resource_stats").fetchall()
+    stats = {}
+    for driver, mode, *values in rows:
+        stats.setdefault(driver, {})[mode] = dict(zip(STAT_FIELDS, values))
+    return stats
+
+
+class ResourceMonitor:
+    """Applies the routing policy to a context and measures bytes and load time per driver run."""
+
+    def __init__(self, context, driver: str, mode: str = "blocked"):
+        self.context = context
+        self.driver = driver
+        self.mode = mode
+        allow = DRIVER_ALLOWLIST.get(driver, [])
+        self.allow = re.compile("|".join(allow)) if allow else None
+        self.bytes = 0
+        self.requests = 0
+        self.blocked = 0
+        self.first_load_ms = None
+        self._t0 = time.perf_counter()
+        self._tasks = set()
+
+    async def start(self):
+        if self.mode == "blocked":
+            await self.context.route("**/*", self._route)
+        self.context.on("requestfinished", self._on_finished)
+        self.context.on("page", self._watch_page)
+        for page in self.context.pages:
+            self._watch_page(page)
+        return self
+
+    async def _route(self, route):
+        # fallback() hands the request to earlier handlers (fixture HAR routing), else the network
+        request = route.request
+        url = request.url
+        if self.allow and self.allow.search(url):
+            await route.fallback()
+        elif request.resource_type in BLOCKED_TYPES or BLOCKED_DOMAINS.search(url):
+            self.blocked += 1
+            await route.abort()
+        else:
+            await route.fallback()
+
+    def _watch_page(self, page):
+        page.once("load", lambda _: self._mark_load())
+
+    def _mark_load(self):
+        if self.first_load_ms is None:
+            self.first_load_ms = (time.perf_counter() - self._t0) * 1000
+
+    def _on_finished(self, request):
+        self.requests += 1
+        task = asyncio.ensure_future(self._add_size(request))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _add_size(self, request):
+        try:
+            sizes = await request.sizes()
+            self.bytes += sizes.get("responseBodySize", 0) + sizes.get("responseHeadersSize", 0)
+        except Exception:
+            pass
+
+    async def finish(self):
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+        elapsed = (time.perf_counter() - self._t0) * 1000
+        values = (1, self.bytes, self.requests, self.blocked, self.first_load_ms or 0.0, elapsed)
+        try:
+            await asyncio.to_thread(_add_run, self.driver, self.mode, values)
+        except sqlite3.Error as e:
+            logger.warning("⚠️ Resource stats not saved: %s", e)
+        logger.info("📉 %s [%s]: %.0f KB, %s requests, %s blocked", self.driver, self.mode, self.bytes / 1024, self.requests, self.blocked)
+
+
+async def resource_report():
+    """Averages per driver and mode, plus blocked-vs-full deltas where both were measured."""
+    report = {}
+    for driver, modes in (await asyncio.to_thread(_load_stats)).items():
+        entry = {}
+        for mode, s in modes.items():
+            runs = max(s["runs"], 1)
+            entry[mode] = {
+                "runs": s["runs"],
+                "avg_kb": round(s["bytes"] / runs / 1024, 1),
+                "avg_requests": round(s["requests"] / runs, 1),
+                "avg_blocked": round(s["blocked"] / runs, 1),
+                "avg_load_ms": round(s["load_ms"] / runs, 1),
+                "avg_driver_ms": round(s["driver_ms"] / runs, 1),
+            }
+        if "blocked" in entry and "full" in entry:
+            entry["delta"] = {
+                "kb_saved": round(entry["full"]["avg_kb"] - entry["blocked"]["avg_kb"], 1),
+                "load_ms_saved": round(entry["full"]["avg_load_ms"] - entry["blocked"]["avg_load_ms"], 1),
+            }
+        report[driver] = entry
+    return report
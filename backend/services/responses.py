@@ -0,0 +1,53 @@
+import json
+from starlette.responses import JSONResponse
+
+# orjson is optional: pip install orjson (several times faster than json.dumps on result lists)
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# ============================================================
+# RESPONSE SHAPING: views, field projection and a fast JSON serializer
+# ============================================================
+# view=minimal: what a results table needs
+MINIMAL_FIELDS = ("tracking_number", "carrier", "status", "live_eta")
+# view=full (default) drops these; view=debug keeps everything
+DEBUG_FIELDS = ("raw_data_snippet",)
+# Always kept so rows can be matched back (batch row positions, job ids)
+KEY_FIELDS = ("tracking_number", "row_indexes", "id")
+VIEWS = ("minimal", "full", "debug")
+
+
+def dumps(obj):
+    """JSON bytes. orjson when installed (NaN -> null, numpy and datetimes handled), else json."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with dumps() (orjson when available)."""
+
+    def render(self, content):
+        return dumps(content)
+
+
+def parse_fields(fields: str = ""):
+    """'status, live_eta' -> ("status", "live_eta"), or None when not given."""
+    names = tuple(f.strip() for f in (fields or "").split(",") if f.strip())
+    return names or None
+
+
+def project(result: dict, view: str = "full", fields=None):
+    """
+    Cuts a tracking result down to what the caller asked for. `fields` (from parse_fields)
+    wins over `view`; the key fields are always kept.
+    """
+    if fields:
+        return {k: v for k, v in result.items() if k in fields or k in KEY_FIELDS}
+    if view == "minimal":
+        return {k: v for k, v in result.items() if k in MINIMAL_FIELDS or k in KEY_FIELDS}
+    if view == "debug":
+        return result
+    return {k: v for k, v in result.items() if k not in DEBUG_FIELDS}
@@ -0,0 +1,87 @@
+import os
+import time
+import asyncio
+import logging
+from dataclasses import dataclass
+from dotenv import load_dotenv
+from services.batch import stream_batch
+from services.store import shipment_store
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# --- SCHEDULER CONFIG (override via .env) ---
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "true").lower() in ("1", "true", "yes")
+TICK_SECONDS = float(os.getenv("SCHEDULER_TICK_SECONDS", "60"))
+MAX_PER_TICK = int(os.getenv("SCHEDULER_MAX_PER_TICK", "50"))
+
+
+@dataclass
+class RefreshRow:
+    """Shaped like a TrackRequest so refreshes reuse the batch pipeline and its limits."""
+    tracking_number: str
+    carrier: str = ""
+    type: str = "air"
+    force_refresh: bool = True
+
+
+class RefreshScheduler:
+    """
+    Re-tracks watched, undelivered shipments when the store says they are due.
+    Each tick runs the due shipments as one batch (shared Tier 1 prefetch, batched LLM calls).
+    """
+
+    def __init__(self, tick=TICK_SECONDS, max_per_tick=MAX_PER_TICK):
+        self.tick = tick
+        self.max_per_tick = max_per_tick
+        self._task = None
+        self.stats = {"ticks": 0, "refreshed": 0, "changed": 0, "llm_skipped": 0, "failed": 0, "last_tick_ms": 0.0}
+
+    def start(self):
+        if SCHEDULER_ENABLED and self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error("❌ Scheduler tick failed: %s", e)
+            await asyncio.sleep(self.tick)
+
+    async def run_once(self):
+        """Refreshes everything due now. Returns the changes found this tick."""
+        due = await shipment_store.due(self.max_per_tick)
+        if not due:
+            return []
+        t0 = time.perf_counter()
+        logger.info("🔄 Scheduler: refreshing %s due shipment(s)", len(due))
+        rows = [RefreshRow(d["tracking_number"], d["carrier"] or "", d["type"] or "air") for d in due]
+        found = []
+        async for result in stream_batch(rows):
+            self.stats["refreshed"] += 1
+            if result.get("parsed_by") == "unchanged":
+                self.stats["llm_skipped"] += 1
+            if str(result.get("status", "")).lower() == "error":
+                self.stats["failed"] += 1
+            if result.get("changes"):
+                self.stats["changed"] += 1
+                found.append({"tracking_number": result["tracking_number"], "changes": result["changes"]})
+        self.stats["ticks"] += 1
+        self.stats["last_tick_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+        if found:
+            logger.info("🔔 Scheduler: %s shipment(s) changed", len(found))
+        return found
+
+    def snapshot(self):
+        return {"enabled": SCHEDULER_ENABLED, "running": self._task is not None, **self.stats}
+
+
+refresh_scheduler = RefreshScheduler()
@@ -1,88 +1,204 @@
+import logging
+import os
+import time
 import asyncio
-from playwright.async_api import async_playwright
-from services.utils import STEALTH_ARGS
+from collections import deque
+from services.browser_pool import browser_pool
+from services.capture import CAPTURE_PATTERNS, ResponseCapture, format_captured, remember_template, replay_lookup
+from services.resource_policy import ResourceMonitor, context_options, choose_mode
+from services import sessions
+from services.metrics import span, observe
+from services.fixtures import route_har
+from services.resilience import guard, CircuitOpen
 
 # --- API SERVICE ---
 from services.cargoes_flow import check_cargoes_flow  # <--- NEW
 
 # --- DRIVERS ---
-from services.air.air_india import drive_air_india
-from services.air.china_airlines import drive_china_airlines
-from services.air.silk_way import drive_silk_way
-from services.air.af_klm import drive_af_klm
-from services.air.etihad import drive_etihad
-from services.air.saudia import drive_saudia
-from services.air.fallback import drive_air_fallback
-
-# SEA DRIVERS (Placeholders/Active)
-from services.sea.hapag import drive_hapag
-from services.sea.cma import drive_cma
-from services.sea.msc import drive_msc # <--- NEW IMPORT
-from services.sea.fallback import drive_sea_fallback
+# Declared in services/air and services/sea; each module is imported on first use
+from services.registry import resolve, load_driver, driver_argument, fallback_for
+
+logger = logging.getLogger(__name__)
+
+# --- HEDGING (override via .env) ---
+# If Cargoes Flow hasn't answered after its HEDGE_QUANTILE latency, start the scrape in parallel
+HEDGE_ENABLED = os.getenv("HEDGE_ENABLED", "true").lower() in ("1", "true", "yes")
+HEDGE_QUANTILE = float(os.getenv("HEDGE_QUANTILE", "0.9"))
+HEDGE_DELAY_MS = float(os.getenv("HEDGE_DELAY_MS", "2000"))  # Used until enough latencies are observed
+HEDGE_MIN_MS = float(os.getenv("HEDGE_MIN_MS", "300"))
+HEDGE_MAX_MS = float(os.getenv("HEDGE_MAX_MS", "8000"))
+HEDGE_MIN_SAMPLES = 20
+
+_tier1_latencies = deque(maxlen=200)  # Seconds, most recent Cargoes Flow answers
+HEDGE_STATS = {"lookups": 0, "hedged": 0, "api_won": 0, "scrape_won": 0}
+
+
+def route_driver(tracking_number: str, carrier_type: str = "air", carrier_name: str = ""):
+    """Returns (driver_name, driver_func, number_to_pass)."""
+    spec = resolve(tracking_number, carrier_type, carrier_name)
+    if not guard(spec.name).available():
+        # Carrier is down or blocking us: the aggregator fallback beats waiting out its timeouts
+        fallback = fallback_for(carrier_type)
+        if fallback.name != spec.name and guard(fallback.name).available():
+            logger.warning("⛔ %s circuit open; routing to %s", spec.name, fallback.name)
+            spec = fallback
+    return spec.name, load_driver(spec), driver_argument(spec, tracking_number)
+
+
+def _looks_failed(raw_data: str):
+    # Drivers report soft failures as text rather than raising
+    return raw_data.startswith("Error") or raw_data.startswith("Fallback failed")
+
 
 async def master_scraper(tracking_number: str, carrier_type: str = "air", carrier_name: str = ""):
+    # Latency is labeled by the driver that would handle this shipment (routing alone imports nothing)
+    label = resolve(tracking_number, carrier_type, carrier_name).name
+    with span("scrape", label) as total:
+        raw_data, total.outcome = await _scrape(tracking_number, carrier_type, carrier_name, label)
+        return raw_data
+
+
+def hedge_delay():
+    """Seconds to give Tier 1 before starting Tier 2 alongside it."""
+    if len(_tier1_latencies) < HEDGE_MIN_SAMPLES:
+        delay = HEDGE_DELAY_MS / 1000
+    else:
+        ordered = sorted(_tier1_latencies)
+        delay = ordered[min(len(ordered) - 1, int(HEDGE_QUANTILE * len(ordered)))]
+    return min(max(delay, HEDGE_MIN_MS / 1000), HEDGE_MAX_MS / 1000)
+
+
+async def _tier1(tracking_number: str, carrier_type: str, label: str):
+    t0 = time.perf_counter()
+    with span("cargoes_flow", label) as stage:
+        api_result = await check_cargoes_flow(tracking_number, carrier_type)
+        stage.outcome = "hit" if api_result else "miss"
+    _tier1_latencies.append(time.perf_counter() - t0)
+    return f"Source: Cargoes Flow API\n{api_result}" if api_result else None
+
+
+async def _cancel(task):
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+
+async def _scrape(tracking_number: str, carrier_type: str, carrier_name: str, label: str):
+    """Returns (raw_data, source) where source is the scrape outcome label."""
     clean = tracking_number.replace(" ", "").replace("-", "")
-    prefix = clean[:3]
 
-    print(f"\n🚦 Processing: {tracking_number} | Type: {carrier_type}")
+    logger.info("🚦 Processing: %s | Type: %s", tracking_number, carrier_type)
+    HEDGE_STATS["lookups"] += 1
 
     # ============================================================
     # TIER 1: CARGOES FLOW API (The Fast Lane)
     # ============================================================
-    # We try API first. If it works, we skip Playwright entirely.
-    api_result = await check_cargoes_flow(tracking_number, carrier_type)
-    if api_result:
-        return f"Source: Cargoes Flow API\n{api_result}"
+    # We try API first. If it answers in time, Playwright never starts.
+    api_task = asyncio.create_task(_tier1(tracking_number, carrier_type, label))
+    delay = hedge_delay() if HEDGE_ENABLED else None
+    try:
+        done, _ = await asyncio.wait({api_task}, timeout=delay)
+        if done:
+            api_result = api_task.result()
+            if api_result:
+                return api_result, "api"
+            return await _tier2(tracking_number, carrier_type, carrier_name, clean)
+
+        # ============================================================
+        # HEDGE: API is slower than usual, race the scraper against it
+        # ============================================================
+        HEDGE_STATS["hedged"] += 1
+        logger.info("🏁 API slow (>%.1fs); starting scraper in parallel...", delay)
+        scrape_task = asyncio.create_task(_tier2(tracking_number, carrier_type, carrier_name, clean))
+        try:
+            pending = {api_task, scrape_task}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                if api_task in done and api_task.result():
+                    HEDGE_STATS["api_won"] += 1
+                    return api_task.result(), "api"
+                if scrape_task in done and scrape_task.result()[1] not in ("failed", "error", "circuit_open"):
+                    HEDGE_STATS["scrape_won"] += 1
+                    return scrape_task.result()
+            # Neither had usable data: report the scraper's answer, as the sequential path would
+            return scrape_task.result()
+        finally:
+            if not scrape_task.done():
+                await _cancel(scrape_task)
+    finally:
+        if not api_task.done():
+            await _cancel(api_task)
 
+
+async def _tier2(tracking_number: str, carrier_type: str, carrier_name: str, clean: str):
     # ============================================================
     # TIER 2: SCRAPING (The Fallback)
     # ============================================================
-    print("   🐢 API didn't have data. Switching to Scraper...")
+    driver_name, driver, number = route_driver(tracking_number, carrier_type, carrier_name)
+    # Rate-limited per carrier; soft failures and crashes count towards opening its circuit
+    try:
+        async with guard(driver_name).protect() as outcome:
+            raw_data, source = await _scrape_carrier(driver_name, driver, number, clean)
+            outcome.failed = source in ("failed", "error")
+    except CircuitOpen as e:
+        logger.warning("⛔ %s", e)
+        return f"Error: {e} (carrier failing, retry later)", "circuit_open"
+    return raw_data, source
+
+
+async def _scrape_carrier(driver_name: str, driver, number: str, clean: str):
+    """Tier 2 for one driver: direct API replay if we have a template, else a pooled browser scrape."""
+    # Carrier JSON API seen on an earlier scrape? Call it directly, no browser.
+    with span("replay", driver_name) as stage:
+        replayed = await replay_lookup(driver_name, clean)
+        stage.outcome = "hit" if replayed else "miss"
+    if replayed:
+        return replayed, "replay"
 
-    async with async_playwright() as p:
-        # REMOVED: The iPhone/Mobile logic. Back to standard Desktop for everyone.
-        browser = await p.chromium.launch(headless=False, args=STEALTH_ARGS)
-        context = await browser.new_context(viewport={'width': 1920, 'height': 1080})
+    logger.info("🐢 API didn't have data. Switching to Scraper...")
+
+    # Lease an isolated context from the shared pool (no per-request Chromium launch)
+    # Saved cookies/consent for this carrier skip banners and warm-up navigation
+    session_options = await sessions.context_options(driver_name)
+    # A sampled share of scrapes runs unblocked so the blocked-vs-full delta stays measured
+    resource_mode = choose_mode()
+    lease_started = time.perf_counter()
+    async with browser_pool.lease(**context_options(resource_mode), **session_options) as context:
+        observe("lease", driver_name, "ok", time.perf_counter() - lease_started)
+        sessions.mark_if_warm(context, driver_name, session_options)
+        # FIXTURE_MODE=record/replay: save or serve this scrape's traffic as a HAR (no-op otherwise)
+        await route_har(context, driver_name, clean)
+        # Block images/fonts/trackers (per-driver allowlist) and measure what still loads
+        monitor = await ResourceMonitor(context, driver_name, resource_mode).start()
+        # Record the carrier's own XHR results while the driver works the page
+        pattern = CAPTURE_PATTERNS.get(driver_name)
+        capture = ResponseCapture(context, pattern) if pattern else None
         page = await context.new_page()
 
         try:
-            raw_data = None
-
-            # --- SEA ROUTING ---
-            if carrier_type == "sea":
-                carrier_lower = str(carrier_name).lower()
-
-                if "hapag" in carrier_lower:
-                    raw_data = await drive_hapag(page, clean)
-                elif "cma" in carrier_lower:
-                    raw_data = await drive_cma(page, clean)
-                elif "msc" in carrier_lower:  # <--- MSC Route
-                    raw_data = await drive_msc(page, clean)
-                else:
-                    raw_data = await drive_sea_fallback(page, clean)
-
-            # --- AIR ROUTING ---
-            else:
-                if prefix == "098":
-                    # THE ONLY ACTIVE DRIVER
-                    raw_data = await drive_air_india(page, clean)
-                elif prefix == "607": # Etihad
-                    raw_data = await drive_etihad(page, tracking_number) # Pass FULL number (with dash if needed)
-                elif prefix == "297":
-                    raw_data = await drive_china_airlines(page, clean)
-                elif prefix in ["501", "463"]: # Silk Way
-                    raw_data = await drive_silk_way(page, clean)
-                elif prefix in ["057", "074"]:
-                    raw_data = await drive_af_klm(page, clean)
-                elif prefix == "065": # Saudia
-                    raw_data = await drive_saudia(page, clean)
-                else:
-                    raw_data = await drive_air_fallback(page, clean)
-
-            await browser.close()
-            return raw_data if raw_data else "Driver Not Implemented."
+            with span("driver", driver_name) as stage:
+                raw_data = await driver(page, number)
+                stage.outcome = "ok" if raw_data and not _looks_failed(raw_data) else "failed"
+
+            if capture:
+                await capture.settle()
+                captured = capture.best(clean)
+                if captured:
+                    logger.info("📡 Using captured %s API response instead of page text.", driver_name)
+                    remember_template(driver_name, captured, clean)
+                    await sessions.save_session(context, driver_name)
+                    return format_captured(driver_name, captured["payload"]), "captured"
+
+            if raw_data and not _looks_failed(raw_data):
+                await sessions.save_session(context, driver_name)
+                return raw_data, "scraped"
+            sessions.invalidate_session(driver_name)
+            return (raw_data if raw_data else "Driver Not Implemented."), "failed"
 
         except Exception as e:
-            print(f"❌ Crash: {e}")
-            await browser.close()
-            return f"Error: {e}"
+            logger.error("❌ Crash: %s", e)
+            sessions.invalidate_session(driver_name)
+            return f"Error: {e}", "error"
+        finally:
+            if capture:
+                capture.detach()
+            await monitor.finish()
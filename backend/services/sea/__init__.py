@@ -0,0 +1,21 @@
+from services.registry import DriverSpec, register
+
+# --- SEA DRIVERS (routed by carrier name / SCAC code) ---
+register(DriverSpec(
+    name="hapag", module="services.sea.hapag", func="drive_hapag", type="sea",
+    aliases=("hapag", "hapag lloyd", "hapag-lloyd", "hlcu", "hlag"),
+    capabilities=frozenset({"stub"}),
+))
+register(DriverSpec(
+    name="cma", module="services.sea.cma", func="drive_cma", type="sea",
+    aliases=("cma", "cma cgm", "cmdu"),
+    capabilities=frozenset({"stub"}),
+))
+register(DriverSpec(
+    name="msc", module="services.sea.msc", func="drive_msc", type="sea",
+    aliases=("msc", "mediterranean shipping", "mscu", "medu"),
+))
+register(DriverSpec(
+    name="sea_fallback", module="services.sea.fallback", func="drive_sea_fallback", type="sea",
+    capabilities=frozenset({"popup"}), max_concurrency=3, fallback=True,
+))
@@ -1,3 +1,8 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+
 async def drive_cma(page, container_number):
-    print("⚠️ CMA Driver not yet implemented.")
+    logger.warning("⚠️ CMA Driver not yet implemented.")
     return None
@@ -1,11 +1,18 @@
 import asyncio
+import logging
 from playwright.async_api import Page
+from services.utils import wait_ready, number_pattern
+
+TRACK_TRACE_URL = r"track-trace\.com"
+
+logger = logging.getLogger(__name__)
+
 
 async def drive_sea_fallback(page: Page, container_number: str):
     """
     Service: Track-Trace Container Fallback
     """
-    print(f"⚓ [Fallback] Routing {container_number} to Track-Trace...")
+    logger.info("⚓ [Fallback] Routing %s to Track-Trace...", container_number)
 
     await page.goto("https://www.track-trace.com/container", timeout=45000)
 
@@ -21,24 +28,32 @@ async def drive_sea_fallback(page: Page, container_number: str):
         new_page = await popup_info.value
         await new_page.wait_for_load_state("domcontentloaded")
 
+        # Listen from here so a results call fired during the redirect isn't missed. Only the
+        # carrier's page counts: its text must show the number, or an XHR must ask for it.
+        pattern = number_pattern(container_number)
+        ready = asyncio.create_task(wait_ready(
+            new_page, driver="sea_fallback", response=pattern,
+            text_stable="body", text_pattern=pattern, away_from=TRACK_TRACE_URL,
+        ))
+
         # 4. Handle "I'm Sure" Interstitial
-        print("   -> Checking for Interstitial...")
+        logger.debug("Checking for Interstitial...")
         try:
             # Look for button text
             btn = new_page.get_by_text("I'm sure, continue with", exact=False)
             if await btn.is_visible(timeout=5000):
-                print("   -> Clicking Interstitial...")
+                logger.debug("Clicking Interstitial...")
                 await btn.click()
                 await new_page.wait_for_load_state("domcontentloaded")
         except:
             pass
 
-        # 5. Wait for external site to load
-        print("   -> Waiting for results...")
-        await asyncio.sleep(8)
+        # 5. Wait for the carrier site's results (with a floor, not a fixed 8s)
+        logger.debug("Waiting for results...")
+        await ready
 
         return await new_page.inner_text("body")
 
     except Exception as e:
-        print(f"   ❌ Fallback Error: {e}")
+        logger.error("❌ Fallback Error: %s", e)
         return "Fallback failed to retrieve data."
@@ -1,3 +1,8 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+
 async def drive_hapag(page, container_number):
-    print("⚠️ Hapag Driver not yet implemented.")
+    logger.warning("⚠️ Hapag Driver not yet implemented.")
     return None
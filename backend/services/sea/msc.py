@@ -1,12 +1,16 @@
+import logging
 import asyncio
 from services.utils import human_type, kill_cookie_banners
 
+logger = logging.getLogger(__name__)
+
+
 async def drive_msc(page, container_number):
     """
     MSC Driver (Official Site)
     URL: https://www.msc.com/en/track-a-shipment
     """
-    print(f"🚢 [MSC] Tracking: {container_number}")
+    logger.info("🚢 [MSC] Tracking: %s", container_number)
 
     await page.goto("https://www.msc.com/en/track-a-shipment", timeout=60000)
 
@@ -15,7 +19,7 @@ async def drive_msc(page, container_number):
 
     # 2. Input
     # Selector from your HTML: id="trackingNumber"
-    print("   -> Finding Input...")
+    logger.debug("Finding Input...")
     await page.wait_for_selector("#trackingNumber", state="visible")
 
     await human_type(page, "#trackingNumber", container_number)
@@ -23,7 +27,7 @@ async def drive_msc(page, container_number):
     # 3. Click Search
     # Usually a button with icon-search or type=submit inside the form
     # We use a broad text match to be safe, or the search icon class
-    print("   -> Clicking Search...")
+    logger.debug("Clicking Search...")
 
     # Try multiple button selectors common on MSC
     search_selectors = [
@@ -44,7 +48,7 @@ async def drive_msc(page, container_number):
         await page.locator("#trackingNumber").press("Enter")
 
     # 4. Wait for Results
-    print("   -> Waiting for results...")
+    logger.debug("Waiting for results...")
     try:
         # MSC loads results dynamically via AJAX
         await page.wait_for_load_state("networkidle")
@@ -54,5 +58,5 @@ async def drive_msc(page, container_number):
 
         return await page.inner_text("body")
     except:
-        print("   ⚠️ MSC Timeout. Returning body dump.")
+        logger.warning("⚠️ MSC Timeout. Returning body dump.")
         return await page.inner_text("body")
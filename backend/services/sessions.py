@@ -0,0 +1,75 @@
+import logging
+import os
+import json
+import time
+import asyncio
+from dotenv import load_dotenv
+from services.utils import DATA_DIR, mark_context_warm
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# ============================================================
+# SESSION PERSISTENCE: cookies, localStorage and consent flags per carrier
+# ============================================================
+SESSIONS_ENABLED = os.getenv("SESSIONS_ENABLED", "true").lower() in ("1", "true", "yes")
+SESSION_DIR = os.path.join(DATA_DIR, "sessions")
+SESSION_TTL = int(os.getenv("SESSION_TTL_HOURS", "24")) * 3600
+
+
+def _path(driver: str):
+    return os.path.join(SESSION_DIR, f"{driver}.json")
+
+
+def session_state(driver: str):
+    """
+    A fresh saved storage_state for this driver, loaded into memory, or None (cold start).
+    A dict, not the path: a failing scrape may delete the file before new_context() reads it.
+    """
+    if not SESSIONS_ENABLED:
+        return None
+    path = _path(driver)
+    try:
+        if time.time() - os.path.getmtime(path) < SESSION_TTL:
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+async def context_options(driver: str):
+    """new_context() kwargs that preload the saved session, if any."""
+    state = await asyncio.to_thread(session_state, driver)
+    return {"storage_state": state} if state else {}
+
+
+def mark_if_warm(context, driver: str, options):
+    # Lets kill_cookie_banners and consent clicks skip their checks on a warm context
+    if options.get("storage_state"):
+        mark_context_warm(context)
+        logger.info("🍪 Reusing saved %s session.", driver)
+
+
+async def save_session(context, driver: str):
+    """Called after a successful run: the consent/session cookies it earned are reused next time."""
+    if not SESSIONS_ENABLED:
+        return
+    os.makedirs(SESSION_DIR, exist_ok=True)
+    # Unique temp name: concurrent scrapes of one carrier may save at the same time
+    tmp = f"{_path(driver)}.{os.getpid()}.{id(context)}.tmp"
+    try:
+        await context.storage_state(path=tmp)
+        os.replace(tmp, _path(driver))
+    except Exception as e:
+        logger.warning("⚠️ Could not save %s session: %s", driver, e)
+
+
+def invalidate_session(driver: str):
+    """Called after a failed run: a stale or blocked session shouldn't poison the next lookup."""
+    try:
+        os.remove(_path(driver))
+        logger.info("🗑️ Dropped saved %s session.", driver)
+    except OSError:
+        pass
@@ -0,0 +1,299 @@
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import hashlib
+import threading
+from datetime import date
+from dotenv import load_dotenv
+from services.utils import DATA_DIR
+from services.cache import ttl_for_status
+from services.fast_parser import parse_eta
+
+load_dotenv()
+
+# --- STORE CONFIG (override via .env) ---
+STORE_DB_PATH = os.getenv("STORE_DB_PATH", os.path.join(DATA_DIR, "shipments.sqlite3"))
+# An unchanged page still gets a fresh parse after this long (date-relative statuses like "Delayed")
+REPARSE_AFTER = int(os.getenv("STORE_REPARSE_AFTER_HOURS", "24")) * 3600
+# Consecutive failed refreshes before a watched shipment stops being polled
+MAX_FAILURES = int(os.getenv("STORE_MAX_FAILURES", "8"))
+
+# Fields whose change is worth emitting (summaries are re-worded by the LLM on every parse)
+TRACKED_FIELDS = ("status", "live_eta")
+
+
+def content_hash(raw_text: str):
+    return hashlib.sha256((raw_text or "").encode("utf-8")).hexdigest()
+
+
+# --- REFRESH POLICY ---
+def next_check_in(status, live_eta, failures=0, today: date = None):
+    """
+    Seconds until a shipment should be re-tracked, or None once it needs no more polling.
+    Polls more often as the ETA gets close; failures back off exponentially.
+    """
+    status_lower = str(status or "").lower()
+    if "delivered" in status_lower:
+        return None
+    if failures >= MAX_FAILURES:
+        return None
+    if failures:
+        return min(3600 * 2 ** (failures - 1), 24 * 3600)
+
+    if "discharged" in status_lower or "arrived" in status_lower:
+        return 6 * 3600
+    eta = parse_eta(live_eta)
+    if eta is None:
+        return 12 * 3600
+    days = (eta - (today or date.today())).days
+    if days > 14:
+        return 24 * 3600
+    if days > 3:
+        return 12 * 3600
+    if days > 1:
+        return 4 * 3600
+    # Due today, tomorrow or overdue: this is when milestones land
+    return 3600
+
+
+class ShipmentStore:
+    """
+    Last known state per shipment (keyed like the cache) and a log of real changes.
+    SQLite in DATA_DIR; calls run in a thread so the event loop never blocks on disk.
+    """
+
+    def __init__(self, db_path=STORE_DB_PATH):
+        self.db_path = db_path
+        self._db = None
+        self._lock = threading.Lock()
+
+    def _conn(self):
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.row_factory = sqlite3.Row
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript("""
+                CREATE TABLE IF NOT EXISTS shipments (
+                    key TEXT PRIMARY KEY,
+                    tracking_number TEXT, carrier TEXT, type TEXT,
+                    raw_hash TEXT,
+                    status TEXT, live_eta TEXT, smart_summary TEXT, parsed_by TEXT,
+                    parsed_at REAL, checked_at REAL, changed_at REAL,
+                    failures INTEGER DEFAULT 0,
+                    watched INTEGER DEFAULT 0, active INTEGER DEFAULT 1, next_check_at REAL,
+                    timeline TEXT
+                );
+                CREATE INDEX IF NOT EXISTS shipments_due ON shipments (watched, active, next_check_at);
+                CREATE TABLE IF NOT EXISTS changes (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    key TEXT, tracking_number TEXT, at REAL, changes TEXT
+                );
+            """)
+            columns = {row[1] for row in self._db.execute("PRAGMA table_info(shipments)")}
+            if "timeline" not in columns:
+                # Stores created before event timelines
+                self._db.execute("ALTER TABLE shipments ADD COLUMN timeline TEXT")
+            if "raw_text" in columns:
+                # Stores created when the reduced page was kept; only its hash is used now
+                try:
+                    self._db.execute("ALTER TABLE shipments DROP COLUMN raw_text")
+                except sqlite3.OperationalError:
+                    # DROP COLUMN needs SQLite 3.35+; older builds keep an empty column
+                    self._db.execute("UPDATE shipments SET raw_text = NULL")
+                self._db.commit()
+        return self._db
+
+    # --- SYNC (run via asyncio.to_thread) ---
+    def _get(self, key):
+        with self._lock:
+            row = self._conn().execute("SELECT * FROM shipments WHERE key = ?", (key,)).fetchone()
+        return dict(row) if row else None
+
+    def _record(self, key, tracking_number, carrier, carrier_type, result, raw_text, parsed, timeline):
+        now = time.time()
+        failed = ttl_for_status(result.get("status")) == 0
+        with self._lock:
+            db = self._conn()
+            previous = db.execute("SELECT * FROM shipments WHERE key = ?", (key,)).fetchone()
+            previous = dict(previous) if previous else None
+
+            if failed:
+                # Keep the last good state; only count the failure and back off
+                failures = (previous["failures"] if previous else 0) + 1
+                status = previous["status"] if previous else None
+                live_eta = previous["live_eta"] if previous else None
+                wait = next_check_in(status, live_eta, failures)
+                if previous:
+                    db.execute(
+                        "UPDATE shipments SET checked_at = ?, failures = ?, active = ?, next_check_at = ? WHERE key = ?",
+                        (now, failures, int(wait is not None), now + (wait or 0), key),
+                    )
+                else:
+                    db.execute(
+                        "INSERT INTO shipments (key, tracking_number, carrier, type, checked_at, failures, active, next_check_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (key, tracking_number, carrier, carrier_type, now, failures, int(wait is not None), now + (wait or 0)),
+                    )
+                db.commit()
+                return []
+
+            changes = []
+            if previous and previous["status"] is not None:
+                changes = [
+                    {"field": field, "old": previous[field], "new": result.get(field)}
+                    for field in TRACKED_FIELDS if previous[field] != result.get(field)
+                ]
+            wait = next_check_in(result.get("status"), result.get("live_eta"))
+            db.execute(
+                """
+                INSERT INTO shipments (key, tracking_number, carrier, type, raw_hash, status, live_eta,
+                                       smart_summary, parsed_by, parsed_at, checked_at, changed_at, failures,
+                                       active, next_check_at, timeline)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 0, ?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET
+                    tracking_number = excluded.tracking_number, carrier = excluded.carrier,
+                    raw_hash = excluded.raw_hash, status = excluded.status,
+                    live_eta = excluded.live_eta, smart_summary = excluded.smart_summary,
+                    parsed_by = CASE WHEN excluded.parsed_at IS NULL THEN shipments.parsed_by ELSE excluded.parsed_by END,
+                    parsed_at = COALESCE(excluded.parsed_at, shipments.parsed_at),
+                    checked_at = excluded.checked_at,
+                    changed_at = COALESCE(excluded.changed_at, shipments.changed_at),
+                    failures = 0, active = excluded.active, next_check_at = excluded.next_check_at,
+                    timeline = COALESCE(excluded.timeline, shipments.timeline)
+                """,
+                (
+                    key, tracking_number, carrier, carrier_type, content_hash(raw_text),
+                    result.get("status"), result.get("live_eta"), result.get("smart_summary"), result.get("parsed_by"),
+                    now if parsed else None, now, now if (changes or not previous) else None,
+                    int(wait is not None), now + (wait or 0),
+                    json.dumps(timeline, separators=(",", ":")) if timeline is not None else None,
+                ),
+            )
+            if changes:
+                db.execute(
+                    "INSERT INTO changes (key, tracking_number, at, changes) VALUES (?, ?, ?, ?)",
+                    (key, tracking_number, now, json.dumps(changes)),
+                )
+            db.commit()
+        return changes
+
+    def _watch(self, entries):
+        now = time.time()
+        with self._lock:
+            db = self._conn()
+            db.executemany(
+                """
+                INSERT INTO shipments (key, tracking_number, carrier, type, watched, active, next_check_at)
+                VALUES (?, ?, ?, ?, 1, 1, ?)
+                ON CONFLICT(key) DO UPDATE SET
+                    watched = 1, failures = 0,
+                    -- Re-watching revives a shipment that gave up after failures, never a delivered one
+                    active = COALESCE(LOWER(shipments.status), '') NOT LIKE '%delivered%',
+                    next_check_at = COALESCE(shipments.next_check_at, excluded.next_check_at)
+                """,
+                [(key, number, carrier, carrier_type, now) for key, number, carrier, carrier_type in entries],
+            )
+            db.commit()
+
+    def _unwatch(self, keys):
+        with self._lock:
+            db = self._conn()
+            db.executemany("UPDATE shipments SET watched = 0 WHERE key = ?", [(key,) for key in keys])
+            db.commit()
+
+    def _due(self, now, limit, claim):
+        with self._lock:
+            db = self._conn()
+            rows = db.execute(
+                "SELECT key, tracking_number, carrier, type FROM shipments "
+                "WHERE watched = 1 AND active = 1 AND next_check_at <= ? ORDER BY next_check_at LIMIT ?",
+                (now, limit),
+            ).fetchall()
+            # Claimed until the refresh records its result; a crashed refresh retries after `claim`
+            db.executemany("UPDATE shipments SET next_check_at = ? WHERE key = ?", [(now + claim, row["key"]) for row in rows])
+            db.commit()
+        return [dict(row) for row in rows]
+
+    def _changes(self, since_id, limit):
+        with self._lock:
+            rows = self._conn().execute(
+                "SELECT id, key, tracking_number, at, changes FROM changes WHERE id > ? ORDER BY id LIMIT ?",
+                (since_id, limit),
+            ).fetchall()
+        return [{**dict(row), "changes": json.loads(row["changes"])} for row in rows]
+
+    def _states(self, keys):
+        rows = []
+        with self._lock:
+            db = self._conn()
+            # Chunked to stay under SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                rows.extend(db.execute(
+                    "SELECT key, status, live_eta, smart_summary, checked_at FROM shipments "
+                    f"WHERE key IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall())
+        return [tuple(row) for row in rows]
+
+    def _snapshot(self):
+        with self._lock:
+            row = self._conn().execute(
+                "SELECT COUNT(*) AS total, COALESCE(SUM(watched), 0) AS watched, "
+                "COALESCE(SUM(watched AND active), 0) AS polling, MIN(CASE WHEN watched AND active THEN next_check_at END) AS next_due "
+                "FROM shipments"
+            ).fetchone()
+        return dict(row)
+
+    # --- ASYNC API ---
+    async def get(self, key):
+        return await asyncio.to_thread(self._get, key)
+
+    async def record(self, key, tracking_number, carrier, carrier_type, result, raw_text, parsed=True, timeline=None):
+        """
+        Saves a lookup and returns the real changes [{"field", "old", "new"}] since the last good one.
+        Failed lookups keep the previous state. `parsed` is False when the stored parse was reused.
+        Only the page's hash is kept, not the page; `timeline` is the event list (dicts) it yielded.
+        """
+        return await asyncio.to_thread(
+            self._record, key, tracking_number, carrier, carrier_type, result, raw_text, parsed, timeline,
+        )
+
+    async def watch(self, entries):
+        """entries: [(key, tracking_number, carrier, type)]. Watched shipments are refreshed by the scheduler."""
+        await asyncio.to_thread(self._watch, list(entries))
+
+    async def unwatch(self, keys):
+        await asyncio.to_thread(self._unwatch, list(keys))
+
+    async def due(self, limit=50, now=None, claim=900):
+        """Watched, undelivered shipments whose next check has come, oldest first."""
+        return await asyncio.to_thread(self._due, now or time.time(), limit, claim)
+
+    async def changes(self, since_id=0, limit=100):
+        return await asyncio.to_thread(self._changes, since_id, limit)
+
+    async def states(self, keys):
+        """(key, status, live_eta, smart_summary, checked_at) for each known key, for bulk reports."""
+        return await asyncio.to_thread(self._states, list(keys))
+
+    async def snapshot(self):
+        return await asyncio.to_thread(self._snapshot)
+
+
+def reusable_parse(previous, raw_hash: str):
+    """The stored parse still holds if the page is byte-identical and was parsed recently."""
+    return bool(
+        previous
+        and previous.get("raw_hash") == raw_hash
+        and previous.get("status")
+        and not previous.get("failures")
+        and previous.get("parsed_at")
+        and time.time() - previous["parsed_at"] < REPARSE_AFTER
+    )
+
+
+shipment_store = ShipmentStore()
@@ -1,5 +1,18 @@
+import logging
+import os
+import re
+import time
+import weakref
 import asyncio
 import random
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# Local state (caches, session files, stores) lives here unless DATA_DIR is set
+DATA_DIR = os.getenv("DATA_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data"))
 
 # Stealth Args: Makes the bot look like a real Chrome user
 STEALTH_ARGS = [
@@ -10,6 +23,10 @@ STEALTH_ARGS = [
     '--window-size=1920,1080',
 ]
 
+def normalize_tracking_number(tracking_number):
+    """'098-1234 5678' -> '09812345678'. Used for routing and dedupe keys."""
+    return str(tracking_number).replace(" ", "").replace("-", "").strip().upper()
+
 async def human_type(page, selector, text):
     """Types text slowly with random delays to mimic a human."""
     try:
@@ -19,12 +36,26 @@ async def human_type(page, selector, text):
         for char in text:
             await page.type(selector, char, delay=random.randint(50, 150))
     except Exception as e:
-        print(f"   [Type Error] Could not type into {selector}: {e}")
+        logger.info("[Type Error] Could not type into %s: %s", selector, e)
         # Emergency fill
         await page.fill(selector, text)
 
+# Contexts restored from a saved session: consent is already stored, banners won't show
+_warm_contexts = weakref.WeakSet()
+
+def mark_context_warm(context):
+    _warm_contexts.add(context)
+
+def is_context_warm(context):
+    try:
+        return context in _warm_contexts
+    except TypeError:
+        return False
+
 async def kill_cookie_banners(page):
     """Tries to click common 'Accept' buttons."""
+    if is_context_warm(page.context):
+        return
     try:
         # Common selectors for cookie buttons
         selectors = [
@@ -36,8 +67,195 @@ async def kill_cookie_banners(page):
         ]
         for sel in selectors:
             if await page.locator(sel).first.is_visible(timeout=500):
-                print("   🍪 Splat! Cookie banner killed.")
+                logger.info("🍪 Splat! Cookie banner killed.")
                 await page.locator(sel).first.click()
                 return
     except:
         pass
+
+# ============================================================
+# READINESS WAITS (replace fixed asyncio.sleep calls)
+# ============================================================
+# Per-driver timeouts in ms. Override with WAIT_TIMEOUT_<DRIVER>=ms in .env (e.g. WAIT_TIMEOUT_MSC=15000).
+WAIT_TIMEOUTS = {
+    "default": 20000,
+    "air_fallback": 15000,
+    "sea_fallback": 15000,
+    "etihad": 20000,
+    "silk_way": 15000,
+    "saudia": 10000,
+    "china_airlines": 10000,
+    "af_klm": 5000,
+}
+# Minimum ms before a wait may return, for drivers whose signals can fire on a redirect page.
+# Override with WAIT_MIN_<DRIVER>=ms in .env.
+WAIT_FLOORS = {
+    "air_fallback": 2000,
+    "sea_fallback": 3000,
+}
+TEXT_STABLE_WINDOW_MS = 750
+TEXT_POLL_MS = 250
+
+# "<driver>:<label>" -> {"count", "timeouts", "total_ms", "last_ms", "last_signal"}
+WAIT_STATS = {}
+
+
+def wait_timeout(driver: str):
+    env = os.getenv(f"WAIT_TIMEOUT_{driver.upper()}")
+    if env and env.isdigit():
+        return int(env)
+    return WAIT_TIMEOUTS.get(driver, WAIT_TIMEOUTS["default"])
+
+
+def wait_floor(driver: str):
+    env = os.getenv(f"WAIT_MIN_{driver.upper()}")
+    if env and env.isdigit():
+        return int(env)
+    return WAIT_FLOORS.get(driver, 0)
+
+
+def number_pattern(tracking_number):
+    """Regex for a tracking number as pages print it: 'MSCU 765432-9', '607-12345675'."""
+    return r"[\s\-/]?".join(re.escape(ch) for ch in normalize_tracking_number(tracking_number))
+
+
+def _record_wait(driver, label, elapsed_ms, signal):
+    stats = WAIT_STATS.setdefault(f"{driver}:{label}", {"count": 0, "timeouts": 0, "total_ms": 0.0, "last_ms": 0.0, "last_signal": None})
+    stats["count"] += 1
+    stats["total_ms"] = round(stats["total_ms"] + elapsed_ms, 1)
+    stats["last_ms"] = round(elapsed_ms, 1)
+    stats["last_signal"] = signal
+    if signal is None:
+        stats["timeouts"] += 1
+
+
+async def _response_signal(page, pattern, away_from=None):
+    regex = re.compile(pattern, re.IGNORECASE)
+
+    def matches(r):
+        if away_from and (away_from.search(page.url) or away_from.search(r.url)):
+            return False
+        # Only successful data calls count as "results arrived", not the page's own document
+        return r.ok and r.request.resource_type in ("xhr", "fetch") and bool(regex.search(r.url))
+
+    await page.wait_for_event("response", predicate=matches, timeout=0)
+
+
+async def _selector_signal(page, selector):
+    await page.wait_for_selector(selector, state="visible", timeout=0)
+
+
+async def _text_stable_signal(page, selector, window_ms, min_chars=50, pattern=None, away_from=None):
+    """Resolves once the element's text (matching `pattern`, if given) has stopped changing for window_ms."""
+    regex = re.compile(pattern, re.IGNORECASE) if pattern else None
+    last, stable_since = None, None
+    while True:
+        if away_from and away_from.search(page.url):
+            text = None  # Still on the redirect/interstitial page
+        else:
+            try:
+                text = await page.inner_text(selector, timeout=TEXT_POLL_MS)
+            except Exception:
+                text = None
+            if text and regex and not regex.search(text):
+                text = None
+        now = time.perf_counter()
+        if text and len(text) >= min_chars and text == last:
+            if stable_since is not None and (now - stable_since) * 1000 >= window_ms:
+                return
+        else:
+            stable_since = now
+        last = text
+        await asyncio.sleep(TEXT_POLL_MS / 1000)
+
+
+async def _frame_signal(page, iframe_selector):
+    handle = await page.wait_for_selector(iframe_selector, state="attached", timeout=0)
+    while True:
+        frame = await handle.content_frame()
+        if frame and frame.url not in ("", "about:blank"):
+            await frame.wait_for_load_state("domcontentloaded")
+            return
+        await asyncio.sleep(0.1)
+
+
+async def wait_ready(page, driver="default", label="results", response=None, selector=None,
+                     text_stable=None, frame=None, timeout=None, stable_ms=TEXT_STABLE_WINDOW_MS,
+                     text_pattern=None, away_from=None):
+    """
+    Waits until the FIRST readiness signal fires instead of sleeping a fixed time:
+      response    - regex matched against a successful XHR/fetch response URL
+      selector    - CSS selector becomes visible
+      text_stable - selector whose inner text (matching text_pattern, if given) stops changing for stable_ms
+      frame       - iframe selector whose frame has navigated and loaded
+    response/text_stable ignore the page while its URL matches `away_from` (a redirect/interstitial).
+    Never returns before the driver's wait_floor. Returns the name of the signal that fired,
+    or None on timeout (never raises).
+    For `response`, start this as a task BEFORE the click that triggers the request.
+    """
+    timeout = timeout if timeout is not None else wait_timeout(driver)
+    away = re.compile(away_from, re.IGNORECASE) if away_from else None
+    signals = {}
+    if response:
+        signals["response"] = _response_signal(page, response, away)
+    if selector:
+        signals["selector"] = _selector_signal(page, selector)
+    if text_stable:
+        signals["text_stable"] = _text_stable_signal(page, text_stable, stable_ms, pattern=text_pattern, away_from=away)
+    if frame:
+        signals["frame"] = _frame_signal(page, frame)
+
+    tasks = {asyncio.ensure_future(coro): name for name, coro in signals.items()}
+    fired = None
+    t0 = time.perf_counter()
+    try:
+        pending = set(tasks)
+        deadline = t0 + timeout / 1000
+        while pending and fired is None:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                # A signal that errored (page closed, bad selector) just drops out of the race
+                if not task.cancelled() and task.exception() is None:
+                    fired = tasks[task]
+                    break
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    # A floor for pages whose signals can fire early (the redirect page's own text or calls)
+    floor_ms = wait_floor(driver)
+    elapsed = (time.perf_counter() - t0) * 1000
+    if elapsed < floor_ms:
+        await asyncio.sleep((floor_ms - elapsed) / 1000)
+        elapsed = (time.perf_counter() - t0) * 1000
+    _record_wait(driver, label, elapsed, fired)
+    if fired:
+        logger.info("⏱️ Ready via %s in %.0fms", fired, elapsed)
+    else:
+        logger.info("⏱️ No readiness signal after %.0fms, continuing...", elapsed)
+    return fired
+
+
+async def wait_for_image(page, selector, previous_src=None, driver="default", timeout=None):
+    """Waits until an <img> has finished loading (and changed src, if previous_src is given)."""
+    timeout = timeout if timeout is not None else wait_timeout(driver)
+    t0 = time.perf_counter()
+    fired = "image"
+    try:
+        await page.wait_for_function(
+            """([sel, prev]) => {
+                const img = document.querySelector(sel);
+                return !!img && img.complete && img.naturalWidth > 0 && (!prev || img.src !== prev);
+            }""",
+            arg=[selector, previous_src],
+            timeout=timeout,
+        )
+    except Exception:
+        fired = None
+    _record_wait(driver, "image", (time.perf_counter() - t0) * 1000, fired)
+    return fired is not None
@@ -0,0 +1,147 @@
+import os
+import re
+import logging
+from dotenv import load_dotenv
+from services.utils import normalize_tracking_number
+from services.reducer import extract_events
+from services.registry import by_carrier_name, by_owner_code
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+# ============================================================
+# UPFRONT VALIDATION: reject impossible numbers before any network work
+# ============================================================
+VALIDATION_ENABLED = os.getenv("VALIDATION_ENABLED", "true").lower() in ("1", "true", "yes")
+# "Not found" answers are remembered this long, so repeats skip the API, browser and LLM
+NEGATIVE_TTL = int(os.getenv("NEGATIVE_CACHE_TTL", str(30 * 60)))
+
+AWB_RE = re.compile(r"^\d{11}$")
+# ISO 6346: 3-letter owner code, category U/J/Z, 6-digit serial, check digit
+CONTAINER_RE = re.compile(r"^[A-Z]{3}[UJZ]\d{7}$")
+REFERENCE_RE = re.compile(r"^[A-Z0-9]{6,20}$")  # B/L and booking numbers: carrier-specific formats
+
+# Carrier/aggregator wording for "we have no such shipment"
+NOT_FOUND_RE = re.compile(
+    r"no (?:records?|results?|data|shipments?|information) (?:were |was )?found|not found|"
+    r"invalid (?:awb|container|number|bill)|does not exist|no matching|unable to find|"
+    r"please (?:check|verify) the (?:number|awb|container)",
+    re.IGNORECASE,
+)
+NOT_FOUND_STATUS = "Not Found"
+
+VALIDATION_STATS = {"checked": 0, "rejected": 0, "owner_mismatch": 0}
+
+
+def awb_check_ok(clean: str):
+    """IATA AWB: the 8th serial digit is the first seven modulo 7."""
+    serial = clean[3:]
+    return int(serial[:7]) % 7 == int(serial[7])
+
+
+def _container_values():
+    # A=10 ... Z=38, skipping multiples of 11 (11, 22, 33)
+    values, value = {str(digit): digit for digit in range(10)}, 10
+    for letter in "ABCDEFGHIJKLMNOPQRSTUVWXYZ":
+        if value % 11 == 0:
+            value += 1
+        values[letter] = value
+        value += 1
+    return values
+
+
+CONTAINER_VALUES = _container_values()
+
+
+def container_check_ok(clean: str):
+    """ISO 6346 check digit: weighted sum (2^position) of the first ten characters, mod 11, mod 10."""
+    total = sum(CONTAINER_VALUES[ch] << position for position, ch in enumerate(clean[:10]))
+    return total % 11 % 10 == int(clean[10])
+
+
+def validation_error(tracking_number: str, carrier_type: str = "air", carrier_name: str = ""):
+    """Why a number can't be a real shipment, or None if it might be."""
+    if not VALIDATION_ENABLED:
+        return None
+    VALIDATION_STATS["checked"] += 1
+    error = _check(normalize_tracking_number(tracking_number), carrier_type, carrier_name)
+    if error:
+        VALIDATION_STATS["rejected"] += 1
+    return error
+
+
+def _warn_owner_mismatch(clean: str, carrier_name: str):
+    # Slot charters and VSAs put one line's boxes on another's ships, so this is only a hint, never a rejection
+    owner = by_owner_code(clean)
+    named = by_carrier_name(carrier_name, "sea")
+    if owner and named and owner.name != named.name:
+        VALIDATION_STATS["owner_mismatch"] += 1
+        logger.warning("⚠️ Container owner code %s belongs to %s, tracking with %s as requested.",
+                       clean[:4], owner.name, carrier_name)
+
+
+def _check(clean: str, carrier_type: str, carrier_name: str = ""):
+    if not clean:
+        return "Empty tracking number."
+    if not REFERENCE_RE.match(clean):
+        return "Tracking numbers contain only letters and digits (6-20 characters)."
+
+    if carrier_type == "sea":
+        if CONTAINER_RE.match(clean):
+            if not container_check_ok(clean):
+                return "Container number fails the ISO 6346 check digit."
+            _warn_owner_mismatch(clean, carrier_name)
+        elif not any(ch.isdigit() for ch in clean):
+            return "B/L and booking numbers contain digits."
+        return None
+
+    if CONTAINER_RE.match(clean):
+        return "Looks like a container number; track it as sea."
+    if AWB_RE.match(clean):
+        if clean[:3] == "000":
+            return "000 is not an IATA airline prefix."
+        if not awb_check_ok(clean):
+            return "AWB fails the mod-7 check digit."
+        return None
+    if clean.isdigit():
+        return "AWB numbers have 11 digits (3-digit airline prefix + 8-digit serial)."
+    # Alphanumeric house bills: formats vary by forwarder, let the carrier decide
+    return None
+
+
+def invalid_result(tracking_number: str, carrier: str, reason: str):
+    return {
+        "tracking_number": tracking_number,
+        "carrier": carrier,
+        "status": "Invalid Number",
+        "live_eta": "N/A",
+        "smart_summary": reason,
+        "parsed_by": "validation",
+        "raw_data_snippet": "",
+        "timeline": [],
+    }
+
+
+# --- NEGATIVE CACHE ---
+def negative_key(tracking_number: str, carrier_type: str):
+    # Carrier-independent: a number nobody knows stays unknown whatever carrier name came with it
+    return f"notfound|{carrier_type}|{normalize_tracking_number(tracking_number)}"
+
+
+def api_miss_key(tracking_number: str, carrier_type: str):
+    # Cargoes Flow answered 404/empty: later lookups go straight to the carrier site
+    return f"apimiss|{carrier_type}|{normalize_tracking_number(tracking_number)}"
+
+
+def looks_not_found(raw_text: str):
+    """True when the scraped text is a carrier's 'no such shipment' page rather than tracking data."""
+    if not raw_text or raw_text.startswith(("Source: ", "Error", "Fallback failed", "Driver Not Implemented")):
+        return False
+    if not NOT_FOUND_RE.search(raw_text[:5000]):
+        return False
+    _, events, _ = extract_events(raw_text)
+    return not events
+
+
+def is_not_found(result):
+    return NOT_FOUND_STATUS.lower() in str(result.get("status") or "").lower()
@@ -0,0 +1,152 @@
+"""
+Scrape worker: claims tracking jobs from the job queue and runs them on its own browser pool.
+
+Run from backend/ (the API spawns JOB_WORKERS of these on startup):
+    python -m services.worker
+"""
+import os
+import sys
+import signal
+import subprocess
+import socket
+import asyncio
+import logging
+from dotenv import load_dotenv
+from services.browser_pool import browser_pool
+from services.pipeline import track_shipment
+from services.cargoes_flow import close_client
+from services.capture import close_replay_client
+from services.llm_gateway import close_llm_client
+from services.jobs import job_queue, JOB_TIMEOUT
+from services.history import event_history
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# --- WORKER CONFIG (override via .env) ---
+# Jobs one worker runs at once; defaults to its browser pool size
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", str(browser_pool.size)))
+POLL_INTERVAL = float(os.getenv("WORKER_POLL_SECONDS", "0.5"))
+# Worker processes the API starts and keeps alive; 0 = run `python -m services.worker` yourself
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "1"))
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# A job gives up shortly before JOB_TIMEOUT, so a slow but live job is never claimed by a second worker
+JOB_RUN_TIMEOUT = max(JOB_TIMEOUT - 10, JOB_TIMEOUT * 0.9)
+
+
+async def _run(job, limit):
+    payload = job["payload"]
+    try:
+        result = await asyncio.wait_for(track_shipment(
+            payload["tracking_number"], payload.get("type", "air"), payload.get("carrier", ""),
+            payload.get("force_refresh", False),
+        ), JOB_RUN_TIMEOUT)
+        await job_queue.complete(job["id"], result)
+    except asyncio.TimeoutError:
+        logger.error("⏰ Job %s timed out after %.0fs", job["id"], JOB_RUN_TIMEOUT)
+        await job_queue.fail(job["id"], f"Timed out after {JOB_RUN_TIMEOUT:.0f}s")
+    except Exception as e:
+        logger.error("❌ Job %s failed: %s", job["id"], e)
+        await job_queue.fail(job["id"], str(e))
+    finally:
+        limit.release()
+
+
+async def main():
+    name = f"{socket.gethostname()}:{os.getpid()}"
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, stopping.set)
+        except NotImplementedError:
+            pass  # Windows: Ctrl+C still raises KeyboardInterrupt
+
+    await browser_pool.start()
+    event_history.start()
+    logger.info("🛠️ Worker %s ready (concurrency=%s)", name, WORKER_CONCURRENCY)
+    limit = asyncio.Semaphore(WORKER_CONCURRENCY)
+    running = set()
+    try:
+        while not stopping.is_set():
+            await limit.acquire()
+            job = await job_queue.claim(name)
+            if job is None:
+                limit.release()
+                try:
+                    await asyncio.wait_for(stopping.wait(), POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            task = asyncio.create_task(_run(job, limit))
+            running.add(task)
+            task.add_done_callback(running.discard)
+    finally:
+        # Let claimed jobs finish so none is left 'running' until JOB_TIMEOUT
+        if running:
+            await asyncio.gather(*list(running), return_exceptions=True)
+        await event_history.stop()
+        await browser_pool.stop()
+        await close_client()
+        await close_replay_client()
+        await close_llm_client()
+        logger.info("🛠️ Worker %s stopped", name)
+
+
+class WorkerSupervisor:
+    """Starts JOB_WORKERS worker processes next to the API and restarts any that exit."""
+
+    def __init__(self, count=JOB_WORKERS):
+        self.count = count
+        self.processes = []
+        self.restarts = 0
+        self._task = None
+
+    def _spawn(self):
+        return subprocess.Popen([sys.executable, "-m", "services.worker"], cwd=BACKEND_DIR)
+
+    def start(self):
+        if self.count <= 0 or self._task is not None:
+            return
+        self.processes = [self._spawn() for _ in range(self.count)]
+        self._task = asyncio.create_task(self._watch())
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(5)
+            for index, process in enumerate(self.processes):
+                if process.poll() is not None:
+                    logger.warning("⚠️ Worker pid %s exited (%s); restarting", process.pid, process.returncode)
+                    self.processes[index] = self._spawn()
+                    self.restarts += 1
+
+    async def stop(self, timeout=30):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        for process in self.processes:
+            if process.poll() is None:
+                process.terminate()
+        for process in self.processes:
+            try:
+                await asyncio.to_thread(process.wait, timeout)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        self.processes = []
+
+    def snapshot(self):
+        return {
+            "workers": self.count,
+            "alive": sum(1 for p in self.processes if p.poll() is None),
+            "restarts": self.restarts,
+        }
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=os.getenv("LOG_LEVEL", "INFO").upper(),
+        format="%(asctime)s %(levelname)-7s %(name)s: %(message)s",
+    )
+    asyncio.run(main())
@@ -0,0 +1,60 @@
+"""Rule engine for Cargoes Flow payloads: milestone wording and the ETA/event branch order."""
+import json
+from datetime import date, timedelta
+
+import pytest
+
+from services.fast_parser import parse_structured
+
+TODAY = date(2026, 3, 10)
+
+
+def payload(status="", event="", eta_days=5):
+    eta = (TODAY + timedelta(days=eta_days)).isoformat()
+    body = {"carrier_status": status, "latest_event": event, "predicted_arrival": eta, "destination": {"name": "Antwerp"}}
+    return "Source: Cargoes Flow API\n" + json.dumps(body)
+
+
+def status_of(*args, **kwargs):
+    result = parse_structured(payload(*args, **kwargs), today=TODAY)
+    return result and result["status"]
+
+
+@pytest.mark.parametrize("status, event", [
+    ("Delivered", ""),
+    ("", "Delivered to consignee"),
+    ("Arrived", "DELIVERED"),
+])
+def test_delivered(status, event):
+    assert status_of(status, event) == "Delivered"
+
+
+@pytest.mark.parametrize("status, event", [
+    ("Undelivered", ""),
+    ("Not delivered", ""),
+    ("", "Shipment not yet delivered"),
+    ("", "Delivered pending"),
+    ("Not arrived", "Delivery attempted"),
+])
+def test_negated_or_partial_delivered_is_not_delivered(status, event):
+    assert status_of(status, event) == "In Transit"
+
+
+@pytest.mark.parametrize("eta_days", [3, 0, -1, -10])
+def test_discharge_wins_over_eta(eta_days):
+    assert status_of("Arrived", "Discharged at port", eta_days=eta_days) == "Discharged / Port"
+
+
+@pytest.mark.parametrize("event", ["Awaiting discharge", "Discharge pending", "Discharged at transshipment port"])
+def test_pending_or_transshipment_discharge_is_in_transit(event):
+    assert status_of("In transit", event, eta_days=3) == "In Transit"
+
+
+@pytest.mark.parametrize("eta_days, expected", [
+    (3, "In Transit"),
+    (0, "In Transit"),      # Due today, nothing discharged yet
+    (-1, None),             # Inside the grace window: the LLM decides
+    (-5, "Arrived / Delayed"),
+])
+def test_eta_only(eta_days, expected):
+    assert status_of("Departed", "", eta_days=eta_days) == expected
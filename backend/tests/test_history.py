@@ -0,0 +1,107 @@
+"""Parquet event history on a temp dir: append/query, failed flushes, and compaction vs readers."""
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from services import history
+from services.events import TrackingEvent
+from services.history import EventHistory
+
+
+def event(n, milestone="Departed"):
+    return TrackingEvent(code="DEP", milestone=milestone, location="BOM", timestamp=datetime(2026, 3, n, 8), source="test")
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(history, "HISTORY_ENABLED", True)
+    return EventHistory(root=str(tmp_path))
+
+
+def past_day_parts(store, count, days_ago=2):
+    """Writes `count` part files, one event each, observed `days_ago` days back."""
+    observed = (datetime.now(timezone.utc) - timedelta(days=days_ago)).replace(tzinfo=None, microsecond=0)
+    for n in range(1, count + 1):
+        store.append(f"MSCU{n:07d}", "sea", "MSC", [event(n)])
+        store._rows[-1]["observed_at"] = observed
+        store._flush()
+    return observed.strftime("%Y-%m-%d")
+
+
+def parquet_files(store, day):
+    return sorted(os.listdir(os.path.join(store.root, f"day={day}")))
+
+
+def test_append_and_query(store):
+    store.append("098-12345675", "air", "Air India", [event(2), event(1, "Received")])
+    store.append("607-12345675", "air", "Etihad", [event(3)])
+    rows = asyncio.run(store.query("098 1234 5675"))
+    assert [(r["tracking_number"], r["milestone"]) for r in rows] == [("09812345675", "Received"), ("09812345675", "Departed")]
+    assert rows[0]["timestamp"] == "2026-03-01T08:00:00"
+    assert len(asyncio.run(store.query())) == 3
+    assert store.snapshot()["buffered"] == 0
+
+
+def test_failed_flush_keeps_rows(store, monkeypatch):
+    store.append("MSCU7654329", "sea", "MSC", [event(1), event(2)])
+
+    def disk_full(*args, **kwargs):
+        raise OSError("No space left on device")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(history.pq, "write_table", disk_full)
+        with pytest.raises(OSError):
+            store._flush()
+    assert len(store._rows) == 2
+    assert store._flush() == 2
+    assert len(asyncio.run(store.query("MSCU7654329"))) == 2
+
+
+def test_compaction_merges_parts_and_late_flushes(store):
+    day = past_day_parts(store, 3)
+    assert store._compact(day)
+    assert [name.split("-")[0] for name in parquet_files(store, day)] == ["compacted"]
+
+    # A late flush from another process lands after the day was merged
+    past_day_parts(store, 1)
+    assert store._compact(day)
+    assert len(parquet_files(store, day)) == 1
+    assert len(asyncio.run(store.query())) == 4
+    assert not store._compact(day)
+
+
+def test_query_ignores_merged_files_not_yet_removed(store, monkeypatch):
+    day = past_day_parts(store, 3)
+    # The compaction stops right after writing its merged file, before removing the parts
+    with monkeypatch.context() as patch:
+        patch.setattr(history.os, "remove", lambda path: None)
+        store._compact(day)
+    assert len(parquet_files(store, day)) == 4
+    assert len(asyncio.run(store.query())) == 3
+
+    # The next compaction clears the leftovers without merging them twice
+    assert not store._compact(day)
+    assert len(parquet_files(store, day)) == 1
+    assert len(asyncio.run(store.query())) == 3
+
+
+def test_query_retries_when_a_file_disappears(store, monkeypatch):
+    day = past_day_parts(store, 2)
+    live_files = EventHistory._live_files
+    calls = []
+
+    def racing(folder):
+        files = live_files(folder)
+        if not calls:
+            # A compaction finishes between this listing and the read
+            calls.append(folder)
+            store._compact(day)
+        return files
+
+    monkeypatch.setattr(store, "_live_files", racing)
+    assert len(asyncio.run(store.query())) == 2
+    assert calls
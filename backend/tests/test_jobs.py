@@ -0,0 +1,79 @@
+"""SQLite job queue on a temp file: exclusive claims, stale-claim recovery and chunked counts."""
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from services import jobs
+from services.jobs import SQLiteJobQueue
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "jobs.sqlite3")
+
+
+def test_each_job_is_claimed_once(path):
+    SQLiteJobQueue(path)._enqueue([{"n": n} for n in range(40)])
+    # One queue object per "worker process", all on the same file
+    workers = [SQLiteJobQueue(path) for _ in range(4)]
+
+    def drain(queue):
+        claimed = []
+        while (job := queue._claim(f"w{id(queue)}")) is not None:
+            claimed.append(job["payload"]["n"])
+        return claimed
+
+    with ThreadPoolExecutor(len(workers)) as pool:
+        claimed = [n for part in pool.map(drain, workers) for n in part]
+    assert sorted(claimed) == list(range(40))
+
+
+def test_claim_order_and_finish(path):
+    queue = SQLiteJobQueue(path)
+    first, second = queue._enqueue([{"n": 1}, {"n": 2}])
+    job = queue._claim("w1")
+    assert (job["id"], job["status"], job["attempts"]) == (first, "running", 1)
+    queue._finish(job["id"], "done", {"status": "Delivered"})
+    assert queue._get(first)["result"] == {"status": "Delivered"}
+    assert queue._claim("w1")["id"] == second
+    assert queue._claim("w1") is None
+
+
+def test_stale_claim_is_requeued(path, monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_TIMEOUT", 60)
+    queue = SQLiteJobQueue(path)
+    (job_id,) = queue._enqueue([{"n": 1}])
+    assert queue._claim("dead")["id"] == job_id
+    assert queue._claim("live") is None  # Still within the timeout
+
+    monkeypatch.setattr(time, "time", lambda real=time.time: real() + 61)
+    job = queue._claim("live")
+    assert (job["id"], job["worker"], job["attempts"]) == (job_id, "live", 2)
+
+
+def test_stale_claim_fails_after_max_attempts(path, monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_TIMEOUT", 60)
+    monkeypatch.setattr(jobs, "JOB_MAX_ATTEMPTS", 2)
+    queue = SQLiteJobQueue(path)
+    (job_id,) = queue._enqueue([{"n": 1}])
+    clock = [time.time()]
+    monkeypatch.setattr(time, "time", lambda: clock[0])
+
+    for attempt in (1, 2):
+        assert queue._claim(f"w{attempt}")["attempts"] == attempt
+        clock[0] += 61
+    assert queue._claim("w3") is None
+    job = queue._get(job_id)
+    assert (job["status"], job["error"], job["attempts"]) == ("failed", "Worker timed out", 2)
+
+
+def test_counts_past_parameter_chunk(path):
+    queue = SQLiteJobQueue(path)
+    ids = queue._enqueue([{"n": n} for n in range(1203)])
+    for _ in range(3):
+        queue._finish(queue._claim("w1")["id"], "done", {})
+    assert asyncio.run(queue.counts(ids)) == {"done": 3, "queued": 1200}
+    assert asyncio.run(queue.counts(ids[:700])) == {"done": 3, "queued": 697}
+    assert asyncio.run(queue.counts()) == {"done": 3, "queued": 1200}
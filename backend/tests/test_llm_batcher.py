@@ -0,0 +1,103 @@
+"""LLMBatcher against a stub OpenAI server: flush splitting, per-caller keys and the single-parse fallback."""
+import asyncio
+import json
+import re
+
+import httpx
+import pytest
+from openai import AsyncOpenAI
+
+from services import ai_service, llm_gateway
+from services.llm_gateway import estimate_tokens
+
+# Plain prose: the rule engine can't decide it, so every item reaches the LLM
+RAW = "Shipment departed origin hub and is moving to the next station. " * 6
+BLOCK_TOKENS = estimate_tokens(ai_service._shipment_block({"tracking_number": "X#1", "raw_text": RAW, "carrier": "Test"}))
+
+
+class StubOpenAI:
+    """Answers chat completions; batch prompts get one entry per `### key` unless the key is dropped."""
+
+    def __init__(self, drop=()):
+        self.drop = set(drop)
+        self.batches = []  # Keys seen per batched request
+        self.singles = 0
+
+    def handler(self, request: httpx.Request):
+        prompt = json.loads(request.content)["messages"][-1]["content"]
+        keys = re.findall(r"^### (\S+)$", prompt, re.MULTILINE)
+        if keys:
+            self.batches.append(keys)
+            content = {key: self._result(f"Batch {key}") for key in keys if key not in self.drop}
+        else:
+            self.singles += 1
+            content = self._result("Single")
+        return httpx.Response(200, json={
+            "id": "chatcmpl-stub", "object": "chat.completion", "created": 0, "model": "stub",
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": json.dumps(content)}}],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+        })
+
+    @staticmethod
+    def _result(status):
+        return {"latest_date": "01-Jan-2026", "status": status, "summary": "stub"}
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    def install(**kwargs):
+        server = StubOpenAI(**kwargs)
+        client = AsyncOpenAI(api_key="x", base_url="http://openai.stub/v1", max_retries=0,
+                             http_client=httpx.AsyncClient(transport=httpx.MockTransport(server.handler)))
+        monkeypatch.setattr(llm_gateway, "client", client)
+        return server
+    return install
+
+
+def test_token_budget_splits_flushes(stub):
+    server = stub()
+
+    async def run():
+        # Two blocks fill the budget, so four callers make two flushes
+        batcher = ai_service.LLMBatcher(window_ms=1000, token_budget=BLOCK_TOKENS * 2)
+        results = await asyncio.gather(*[batcher.parse(RAW, "Test", f"N{i}") for i in range(4)])
+        assert not batcher._tasks
+        return results
+
+    results = asyncio.run(run())
+    assert sorted(len(keys) for keys in server.batches) == [2, 2]
+    assert [r["status"] for r in results] == [f"Batch N{i}#{i + 1}" for i in range(4)]
+
+
+def test_pack_batches_respects_token_budget():
+    items = [{"tracking_number": f"N{i}", "raw_text": RAW, "carrier": "Test"} for i in range(5)]
+    overhead = estimate_tokens(ai_service._system_prompt(batch=True))
+    batches = ai_service.pack_batches(items, token_budget=overhead + BLOCK_TOKENS * 2)
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+
+
+def test_duplicate_numbers_map_back_to_their_callers(stub):
+    server = stub()
+
+    async def run():
+        batcher = ai_service.LLMBatcher(window_ms=10)
+        return await asyncio.gather(batcher.parse(RAW, "Test", "SAME"), batcher.parse(RAW + " Later.", "Test", "SAME"))
+
+    first, second = asyncio.run(run())
+    assert server.batches == [["SAME#1", "SAME#2"]]
+    assert (first["status"], second["status"]) == ("Batch SAME#1", "Batch SAME#2")
+    assert first["parsed_by"] == "llm_batch"
+
+
+def test_key_missing_from_reply_is_parsed_singly(stub):
+    server = stub(drop={"B#2"})
+
+    async def run():
+        batcher = ai_service.LLMBatcher(window_ms=10)
+        return await asyncio.gather(batcher.parse(RAW, "Test", "A"), batcher.parse(RAW + " Later.", "Test", "B"))
+
+    first, second = asyncio.run(run())
+    assert first["status"] == "Batch A#1"
+    assert (second["status"], second["parsed_by"]) == ("Single", "llm")
+    assert server.singles == 1
@@ -0,0 +1,29 @@
+"""Manifest number clean-up: which 10-digit numbers get their AWB prefix zero back."""
+import pytest
+
+from services.manifest import NumericCell, _cell, lost_leading_zero, shipment_type
+
+
+def test_numeric_xlsx_cells_are_marked():
+    assert isinstance(_cell(9812345675), NumericCell)
+    assert isinstance(_cell(9812345675.0), NumericCell)
+    assert _cell(9812345675.0) == "9812345675"
+    assert not isinstance(_cell("6123456789"), NumericCell)
+    assert not isinstance(_cell(True), NumericCell)
+
+
+@pytest.mark.parametrize("cell, padded", [
+    ("9812345675", True),               # 098-12345675 with the zero dropped by a spreadsheet export
+    ("6123456789", False),              # COSCO-style sea B/L: padding would fail the mod-7 check
+    (NumericCell("6123456789"), True),  # Stored as a number in XLSX: the zero was lost
+    ("12345678", False),
+    ("MSCU123456", False),
+])
+def test_lost_leading_zero(cell, padded):
+    assert lost_leading_zero(cell, cell) is padded
+
+
+def test_sea_bill_stays_sea():
+    number = "6123456789"
+    assert not lost_leading_zero(number, number)
+    assert shipment_type(number) == "sea"
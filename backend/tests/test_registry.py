@@ -0,0 +1,84 @@
+"""Driver routing, checked without Playwright: resolve() only reads the declared specs."""
+import sys
+
+import pytest
+
+from services.registry import resolve, fallback_for
+from services.validation import validation_error
+
+
+@pytest.mark.parametrize("number, driver", [
+    ("098-12345675", "air_india"),
+    ("607-12345675", "etihad"),
+    ("297 12345675", "china_airlines"),
+    ("501-12345675", "silk_way"),
+    ("463-12345675", "silk_way"),
+    ("057-12345675", "af_klm"),
+    ("074-12345675", "af_klm"),
+    ("065-12345675", "saudia"),
+])
+def test_air_routes_by_iata_prefix(number, driver):
+    assert resolve(number, "air").name == driver
+
+
+def test_air_prefix_wins_over_carrier_name():
+    assert resolve("098-12345675", "air", "Saudia").name == "air_india"
+
+
+@pytest.mark.parametrize("carrier, driver", [
+    ("Air India", "air_india"),
+    ("KLM Cargo", "af_klm"),
+    ("Saudia Cargo", "saudia"),
+])
+def test_unknown_air_prefix_routes_by_carrier_alias(carrier, driver):
+    assert resolve("999-12345675", "air", carrier).name == driver
+
+
+@pytest.mark.parametrize("carrier, driver", [
+    ("MSC", "msc"),
+    ("Mediterranean Shipping Company", "msc"),
+    ("Hapag-Lloyd AG", "hapag"),
+    ("HLCU", "hapag"),
+    ("CMA CGM", "cma"),
+])
+def test_sea_routes_by_carrier_alias(carrier, driver):
+    assert resolve("TCLU7654320", "sea", carrier).name == driver
+
+
+@pytest.mark.parametrize("number, driver", [
+    ("MSCU1234566", "msc"),
+    ("MEDU1234565", "msc"),
+    ("HLCU1234567", "hapag"),
+    ("CMDU1234567", "cma"),
+])
+def test_sea_routes_by_container_owner_code(number, driver):
+    assert resolve(number, "sea").name == driver
+
+
+def test_carrier_name_wins_over_container_owner_code():
+    assert resolve("MSCU1234566", "sea", "Hapag-Lloyd").name == "hapag"
+
+
+def test_owner_code_of_another_line_is_not_rejected():
+    # Slot charter: an MSC box booked with Hapag-Lloyd is tracked, not flagged invalid
+    assert validation_error("MSCU1234566", "sea", "Hapag-Lloyd") is None
+
+
+@pytest.mark.parametrize("number, carrier_type, carrier", [
+    ("999-12345675", "air", ""),
+    ("999-12345675", "air", "Unknown Airways"),
+    ("TCLU7654320", "sea", ""),
+    ("TCLU7654320", "sea", "Some Line"),
+])
+def test_unknown_shipments_use_the_fallback(number, carrier_type, carrier):
+    spec = resolve(number, carrier_type, carrier)
+    assert spec.fallback
+    assert spec is fallback_for(carrier_type)
+
+
+def test_routing_does_not_import_drivers():
+    resolve("098-12345675", "air")
+    resolve("MSCU1234566", "sea", "MSC")
+    assert "playwright" not in sys.modules
+    assert "services.air.air_india" not in sys.modules
+    assert "services.sea.msc" not in sys.modules
@@ -0,0 +1,73 @@
+"""wait_ready with a fake page: redirect pages don't count, and the driver floor holds."""
+import asyncio
+import re
+import time
+
+import pytest
+
+from services import utils
+from services.utils import number_pattern, wait_ready
+
+NUMBER = "MSCU7654329"
+REDIRECT = "https://www.track-trace.com/container?number=" + NUMBER
+CARRIER = "https://www.msc.com/en/track-a-shipment"
+
+
+class FakePage:
+    """Serves `pages` in turn: [(seconds, url, body)], switching after each page's time is up."""
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.t0 = time.perf_counter()
+
+    def _current(self):
+        elapsed = time.perf_counter() - self.t0
+        for seconds, url, body in self.pages:
+            if elapsed < seconds:
+                return url, body
+            elapsed -= seconds
+        return self.pages[-1][1:]
+
+    @property
+    def url(self):
+        return self._current()[0]
+
+    async def inner_text(self, selector, timeout=None):
+        return self._current()[1]
+
+
+@pytest.fixture(autouse=True)
+def fast_polls(monkeypatch):
+    monkeypatch.setattr(utils, "TEXT_POLL_MS", 10)
+    monkeypatch.setitem(utils.WAIT_FLOORS, "sea_fallback", 300)
+
+
+def wait(page, timeout=600):
+    pattern = number_pattern(NUMBER)
+    return asyncio.run(wait_ready(page, driver="sea_fallback", text_stable="body", text_pattern=pattern,
+                                  away_from=r"track-trace\.com", timeout=timeout, stable_ms=50))
+
+
+def test_number_pattern_allows_printed_separators():
+    assert re.search(number_pattern("MSCU7654329"), "Container: mscu 765432-9", re.IGNORECASE)
+    assert re.search(number_pattern("607-12345675"), "AWB 607-12345675")
+
+
+def test_redirect_page_text_does_not_count():
+    page = FakePage([(10, REDIRECT, f"Redirecting you to MSC to track {NUMBER}, please wait a moment...")])
+    assert wait(page) is None
+
+
+def test_carrier_text_without_the_number_does_not_count():
+    page = FakePage([(10, CARRIER, "Loading shipment tracking, please wait while we fetch your results...")])
+    assert wait(page) is None
+
+
+def test_carrier_results_fire_after_the_floor():
+    page = FakePage([
+        (0.05, REDIRECT, f"Redirecting you to MSC to track {NUMBER}, please wait a moment..."),
+        (10, CARRIER, "Container MSCU 765432-9 discharged at Antwerp on 12-Mar-2026, final POD reached"),
+    ])
+    t0 = time.perf_counter()
+    assert wait(page) == "text_stable"
+    assert time.perf_counter() - t0 >= 0.3
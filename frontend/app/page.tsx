@@ -73,7 +73,7 @@ export default function Dashboard() {
       setShipments([...newShipments]); // Update UI to show spinner
 
       try {
-        const res = await fetch("http://localhost:8000/track/single", {
+        const res = await fetch("http://localhost:8000/track/single?fields=status,live_eta,smart_summary", {
           method: "POST",
           headers: { "Content-Type": "application/json" },
           body: JSON.stringify({